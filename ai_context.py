@@ -0,0 +1,282 @@
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+from alerts import STOCK_LOW, STOCK_OUT
+
+# ========================
+# Prompt Context
+# ========================
+#
+# Gemini gets a compact picture of the inventory instead of four global
+# numbers or the whole catalog: per-category totals, the SKUs closest to
+# running out, the fastest sellers and the most revenue at risk. Category
+# totals and low/out IDs come from the database's stock index, and units
+# sold are counted as 'sale' events are published, so building a prompt
+# only reads the handful of products it names. The rendered prompt is
+# capped at a token budget.
+
+HOUR = 3600
+# Hours of cover (stock / sales rate) at which a flagged SKU's risk changes
+# band; the prompt cache key only moves when a SKU crosses a band
+COVER_BANDS = (24, 72, 168)
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def cover_band(quantity, sold, window_hours):
+    """0 when out of stock, then 1.. by hours of cover (COVER_BANDS), one more if nothing sold"""
+    if quantity <= 0:
+        return 0
+    if not sold:
+        return len(COVER_BANDS) + 2
+    hours = quantity * window_hours / sold
+    return 1 + sum(hours >= band for band in COVER_BANDS)
+
+class PromptContext:
+    """Inventory summaries for AI prompts, kept current by the change feed
+
+    Units leaving stock are counted in hourly buckets over the last
+    window_hours (INVENTORY_AI_SALES_WINDOW): sales from the moment it is
+    created by the feed's listener, earlier ones from the stock history on
+    the first build.
+    """
+    def __init__(self, db, top_n=None, token_budget=None, window_hours=None):
+        self.db = db
+        self.top_n = top_n or int(os.getenv('INVENTORY_AI_TOP_N', 5))
+        self.token_budget = token_budget or int(os.getenv('INVENTORY_AI_TOKEN_BUDGET', 1200))
+        self.window_hours = window_hours or int(os.getenv('INVENTORY_AI_SALES_WINDOW', 24))
+        self.sales = {}
+        self.sold = Counter()
+        self.seeded = False
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        db.changes.subscribe(self.on_change)
+
+    def on_change(self, event):
+        """Change feed listener (runs under the database lock)"""
+        if event['kind'] == 'sale':
+            with self.lock:
+                self.record_sale(event['key'], event['value'], time.time())
+        elif event['kind'] == 'reset':
+            with self.lock:
+                self.sales.clear()
+                self.sold = Counter()
+                self.seeded = True
+
+    def record_sale(self, product_id, units, when):
+        hour = int(when // HOUR)
+        if hour <= time.time() // HOUR - self.window_hours:
+            return
+        self.sales.setdefault(hour, Counter())[product_id] += units
+        self.sold[product_id] += units
+
+    def expire_sales(self):
+        """Forget hourly buckets that left the window"""
+        oldest = time.time() // HOUR - self.window_hours
+        expired = [hour for hour in self.sales if hour <= oldest]
+        for hour in expired:
+            self.sold.subtract(self.sales.pop(hour))
+        if expired:
+            self.sold = +self.sold
+
+    def seed_sales(self):
+        """Add the sales made before the listener was subscribed, from the stock history"""
+        end = self.started
+        start = datetime.now() - timedelta(hours=self.window_hours)
+        sales = []
+        try:
+            for product_id in self.db.history.product_ids():
+                quantity = self.db.history.quantity_at(product_id, start)
+                for when, new_quantity in self.db.history.changes(product_id, start, end):
+                    if quantity is not None and new_quantity < quantity:
+                        sales.append((product_id, quantity - new_quantity, when.timestamp()))
+                    quantity = new_quantity
+        except Exception as e:
+            print(f"Error reading sales from stock history: {str(e)}")
+        with self.lock:
+            if self.seeded:
+                return
+            for sale in sales:
+                self.record_sale(*sale)
+            self.seeded = True
+
+    def sold_snapshot(self):
+        with self.lock:
+            self.expire_sales()
+            return Counter(self.sold)
+
+    def read_inventory(self, sold):
+        """Current status, flagged rows, fastest sellers and category totals in one pass under the database lock"""
+        with self.db.lock:
+            status = self.db.get_inventory_status()
+            flagged = self.db.stock_index.ids(STOCK_OUT) + self.db.stock_index.ids(STOCK_LOW)
+            risk = []
+            for product_id in flagged:
+                product = self.db.inventory.get(product_id)
+                if product is None:
+                    continue
+                category = product.get('category', "")
+                threshold = self.db.thresholds.threshold_for(product_id, category)
+                risk.append((product_id, category, product['quantity'], product['price'],
+                             sold[product_id], threshold))
+            fastest = []
+            for product_id, units in sold.most_common():
+                if len(fastest) == self.top_n:
+                    break
+                product = self.db.inventory.get(product_id)
+                if product is not None:
+                    fastest.append((product_id, units, product['quantity']))
+            categories = self.db.stock_index.category_totals()
+        return status, risk, fastest, categories
+
+    def names(self, product_ids):
+        with self.db.lock:
+            names = {}
+            for product_id in product_ids:
+                product = self.db.inventory.get(product_id)
+                names[product_id] = product['name'] if product is not None else product_id
+            return names
+
+    def sections(self, risk, fastest, categories):
+        """Get [(title, lines, overflow line or None)] in priority order, plus the risk picture they show"""
+        window = f"{self.window_hours}h"
+
+        # Out of stock first, then fewest hours of cover at the current sales rate
+        def cover(row):
+            _, _, quantity, _, sold, _ = row
+            return (quantity > 0, quantity / sold if sold else float('inf'), -sold)
+        running_out = heapq.nsmallest(self.top_n, risk, key=cover)
+        # Revenue at stake: what the SKU sells per window, or at least its shortfall
+        at_risk = heapq.nlargest(
+            self.top_n, risk,
+            key=lambda row: row[3] * max(row[4], row[5] - row[2], 0)
+        )
+
+        names = self.names({row[0] for row in running_out + at_risk} | {row[0] for row in fastest})
+        flagged = Counter()
+        for row in risk:
+            flagged[row[1]] += 1
+
+        sections = [
+            (
+                "Running out (lowest cover first)",
+                [
+                    f"- {names[pid]} ({pid}, {category or 'uncategorised'}): {quantity} left, "
+                    f"{sold} sold in {window}, low at {threshold}"
+                    for pid, category, quantity, _, sold, threshold in running_out
+                ],
+                None
+            ),
+            (
+                f"Fastest sellers ({window})",
+                [
+                    f"- {names[pid]} ({pid}): {units} sold, {quantity} left"
+                    for pid, units, quantity in fastest
+                ],
+                None
+            ),
+            (
+                "Most revenue at risk",
+                [
+                    f"- {names[pid]} ({pid}): ${price * max(sold, threshold - quantity, 0):,.2f} "
+                    f"({quantity} left at ${price:,.2f})"
+                    for pid, _, quantity, price, sold, threshold in at_risk
+                ],
+                None
+            )
+        ]
+
+        ordered = sorted(
+            categories.items(),
+            key=lambda item: (-flagged[item[0]], -item[1][2])
+        )
+        sections.append((
+            "Categories (products / units / value / low or out)",
+            [
+                f"- {category or 'Uncategorised'}: {count} / {units} / ${value:,.2f} / {flagged[category]}"
+                for category, (count, units, value) in ordered
+            ],
+            "- ...and {} more categories"
+        ))
+
+        # The advice only needs to change when the risk picture does: which SKUs
+        # are flagged and how close each is to running out, not every sale
+        picture = [
+            sorted((pid, cover_band(quantity, sold, self.window_hours)) for pid, _, quantity, _, sold, _ in risk),
+            [pid for pid, _, _ in fastest],
+            sorted(flagged.items())
+        ]
+        return sections, picture
+
+    def build(self, instructions=""):
+        """Render the context within the token budget; returns (prompt, cache key)"""
+        if not self.seeded:
+            self.seed_sales()
+        # Never wait for the database lock while holding self.lock: the
+        # feed listener takes them in the other order
+        status, risk, fastest, categories = self.read_inventory(self.sold_snapshot())
+        sections, picture = self.sections(risk, fastest, categories)
+        key = hashlib.sha1(json.dumps([picture, instructions]).encode('utf-8')).hexdigest()
+
+        header = (
+            f"Inventory: {status['total_products']} products, {status['out_of_stock']} out of stock, "
+            f"{status['low_stock']} low on stock, total value ${status['total_value']:,.2f}."
+        )
+        parts = [header]
+        used = estimate_tokens(header) + estimate_tokens(instructions)
+        for title, lines, overflow in sections:
+            if not lines:
+                continue
+            if used + estimate_tokens(title) > self.token_budget:
+                break
+            parts.append(f"\n{title}:")
+            used += estimate_tokens(title)
+            for index, line in enumerate(lines):
+                if used + estimate_tokens(line) > self.token_budget:
+                    if overflow:
+                        parts.append(overflow.format(len(lines) - index))
+                    break
+                parts.append(line)
+                used += estimate_tokens(line)
+        if instructions:
+            parts.append(f"\n{instructions}")
+        return "\n".join(parts), key
+
+# ========================
+# Prompt Cache
+# ========================
+
+class PromptCache:
+    """Recent AI answers by cache key, reused for up to ttl seconds (INVENTORY_AI_CACHE_TTL)"""
+    def __init__(self, ttl=None, size=32):
+        self.ttl = ttl if ttl is not None else int(os.getenv('INVENTORY_AI_CACHE_TTL', 3600))
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = (time.time(), response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
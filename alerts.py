@@ -0,0 +1,48 @@
+# ========================
+# Stock States
+# ========================
+#
+# Shared by the database, the agents and the modules built on them
+# (ai_context, notifications, locations, the API), which can then use them
+# without importing main.
+
+STOCK_OK = 'ok'
+STOCK_LOW = 'low'
+STOCK_OUT = 'out'
+
+# ========================
+# Stock Alerts
+# ========================
+
+def format_product_list(products, limit=10):
+    """Format affected products as bullet lines for an alert message"""
+    lines = [
+        f"\n- {product['name']} (ID: {product_id}), Qty: {product['quantity']}"
+        for product_id, product in list(products.items())[:limit]
+    ]
+    if len(products) > limit:
+        lines.append(f"\n- ...and {len(products) - limit} more")
+    return "".join(lines)
+
+# Stock alert actions -> (emoji, what the listed products are)
+STOCK_ALERTS = {
+    'out_of_stock_alert': ('🚨', 'out of stock'),
+    'low_stock_alert': ('⚠️', 'low on stock')
+}
+
+def alert_products(db):
+    """Get [(action, {product_id: product})] for every stock alert that has products"""
+    status = db.get_inventory_status()
+    alerts = []
+    if status['out_of_stock'] > 0:
+        alerts.append(('out_of_stock_alert', db.get_out_of_stock_products()))
+    if status['low_stock'] > 0:
+        alerts.append(('low_stock_alert', db.get_low_stock_products()))
+    return alerts
+
+def alert_details(action, products):
+    return f"{len(products)} product(s) {STOCK_ALERTS[action][1]}"
+
+def alert_message(action, products):
+    """Render a stock alert as a WhatsApp/email message"""
+    return f"{STOCK_ALERTS[action][0]} Alert: {alert_details(action, products)}!" + format_product_list(products)
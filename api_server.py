@@ -0,0 +1,398 @@
+import asyncio
+import hmac
+import math
+import os
+import threading
+from contextlib import asynccontextmanager
+from itertools import islice
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from alerts import STOCK_LOW, STOCK_OUT
+from main import QUANTITY_MAX, QUANTITY_MIN, InventoryDB, VersionConflictError
+
+# ========================
+# Write Batcher
+# ========================
+
+class WriteBatcher:
+    """Coalesces concurrent write requests into one locked, single-save batch"""
+    def __init__(self, db, max_batch=500, max_delay=0.005):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop collecting and flush whatever is still queued"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        pending = []
+        while self.queue and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        if pending:
+            await self.flush(pending)
+
+    async def submit(self, method, *args):
+        """Queue a call to an InventoryDB write method and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((method, args, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self.flush(batch)
+
+    async def flush(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, self.apply, batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def apply(self, batch):
+        """Run a batch under the DB lock so the files are written once"""
+        results = []
+        with self.db.batch():
+            for method, args, _ in batch:
+                try:
+                    results.append(getattr(self.db, method)(*args))
+                except Exception as e:
+                    # Only this request failed; the rest of the batch still applies
+                    results.append(e)
+        return results
+
+# ========================
+# Authentication
+# ========================
+
+class APIKeyMiddleware:
+    """Rejects requests without the configured X-API-Key header"""
+    def __init__(self, app, api_key):
+        self.app = app
+        self.api_key = api_key
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and self.api_key:
+            provided = dict(scope['headers']).get(b'x-api-key', b'').decode()
+            if not hmac.compare_digest(provided, self.api_key):
+                response = JSONResponse({'error': 'Invalid API key'}, status_code=401)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# ========================
+# Handlers
+# ========================
+
+def error(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+async def read_json(request):
+    """Parse the request body, returning None if it is not valid JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def is_int(value):
+    """An integer that fits the database's 64-bit quantity columns"""
+    return isinstance(value, int) and not isinstance(value, bool) and QUANTITY_MIN <= value <= QUANTITY_MAX
+
+def is_number(value):
+    """A finite JSON number (Python's json module also accepts Infinity and NaN)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def invalid_product(data, with_id=True):
+    """Describe what is wrong with a product body, or None if it is usable"""
+    if not isinstance(data, dict):
+        return "Expected a JSON object"
+    keys = ('id', 'name', 'quantity', 'price') if with_id else ('name', 'quantity', 'price')
+    missing = [key for key in keys if key not in data]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if with_id and (not isinstance(data['id'], str) or not data['id']):
+        return "id must be a non-empty string"
+    if not isinstance(data['name'], str):
+        return "name must be a string"
+    if not is_int(data['quantity']) or data['quantity'] < 0:
+        return "quantity must be a non-negative integer"
+    if not is_number(data['price']) or data['price'] < 0:
+        return "price must be a finite, non-negative number"
+    if not isinstance(data.get('category', ""), str):
+        return "category must be a string"
+    if data.get('version') is not None and not is_int(data['version']):
+        return "version must be an integer"
+    return None
+
+def invalid_item(item, field, positive=False):
+    """Describe what is wrong with a {id, <field>} bulk item, or None"""
+    if (not isinstance(item, dict) or not isinstance(item.get('id'), str)
+            or not is_int(item.get(field)) or (positive and item[field] <= 0)):
+        return f"Each item needs a string id and {'a positive' if positive else 'an'} integer {field}"
+    return None
+
+def query_int(request, name, default):
+    """A non-negative integer query parameter, or None if it is malformed"""
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+def write_failure(db, product_id):
+    """Map a False return from an InventoryDB write to an HTTP error"""
+    if product_id not in db.inventory:
+        return error(f"Product {product_id} not found", 404)
+    return error(f"Insufficient stock for {product_id}", 409)
+
+# Reads take the database lock, which a save or a write batch can hold for a
+# while, so they run in the thread pool rather than on the event loop
+
+def product_page(db, category, state, offset, limit):
+    """One page of products with their IDs, reading no further than the page ends"""
+    with db.lock:
+        if state in (STOCK_LOW, STOCK_OUT):
+            rows = ((product_id, db.inventory[product_id]) for product_id in db.stock_index.ids(state))
+        else:
+            rows = db.inventory.scan() if hasattr(db.inventory, 'scan') else db.inventory.items()
+        if category:
+            rows = ((product_id, product) for product_id, product in rows if product.get('category', "") == category)
+        return [dict(product, id=product_id) for product_id, product in islice(rows, offset, offset + limit)]
+
+def product_detail(db, product_id):
+    with db.lock:
+        product = db.inventory.get(product_id)
+        if product is None:
+            return None
+        return dict(product, id=product_id, stock_state=db.get_stock_state(product_id))
+
+async def get_status(request):
+    return JSONResponse(await run_in_threadpool(request.app.state.db.get_inventory_status))
+
+async def get_activities(request):
+    limit = query_int(request, 'limit', 10)
+    if limit is None:
+        return error("limit must be a non-negative integer", 400)
+    return JSONResponse(await run_in_threadpool(request.app.state.db.get_recent_activities, limit))
+
+async def list_products(request):
+    """List products, optionally filtered by category or stock state, paginated"""
+    category = request.query_params.get('category')
+    state = request.query_params.get('state')
+    offset = query_int(request, 'offset', 0)
+    limit = query_int(request, 'limit', 100)
+    if offset is None or limit is None:
+        return error("offset and limit must be non-negative integers", 400)
+    return JSONResponse(await run_in_threadpool(product_page, request.app.state.db, category, state, offset, limit))
+
+async def get_product(request):
+    product_id = request.path_params['product_id']
+    product = await run_in_threadpool(product_detail, request.app.state.db, product_id)
+    if product is None:
+        return error(f"Product {product_id} not found", 404)
+    return JSONResponse(product)
+
+async def add_product(request):
+    db = request.app.state.db
+    data = await read_json(request)
+    problem = invalid_product(data)
+    if problem:
+        return error(problem, 400)
+    added = await request.app.state.batcher.submit(
+        'add_product', data['id'], data['name'], data['quantity'], data['price'], data.get('category', "")
+    )
+    if not added:
+        # add_product also refuses values the database cannot store
+        if data['id'] in db.inventory:
+            return error(f"Product {data['id']} already exists", 409)
+        return error(f"Product {data['id']} was rejected as invalid", 400)
+    return JSONResponse({'id': data['id']}, status_code=201)
+
+async def update_product(request):
+    """Replace a product's fields; pass "version" to fail with 409 if it changed since"""
+    product_id = request.path_params['product_id']
+    data = await read_json(request)
+    problem = invalid_product(data, with_id=False)
+    if problem:
+        return error(problem, 400)
+    try:
+        updated = await request.app.state.batcher.submit(
+            'update_product', product_id, data['name'], data['quantity'], data['price'],
+            data.get('category', ""), 'API', data.get('version')
+        )
+    except VersionConflictError as e:
+        return JSONResponse({'error': str(e), 'version': e.current_version}, status_code=409)
+    if not updated:
+        if product_id in request.app.state.db.inventory:
+            return error(f"Product {product_id} was rejected as invalid", 400)
+        return error(f"Product {product_id} not found", 404)
+    product = await run_in_threadpool(request.app.state.db.get_product, product_id)
+    return JSONResponse(dict(product or {}, id=product_id))
+
+async def delete_product(request):
+    product_id = request.path_params['product_id']
+    if not await request.app.state.batcher.submit('delete_product', product_id):
+        return error(f"Product {product_id} not found", 404)
+    return JSONResponse({'id': product_id})
+
+async def sell_product(request):
+    db = request.app.state.db
+    product_id = request.path_params['product_id']
+    data = await read_json(request)
+    if not isinstance(data, dict) or not is_int(data.get('quantity')) or data['quantity'] <= 0:
+        return error("Expected a positive integer quantity", 400)
+    if not await request.app.state.batcher.submit('sell_product', product_id, data['quantity']):
+        return write_failure(db, product_id)
+    return JSONResponse({'id': product_id, 'quantity': db.inventory.get(product_id, {}).get('quantity')})
+
+async def update_quantity(request):
+    db = request.app.state.db
+    product_id = request.path_params['product_id']
+    data = await read_json(request)
+    if not isinstance(data, dict) or not is_int(data.get('change')):
+        return error("Expected an integer change", 400)
+    if not await request.app.state.batcher.submit('update_quantity', product_id, data['change']):
+        return write_failure(db, product_id)
+    return JSONResponse({'id': product_id, 'quantity': db.inventory.get(product_id, {}).get('quantity')})
+
+async def bulk_sell(request):
+    """Sell many items at once: [{"id": ..., "quantity": ...}, ...]"""
+    data = await read_json(request)
+    if not isinstance(data, list):
+        return error("Expected a list of {id, quantity}", 400)
+    problem = next(filter(None, (invalid_item(item, 'quantity', positive=True) for item in data)), None)
+    if problem:
+        return error(problem, 400)
+    results = await asyncio.gather(*(
+        request.app.state.batcher.submit('sell_product', item['id'], item['quantity'])
+        for item in data
+    ))
+    return JSONResponse([{'id': item['id'], 'ok': ok} for item, ok in zip(data, results)])
+
+async def bulk_update(request):
+    """Adjust many quantities at once: [{"id": ..., "change": ...}, ...]"""
+    data = await read_json(request)
+    if not isinstance(data, list):
+        return error("Expected a list of {id, change}", 400)
+    problem = next(filter(None, (invalid_item(item, 'change') for item in data)), None)
+    if problem:
+        return error(problem, 400)
+    results = await asyncio.gather(*(
+        request.app.state.batcher.submit('update_quantity', item['id'], item['change'])
+        for item in data
+    ))
+    return JSONResponse([{'id': item['id'], 'ok': ok} for item, ok in zip(data, results)])
+
+async def bulk_add(request):
+    """Add many products at once: [{"id", "name", "quantity", "price", "category"}, ...]"""
+    data = await read_json(request)
+    if not isinstance(data, list):
+        return error("Expected a list of products", 400)
+    problem = next(filter(None, (invalid_product(item) for item in data)), None)
+    if problem:
+        return error(problem, 400)
+    results = await asyncio.gather(*(
+        request.app.state.batcher.submit(
+            'add_product', item['id'], item['name'], item['quantity'], item['price'], item.get('category', "")
+        )
+        for item in data
+    ))
+    return JSONResponse([{'id': item['id'], 'ok': ok} for item, ok in zip(data, results)])
+
+# ========================
+# Application
+# ========================
+
+def create_app(db=None, api_key=None):
+    """Build the ASGI app around an InventoryDB (a new one if not given)"""
+    if db is None:
+        db = InventoryDB()
+    if api_key is None:
+        api_key = os.getenv('INVENTORY_API_KEY')
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await app.state.batcher.start()
+        yield
+        await app.state.batcher.stop()
+
+    app = Starlette(
+        routes=[
+            Route('/status', get_status),
+            Route('/activities', get_activities),
+            Route('/products', list_products),
+            Route('/products', add_product, methods=['POST']),
+            Route('/products/{product_id}', get_product),
+            Route('/products/{product_id}', update_product, methods=['PUT']),
+            Route('/products/{product_id}', delete_product, methods=['DELETE']),
+            Route('/products/{product_id}/sell', sell_product, methods=['POST']),
+            Route('/products/{product_id}/quantity', update_quantity, methods=['POST']),
+            Route('/bulk/sell', bulk_sell, methods=['POST']),
+            Route('/bulk/quantity', bulk_update, methods=['POST']),
+            Route('/bulk/products', bulk_add, methods=['POST']),
+        ],
+        lifespan=lifespan
+    )
+    app.state.db = db
+    app.state.batcher = WriteBatcher(db)
+    app.add_middleware(APIKeyMiddleware, api_key=api_key)
+    return app
+
+def make_server(app, host=None, port=None):
+    config = uvicorn.Config(
+        app,
+        host=host or os.getenv('INVENTORY_API_HOST', '127.0.0.1'),
+        port=int(port or os.getenv('INVENTORY_API_PORT', 8000)),
+        timeout_keep_alive=int(os.getenv('INVENTORY_API_KEEP_ALIVE', 30)),
+        log_level='warning'
+    )
+    return uvicorn.Server(config)
+
+def start_api_server(db, host=None, port=None):
+    """Serve the API for an existing InventoryDB from a background thread"""
+    server = make_server(create_app(db), host, port)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    print("=== Inventory API Server ===")
+    make_server(create_app()).run()
@@ -1,11 +1,14 @@
 import streamlit as st
 from PIL import Image
-import time
-import threading
-import json
 import os
-from datetime import datetime
-from main import EmailAgent, InventoryManager, InventorySystem, WhatsAppAgent  # Assuming your code is in inventory_system.py
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from backup import export_database, import_database
+from history import TOTAL_KEY
+from alerts import STOCK_LOW, STOCK_OK, STOCK_OUT
+from main import EmailAgent, InventorySystem, WhatsAppAgent  # Assuming your code is in inventory_system.py
+from main import VersionConflictError
 
 # Set page config
 st.set_page_config(
@@ -18,6 +21,17 @@ st.set_page_config(
 # Password protection configuration
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")  # Change this to a strong password or set via environment variable
 
+# How often the dashboard pulls new changes from the database
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", 5))
+
+NEW_PRODUCT = "➕ New product"
+
+STOCK_STATUS_LABELS = {
+    STOCK_OUT: "❌ Out of Stock",
+    STOCK_LOW: "⚠️ Low Stock",
+    STOCK_OK: "✅ In Stock"
+}
+
 # Custom CSS for styling
 def local_css(file_name):
     with open(file_name) as f:
@@ -25,10 +39,42 @@ def local_css(file_name):
 
 local_css("style.css")  # You can create a style.css file for additional styling
 
-# Initialize the inventory system
-if 'system' not in st.session_state:
-    st.session_state.system = InventorySystem()
-    st.session_state.running = True
+# Initialize the inventory system. There is one per server process, shared by
+# every browser session, so all sessions work on the same database (and
+# compare-and-set updates see each other's writes); session_state only keeps
+# per-session UI state.
+class SharedSystem:
+    """The running InventorySystem and whether it is paused; replaced as a whole on restart"""
+    def __init__(self):
+        self.system = InventorySystem()
+        self.running = True
+        # Sessions share the buttons below; without the lock two restarts could
+        # both start a system and leave one monitor and scheduler running unseen
+        self.lock = threading.Lock()
+
+    def restart(self):
+        with self.lock:
+            self.system.shutdown()
+            self.system = InventorySystem()
+            self.running = True
+
+    def pause(self):
+        with self.lock:
+            if self.running:
+                self.system.pause()
+                self.running = False
+
+    def resume(self):
+        with self.lock:
+            if not self.running:
+                self.system.resume()
+                self.running = True
+
+@st.cache_resource
+def shared_system():
+    return SharedSystem()
+
+shared = shared_system()
 
 # Password protection function
 def check_password():
@@ -48,6 +94,89 @@ def check_password():
     
     return False
 
+# Live dashboard
+def sync_dashboard(db):
+    """Bring the cached dashboard view up to date from the change feed delta"""
+    view = st.session_state.get('dashboard_view')
+    events = None
+    if view is not None and view['feed'] is db.changes:
+        events = db.changes.since(view['seq'])
+
+    if events is None or any(event['kind'] in ('reset', 'clear_activity_log') for event in events):
+        # First run, restarted system or the feed moved past us: reload once
+        with db.lock:
+            view = {
+                'feed': db.changes,
+                'seq': db.changes.seq,
+                'status': db.get_inventory_status(),
+                'previous': None,
+                'activities': deque(db.get_recent_activities(10), maxlen=10)
+            }
+        st.session_state.dashboard_view = view
+    elif events:
+        view['seq'] = events[-1]['seq']
+        view['previous'] = view['status']
+        view['status'] = db.get_inventory_status()
+        for event in events:
+            if event['kind'] == 'activity':
+                view['activities'].appendleft(event['value'])
+    return view
+
+def metric_delta(view, key):
+    if not view['previous'] or view['status'][key] == view['previous'][key]:
+        return None
+    return view['status'][key] - view['previous'][key]
+
+# Product form
+def load_product_form(db, selection):
+    """Fill the product form from the selected product and remember the version it was read at"""
+    product = db.get_product(selection) if selection != NEW_PRODUCT else None
+    st.session_state.form_id = selection if product else ""
+    st.session_state.form_name = product['name'] if product else ""
+    st.session_state.form_category = product.get('category', "") if product else ""
+    st.session_state.form_quantity = int(product['quantity']) if product else 0
+    st.session_state.form_price = float(product['price']) if product else 0.0
+    st.session_state.edit_version = product.get('version', 0) if product else None
+    st.session_state.edit_loaded = selection
+
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS)
+def live_dashboard():
+    view = sync_dashboard(shared.system.db)
+    status = view['status']
+
+    # Stats columns
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("Total Products", status['total_products'], delta=metric_delta(view, 'total_products'))
+
+    with col2:
+        st.metric("Out of Stock", status['out_of_stock'], delta=metric_delta(view, 'out_of_stock'), delta_color="inverse")
+
+    with col3:
+        st.metric("Low Stock", status['low_stock'], delta=metric_delta(view, 'low_stock'), delta_color="off")
+
+    with col4:
+        value_delta = metric_delta(view, 'total_value')
+        st.metric(
+            "Total Value",
+            f"${status['total_value']:,.2f}",
+            delta=f"{value_delta:,.2f}" if value_delta is not None else None
+        )
+
+    st.markdown("---")
+
+    # Recent activity
+    st.subheader("📝 Recent Activities")
+
+    for activity in view['activities']:
+        with st.expander(f"{activity['timestamp']} - {activity['agent']}: {activity['action']}"):
+            st.write(activity['details'])
+            if "error" in activity['action'].lower():
+                st.error("This action encountered an error")
+            elif "alert" in activity['action'].lower():
+                st.warning("This is an alert notification")
+
 # Sidebar for navigation
 with st.sidebar:
     st.title("📦 AI Inventory Management")
@@ -69,65 +198,100 @@ with st.sidebar:
 
     # System status indicator
     status_placeholder = st.empty()
-    if st.session_state.running:
+    if shared.running:
         status_placeholder.success("✅ System Running")
     else:
         status_placeholder.warning("⚠️ System Paused")
 
+    # These act on the system every session shares
     if st.button("🔄 Restart System"):
-        st.session_state.system.shutdown()
-        st.session_state.system = InventorySystem()
-        st.session_state.running = True
+        shared.restart()
         st.rerun()
 
-    if st.session_state.running:
+    if shared.running:
         if st.button("⏸️ Pause System"):
-            st.session_state.system.inventory_manager.stop()
-            st.session_state.running = False
+            shared.pause()
             st.rerun()
     else:
         if st.button("▶️ Resume System"):
-            st.session_state.system.inventory_manager = InventoryManager(
-                st.session_state.system.db,
-                st.session_state.system.whatsapp_agent,
-                st.session_state.system.email_agent
-            )
-            st.session_state.running = True
+            shared.resume()
             st.rerun()
 
 # Dashboard Tab
 if selected_tab == "Dashboard":
     st.title("📊 Inventory Dashboard")
 
-    # Stats columns
-    status = st.session_state.system.db.get_inventory_status()
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.metric("Total Products", status['total_products'])
-
-    with col2:
-        st.metric("Out of Stock", status['out_of_stock'], delta_color="inverse")
+    live_dashboard()
 
-    with col3:
-        st.metric("Low Stock", status['low_stock'], delta_color="off")
-
-    with col4:
-        st.metric("Total Value", f"${status['total_value']:,.2f}")
+    # Per-location stock (INVENTORY_LOCATIONS)
+    locations = shared.system.locations
+    if locations:
+        st.markdown("---")
+        st.subheader("🏬 Locations")
+        location_status = locations.get_inventory_status()
+        st.dataframe(
+            [
+                {
+                    "Location": name,
+                    "Products": status['total_products'],
+                    "Low Stock": status['low_stock'],
+                    "Out of Stock": status['out_of_stock'],
+                    "Value": f"${status['total_value']:,.2f}"
+                }
+                for name, status in location_status['locations'].items()
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption(f"All locations: ${location_status['total_value']:,.2f} in stock")
+
+        with st.form("transfer_form"):
+            transfer_col1, transfer_col2, transfer_col3 = st.columns(3)
+            with transfer_col1:
+                transfer_source = st.selectbox("From", locations.names)
+            with transfer_col2:
+                transfer_destination = st.selectbox("To", locations.names, index=min(1, len(locations.names) - 1))
+            with transfer_col3:
+                transfer_quantity = st.number_input("Quantity", min_value=1, step=1, key="transfer_quantity")
+            transfer_product = st.text_input("Product ID", key="transfer_product")
+
+            if st.form_submit_button("Transfer Stock"):
+                if locations.transfer(transfer_product, transfer_source, transfer_destination, transfer_quantity, agent='Streamlit UI'):
+                    st.toast(f"Moved {transfer_quantity} of {transfer_product} to {transfer_destination}")
+                else:
+                    st.error("Transfer failed - check the product ID, locations and quantity")
 
+    # Stock trends from the point-in-time history
     st.markdown("---")
+    st.subheader("📈 Stock Trends")
+    db = shared.system.db
+    trend_col1, trend_col2 = st.columns([3, 1])
+    with trend_col1:
+        # A text box rather than a list of every product, which would load the whole catalog
+        trend_product = st.text_input(
+            "Product ID", placeholder="All products", key="trend_product"
+        ).strip() or TOTAL_KEY
+    with trend_col2:
+        trend_days = st.selectbox("Period", [1, 7, 30], index=1, format_func=lambda d: f"Last {d} day(s)", key="trend_days")
+
+    trend_end = datetime.now()
+    samples = db.history.sample(trend_product, trend_end - timedelta(days=trend_days), trend_end, points=60)
+    if any(quantity is not None for _, quantity in samples):
+        st.line_chart(
+            {"Time": [moment for moment, _ in samples], "Units in Stock": [quantity for _, quantity in samples]},
+            x="Time",
+            y="Units in Stock"
+        )
+    elif trend_product != TOTAL_KEY and db.get_product(trend_product) is None:
+        st.info(f"No product with ID {trend_product}")
+    else:
+        st.info("No stock history recorded for this period yet")
 
-    # Recent activity
-    st.subheader("📝 Recent Activities")
-    activities = st.session_state.system.db.get_recent_activities(10)
-
-    for activity in activities:
-        with st.expander(f"{activity['timestamp']} - {activity['agent']}: {activity['action']}"):
-            st.write(activity['details'])
-            if "error" in activity['action'].lower():
-                st.error("This action encountered an error")
-            elif "alert" in activity['action'].lower():
-                st.warning("This is an alert notification")
+    if st.button("📧 Email Stock History CSV"):
+        if shared.system.email_agent.send_history_report(trend_days):
+            st.toast("Stock history sent!")
+        else:
+            st.error("Failed to send stock history")
 
     # Quick actions
     st.markdown("---")
@@ -136,19 +300,19 @@ if selected_tab == "Dashboard":
 
     with action_col1:
         if st.button("📱 Get WhatsApp Update"):
-            st.session_state.system.whatsapp_agent.notify_activity()
+            shared.system.whatsapp_agent.notify_activity()
             st.toast("WhatsApp notification sent!")
 
     with action_col2:
         if st.button("📧 Send Email Report"):
-            if st.session_state.system.email_agent.send_daily_report():
+            if shared.system.email_agent.send_daily_report():
                 st.toast("Email report sent successfully!")
             else:
                 st.error("Failed to send email report")
 
     with action_col3:
         if st.button("🤖 Get AI Suggestions"):
-            st.session_state.system.whatsapp_agent.suggest_actions()
+            shared.system.whatsapp_agent.suggest_actions()
             st.toast("AI suggestions sent to WhatsApp!")
 
 # Inventory Tab
@@ -168,12 +332,12 @@ elif selected_tab == "Inventory":
         with search_col2:
             filter_category = st.selectbox(
                 "Filter by category",
-                ["All"] + list(set(p['category'] for p in st.session_state.system.db.inventory.values() if p['category']))
+                ["All"] + list(set(p['category'] for p in shared.system.db.inventory.values() if p['category']))
             )
 
         # Display inventory table
         inventory_data = []
-        for product_id, product in st.session_state.system.db.inventory.items():
+        for product_id, product in shared.system.db.inventory.items():
             if (not search_term or search_term.lower() in product['name'].lower()) and \
                (filter_category == "All" or product['category'] == filter_category):
                 inventory_data.append({
@@ -183,9 +347,9 @@ elif selected_tab == "Inventory":
                     "Quantity": product['quantity'],
                     "Price": f"${product['price']:.2f}",
                     "Last Updated": product['last_updated'],
-                    "Status": "❌ Out of Stock" if product['quantity'] <= 0 else \
-                             "⚠️ Low Stock" if product['quantity'] < 10 else \
-                             "✅ In Stock"
+                    "Status": STOCK_STATUS_LABELS.get(
+                        shared.system.db.get_stock_state(product_id), "✅ In Stock"
+                    )
                 })
 
         st.dataframe(
@@ -204,42 +368,58 @@ elif selected_tab == "Inventory":
     with tab2:
         st.subheader("Add/Update Products")
 
+        # Editing starts from the version shown here; saving fails rather than
+        # overwriting a change another operator made in the meantime
+        db = shared.system.db
+        edit_selection = st.selectbox(
+            "Product to Edit",
+            [NEW_PRODUCT] + list(db.inventory.keys()),
+            format_func=lambda x: x if x == NEW_PRODUCT else f"{x} - {db.inventory[x]['name']}",
+            key="edit_selection"
+        )
+        if st.session_state.get('edit_loaded') != edit_selection:
+            load_product_form(db, edit_selection)
+        # Set by a conflicting save, shown once the form holds the latest values
+        if st.session_state.get('edit_conflict'):
+            st.error(st.session_state.pop('edit_conflict'))
+
         with st.form("product_form"):
             col1, col2 = st.columns(2)
 
             with col1:
-                product_id = st.text_input("Product ID", placeholder="P001")
-                product_name = st.text_input("Product Name", placeholder="Wireless Mouse")
-                product_category = st.text_input("Category", placeholder="Electronics")
+                product_id = st.text_input(
+                    "Product ID", placeholder="P001", key="form_id",
+                    disabled=st.session_state.edit_version is not None
+                )
+                product_name = st.text_input("Product Name", placeholder="Wireless Mouse", key="form_name")
+                product_category = st.text_input("Category", placeholder="Electronics", key="form_category")
 
             with col2:
-                product_quantity = st.number_input("Quantity", min_value=0, step=1)
-                product_price = st.number_input("Price", min_value=0.0, step=0.01, format="%.2f")
+                product_quantity = st.number_input("Quantity", min_value=0, step=1, key="form_quantity")
+                product_price = st.number_input("Price", min_value=0.0, step=0.01, format="%.2f", key="form_price")
 
             submitted = st.form_submit_button("Save Product")
 
             if submitted:
-                if product_id in st.session_state.system.db.inventory:
-                    # Update existing product
-                    st.session_state.system.db.inventory[product_id]['name'] = product_name
-                    st.session_state.system.db.inventory[product_id]['category'] = product_category
-                    st.session_state.system.db.inventory[product_id]['quantity'] = product_quantity
-                    st.session_state.system.db.inventory[product_id]['price'] = product_price
-                    st.session_state.system.db.inventory[product_id]['last_updated'] = str(datetime.now())
-
-                    activity = {
-                        'timestamp': str(datetime.now()),
-                        'agent': 'Streamlit UI',
-                        'action': 'update_product',
-                        'details': f"Updated {product_name} (ID: {product_id})"
-                    }
-                    st.session_state.system.db.activity_log.append(activity)
-                    st.session_state.system.db.save_data()
-
-                    st.toast(f"Product {product_id} updated successfully!")
+                if st.session_state.edit_version is not None:
+                    # Update existing product (compare-and-set on the version it was loaded at)
+                    try:
+                        if db.update_product(
+                            product_id, product_name, product_quantity, product_price, product_category,
+                            agent='Streamlit UI', expected_version=st.session_state.edit_version
+                        ):
+                            st.session_state.edit_version += 1
+                            st.toast(f"Product {product_id} updated successfully!")
+                        else:
+                            st.error(f"Product {product_id} no longer exists!")
+                    except VersionConflictError as e:
+                        # Widget values can only be replaced before the form is drawn, so reload on a rerun
+                        st.session_state.edit_conflict = f"{e}. The form has been reloaded with the latest values; review them and save again."
+                        st.session_state.edit_loaded = None
+                        st.rerun()
                 else:
                     # Add new product
-                    if st.session_state.system.db.add_product(
+                    if shared.system.db.add_product(
                         product_id, product_name, product_quantity, product_price, product_category
                     ):
                         st.toast(f"Product {product_id} added successfully!")
@@ -255,13 +435,13 @@ elif selected_tab == "Inventory":
             with st.form("sell_form"):
                 sell_product_id = st.selectbox(
                     "Product to Sell",
-                    list(st.session_state.system.db.inventory.keys()),
-                    format_func=lambda x: f"{x} - {st.session_state.system.db.inventory[x]['name']}"
+                    list(shared.system.db.inventory.keys()),
+                    format_func=lambda x: f"{x} - {shared.system.db.inventory[x]['name']}"
                 )
                 sell_quantity = st.number_input("Quantity", min_value=1, step=1)
 
                 if st.form_submit_button("Sell Product"):
-                    if st.session_state.system.db.sell_product(sell_product_id, sell_quantity):
+                    if shared.system.db.sell_product(sell_product_id, sell_quantity):
                         st.toast(f"Sold {sell_quantity} of {sell_product_id}")
                     else:
                         st.error("Failed to sell product - check quantity")
@@ -270,14 +450,14 @@ elif selected_tab == "Inventory":
             with st.form("update_form"):
                 update_product_id = st.selectbox(
                     "Product to Update",
-                    list(st.session_state.system.db.inventory.keys()),
-                    format_func=lambda x: f"{x} - {st.session_state.system.db.inventory[x]['name']}",
+                    list(shared.system.db.inventory.keys()),
+                    format_func=lambda x: f"{x} - {shared.system.db.inventory[x]['name']}",
                     key="update_select"
                 )
                 quantity_change = st.number_input("Quantity Change", step=1)
 
                 if st.form_submit_button("Update Quantity"):
-                    if st.session_state.system.db.update_quantity(update_product_id, quantity_change):
+                    if shared.system.db.update_quantity(update_product_id, quantity_change):
                         st.toast(f"Updated {update_product_id} by {quantity_change}")
                     else:
                         st.error("Failed to update quantity")
@@ -318,6 +498,37 @@ elif selected_tab == "Agents Activity":
 
     st.markdown("---")
 
+    st.subheader("⏰ Scheduled Jobs")
+    scheduled_jobs = shared.system.scheduler.get_jobs()
+    if scheduled_jobs:
+        st.dataframe(
+            [
+                {
+                    "Job": job['name'],
+                    "Schedule": job['schedule'],
+                    "Next Run": job['next_run'],
+                    "Last Run": job['last_run'] or "-",
+                    "Status": "⏳ Running" if job['running'] else ("❌ " + job['last_error'] if job['last_error'] else "✅ Idle")
+                }
+                for job in scheduled_jobs
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        run_col1, run_col2 = st.columns([3, 1])
+        with run_col1:
+            job_to_run = st.selectbox("Job", [job['name'] for job in scheduled_jobs], label_visibility="collapsed")
+        with run_col2:
+            if st.button("▶️ Run Now"):
+                if shared.system.scheduler.run_now(job_to_run):
+                    st.toast(f"Started {job_to_run}")
+                else:
+                    st.warning(f"{job_to_run} is already running")
+    else:
+        st.info("No scheduled jobs in this process")
+
+    st.markdown("---")
+
     st.subheader("Agent Communication Log")
 
     # Filter options
@@ -332,7 +543,7 @@ elif selected_tab == "Agents Activity":
         time_filter = st.selectbox("Time Range", ["Last 24 hours", "Last week", "Last month", "All time"])
 
     # Filter activities
-    filtered_activities = st.session_state.system.db.activity_log.copy()
+    filtered_activities = shared.system.db.activity_log.copy()
 
     if agent_filter != "All":
         filtered_activities = [a for a in filtered_activities if a['agent'] == agent_filter]
@@ -386,7 +597,9 @@ elif selected_tab == "Settings":
             os.environ['TWILIO_AUTH_TOKEN'] = twilio_auth_token
             os.environ['TWILIO_WHATSAPP_NUMBER'] = twilio_whatsapp_number
             os.environ['RECIPIENT_WHATSAPP_NUMBER'] = recipient_whatsapp_number
-            st.session_state.system.whatsapp_agent = WhatsAppAgent(st.session_state.system.db)
+            shared.system.whatsapp_agent = WhatsAppAgent(
+                shared.system.db, context=shared.system.whatsapp_agent.context
+            )
             st.toast("WhatsApp settings updated!")
 
     with st.expander("✉️ Email Settings", expanded=False):
@@ -403,51 +616,90 @@ elif selected_tab == "Settings":
             os.environ['SMTP_EMAIL'] = smtp_email
             os.environ['SMTP_PASSWORD'] = smtp_password
             os.environ['RECIPIENT_EMAIL'] = recipient_email
-            st.session_state.system.email_agent = EmailAgent(st.session_state.system.db)
+            shared.system.email_agent = EmailAgent(shared.system.db)
             st.toast("Email settings updated!")
 
+    with st.expander("📉 Stock Thresholds", expanded=False):
+        st.markdown("Configure when products count as low on stock")
+        thresholds = shared.system.db.thresholds
+        # Locations share one set of thresholds, so every shard has to re-index
+        threshold_owner = shared.system.locations or shared.system.db
+
+        default_threshold = st.number_input("Default threshold", min_value=1, step=1, value=int(thresholds.default))
+        if st.button("Save Default Threshold"):
+            threshold_owner.set_default_threshold(default_threshold)
+            st.toast("Default threshold updated!")
+
+        threshold_col1, threshold_col2 = st.columns(2)
+
+        with threshold_col1:
+            threshold_category = st.text_input("Category", placeholder="Electronics", key="threshold_category")
+            category_threshold = st.number_input("Category threshold (0 clears)", min_value=0, step=1, key="category_threshold")
+            if st.button("Save Category Threshold") and threshold_category:
+                threshold_owner.set_category_threshold(threshold_category, category_threshold or None)
+                st.toast(f"Threshold for {threshold_category} updated!")
+
+        with threshold_col2:
+            threshold_product_id = st.text_input("Product ID", placeholder="P001", key="threshold_product_id")
+            sku_threshold = st.number_input("Product threshold (0 clears)", min_value=0, step=1, key="sku_threshold")
+            if st.button("Save Product Threshold") and threshold_product_id:
+                threshold_owner.set_sku_threshold(threshold_product_id, sku_threshold or None)
+                st.toast(f"Threshold for {threshold_product_id} updated!")
+
+        st.json({
+            "by_category": thresholds.by_category,
+            "by_sku": thresholds.by_sku
+        })
+
     with st.expander("🔄 System Maintenance", expanded=False):
         st.warning("These actions will affect the running system")
 
         if st.button("🔄 Reset Inventory Database"):
-            st.session_state.system.db.inventory = {}
-            st.session_state.system.db.activity_log = []
-            st.session_state.system.db.save_data()
+            shared.system.db.reset_database()
             st.toast("Inventory database reset!")
 
         if st.button("🧹 Clear Activity Log"):
-            st.session_state.system.db.activity_log = []
-            st.session_state.system.db.save_data()
+            shared.system.db.clear_activity_log()
             st.toast("Activity log cleared!")
 
-        if st.button("📤 Export Database"):
-            with open("inventory_export.json", "w") as f:
-                json.dump({
-                    "inventory": st.session_state.system.db.inventory,
-                    "activity_log": st.session_state.system.db.activity_log
-                }, f)
-
-            with open("inventory_export.json", "rb") as f:
-                st.download_button(
-                    label="Download Export",
-                    data=f,
-                    file_name="inventory_export.json",
-                    mime="application/json"
-                )
+    with st.expander("📦 Export / Import", expanded=False):
+        st.markdown("Stream the database to or from an NDJSON file, one product or activity per line")
+        db = shared.system.db
 
-# Real-time updates
-def update_dashboard():
-    while True:
-        if st.session_state.running:
-            status = st.session_state.system.db.get_inventory_status()
+        export_col1, export_col2 = st.columns(2)
+        with export_col1:
+            export_categories = st.multiselect(
+                "Categories (empty exports all)",
+                sorted(set(p['category'] for p in db.inventory.values() if p['category']))
+            )
+            export_compress = st.checkbox("Compress (gzip)", value=True)
+        with export_col2:
+            export_dates = st.date_input("Changed between (optional)", value=(), key="export_dates")
 
-            # Update metrics (this would need Streamlit's experimental features)
-            # For now, we'll just sleep
-            time.sleep(5)
-        else:
-            time.sleep(1)
+        if st.button("📤 Export Database"):
+            export_file = "inventory_export.ndjson.gz" if export_compress else "inventory_export.ndjson"
+            start, end = (export_dates + (None, None))[:2] if export_dates else (None, None)
+            counts = export_database(db, export_file, categories=export_categories, start=start, end=end or start)
+            if counts is None:
+                st.error("Export failed")
+            else:
+                st.toast(f"Exported {counts['products']} products and {counts['activities']} activities")
+                with open(export_file, "rb") as f:
+                    st.download_button(
+                        label="Download Export",
+                        data=f,
+                        file_name=export_file,
+                        mime="application/gzip" if export_compress else "application/x-ndjson"
+                    )
 
-# Start the update thread
-if 'update_thread' not in st.session_state:
-    st.session_state.update_thread = threading.Thread(target=update_dashboard, daemon=True)
-    st.session_state.update_thread.start()
+        st.markdown("---")
+        import_file = st.file_uploader("Export file to import", type=["ndjson", "gz", "zst"])
+        import_mode = st.radio(
+            "Import mode", ["Replace everything", "Merge into current data"], horizontal=True
+        )
+        if st.button("📥 Import Database") and import_file is not None:
+            counts = import_database(db, import_file, 'replace' if import_mode == "Replace everything" else 'merge')
+            if counts is None:
+                st.error("Import failed - the database was left as it was")
+            else:
+                st.toast(f"Imported {counts['products']} products and {counts['activities']} activities")
@@ -0,0 +1,286 @@
+import asyncio
+import os
+from contextlib import suppress
+from datetime import datetime
+
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.rest import Client
+
+from alerts import alert_details, alert_message, alert_products
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+# ========================
+# Async Agents
+# ========================
+#
+# asyncio counterparts of WhatsAppAgent, EmailAgent and InventoryManager.
+# Each wraps an instance of its blocking twin for configuration and message
+# templates but makes outbound calls without blocking the event loop, so one
+# process can fan a notification out to many recipients without a thread
+# per call.
+# Outbound calls per agent are bounded by a semaphore sized by
+# INVENTORY_AGENT_CONCURRENCY; callers waiting for a slot, and calls in
+# flight, can be cancelled like any other task. Database calls take the
+# InventoryDB lock (and may save), so they run in the default thread pool.
+
+def agent_concurrency(max_concurrency=None):
+    return max_concurrency or int(os.getenv('INVENTORY_AGENT_CONCURRENCY', 10))
+
+class AsyncWhatsAppAgent:
+    """WhatsApp notifications and Gemini responses on an event loop, for a WhatsAppAgent"""
+    def __init__(self, agent, max_concurrency=None):
+        self.db = agent.db
+        self.agent = agent
+        self.name = agent.name
+        self.model = agent.model
+        self.limit = asyncio.Semaphore(agent_concurrency(max_concurrency))
+        # Created on first use: the aiohttp session must belong to the running loop
+        self.http_client = None
+        self.twilio_client = None
+
+    def get_twilio_client(self):
+        if self.twilio_client is None and self.agent.twilio_client:
+            self.http_client = AsyncTwilioHttpClient()
+            self.twilio_client = Client(
+                self.agent.twilio_account_sid,
+                self.agent.twilio_auth_token,
+                http_client=self.http_client
+            )
+        return self.twilio_client
+
+    async def send_real_whatsapp(self, message, to=None, log=True):
+        """Send a WhatsApp message through Twilio without blocking the loop"""
+        client = self.get_twilio_client()
+        if not client:
+            print("WhatsApp not configured - cannot send message")
+            return False
+
+        from_whatsapp, to_whatsapp = self.agent.whatsapp_numbers(to)
+        try:
+            async with self.limit:
+                sent = await client.messages.create_async(
+                    body=message,
+                    from_=from_whatsapp,
+                    to=to_whatsapp
+                )
+            print(f"WhatsApp message sent successfully! SID: {sent.sid}")
+            if log:
+                await asyncio.to_thread(
+                    self.db.log_activity, self.name, 'whatsapp_notification',
+                    f"Sent WhatsApp to {to or self.agent.recipient_number}: {message}"
+                )
+            return True
+        except Exception as e:
+            error_msg = f"Failed to send WhatsApp to {to_whatsapp}: {str(e)}"
+            print(error_msg)
+            if log:
+                await asyncio.to_thread(self.db.log_activity, self.name, 'whatsapp_error', error_msg)
+            return False
+
+    async def send_message(self, message, to=None):
+        """Send a WhatsApp-style message (console and real)"""
+        timestamp = datetime.now().strftime("%H:%M")
+        print(f"[{timestamp}] {self.name}: {message}")
+
+        sent = False
+        if self.agent.twilio_client:
+            sent = await self.send_real_whatsapp(message, to)
+
+        await asyncio.to_thread(self.db.log_activity, self.name, 'notification', message)
+        return sent
+
+    async def send_to_many(self, message, recipients):
+        """Send one message to many numbers concurrently; returns a success flag per recipient"""
+        if not recipients:
+            return []
+        results = await asyncio.gather(
+            *(self.send_real_whatsapp(message, to, log=False) for to in recipients),
+            return_exceptions=True
+        )
+        sent = [result is True for result in results]
+        # One log entry for the whole fan-out: every entry saves the database
+        await asyncio.to_thread(
+            self.db.log_activity, self.name, 'whatsapp_notification',
+            f"Sent WhatsApp to {sum(sent)} of {len(sent)} recipient(s): {message}"
+        )
+        return sent
+
+    async def get_ai_response(self, prompt, cache_key=None):
+        """Get AI-generated response using Gemini, reusing a cached answer for cache_key"""
+        if cache_key is not None:
+            cached = self.agent.prompt_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        try:
+            async with self.limit:
+                response = await self.model.generate_content_async(self.agent.assistant_prompt(prompt))
+            if cache_key is not None:
+                self.agent.prompt_cache.put(cache_key, response.text)
+            return response.text
+        except Exception as e:
+            return f"Sorry, I encountered an error: {str(e)}"
+
+    async def notify_activity(self):
+        """Notify about recent activities"""
+        activities = await asyncio.to_thread(self.db.get_recent_activities, 5)
+        return await self.send_message(self.agent.activity_message(activities))
+
+    async def suggest_actions(self):
+        """Use AI to suggest inventory actions"""
+        prompt, cache_key = await asyncio.to_thread(self.agent.suggestion_prompt)
+        suggestion = await self.get_ai_response(prompt, cache_key)
+        return await self.send_message("🤖 AI Suggestions:\n" + suggestion)
+
+    async def close(self):
+        """Close the pooled HTTP session"""
+        if self.http_client:
+            await self.http_client.close()
+        self.http_client = None
+        self.twilio_client = None
+
+class AsyncEmailAgent:
+    """Email notifications on an event loop, for an EmailAgent
+
+    Uses aiosmtplib if it is installed; otherwise each SMTP conversation
+    runs in the default thread pool, still bounded by the semaphore.
+    """
+    def __init__(self, agent, max_concurrency=None, batch_size=None):
+        self.db = agent.db
+        self.agent = agent
+        self.name = agent.name
+        self.limit = asyncio.Semaphore(agent_concurrency(max_concurrency))
+        self.batch_size = batch_size or int(os.getenv('INVENTORY_EMAIL_BATCH', 20))
+
+    async def deliver(self, msg, recipients=None):
+        """Send a built message over one SMTP session, readdressed to each recipient if given"""
+        if aiosmtplib is None:
+            await asyncio.to_thread(self.agent.deliver, msg, recipients)
+            return
+        async with aiosmtplib.SMTP(
+            hostname=self.agent.smtp_server,
+            port=self.agent.smtp_port,
+            username=self.agent.sender_email,
+            password=self.agent.sender_password,
+            start_tls=True
+        ) as server:
+            for recipient in recipients or [msg['To']]:
+                msg.replace_header('To', recipient)
+                await server.send_message(msg)
+
+    async def send_email(self, subject, body, attachments=None, to_email=None):
+        """Send email with optional attachments"""
+        if to_email is None:
+            to_email = self.agent.recipient_email
+
+        if not self.agent.is_configured():
+            print("Email not configured properly - cannot send message")
+            return False
+
+        try:
+            msg = await asyncio.to_thread(self.agent.build_message, subject, body, attachments, to_email)
+            print(f"Attempting to send email to {to_email} with subject: {subject}")
+            async with self.limit:
+                await self.deliver(msg)
+            print("Email sent successfully!")
+            await asyncio.to_thread(
+                self.db.log_activity, self.name, 'send_email',
+                f"Sent email to {to_email} with subject: {subject}"
+            )
+            return True
+        except Exception as e:
+            error_msg = f"Failed to send email to {to_email}: {str(e)}"
+            print(error_msg)
+            await asyncio.to_thread(self.db.log_activity, self.name, 'email_error', error_msg)
+            return False
+
+    async def send_batch(self, subject, body, recipients, attachments=None):
+        # Each batch gets its own message object since deliver() readdresses it
+        msg = await asyncio.to_thread(self.agent.build_message, subject, body, attachments, recipients[0])
+        async with self.limit:
+            await self.deliver(msg, recipients)
+        return True
+
+    async def send_to_many(self, subject, body, recipients, attachments=None):
+        """Send one email to many addresses, batch_size per SMTP session, batches in parallel
+
+        Returns a success flag per recipient; a failed session fails its whole batch.
+        """
+        if not recipients:
+            return []
+        if not self.agent.is_configured():
+            print("Email not configured properly - cannot send message")
+            return [False] * len(recipients)
+
+        batches = [recipients[i:i + self.batch_size] for i in range(0, len(recipients), self.batch_size)]
+        results = await asyncio.gather(
+            *(self.send_batch(subject, body, batch, attachments) for batch in batches),
+            return_exceptions=True
+        )
+        sent = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                print(f"Failed to send email to {len(batch)} recipient(s): {str(result)}")
+            sent.extend([result is True] * len(batch))
+        await asyncio.to_thread(
+            self.db.log_activity, self.name, 'send_email',
+            f"Sent email to {sum(sent)} of {len(sent)} recipient(s) with subject: {subject}"
+        )
+        return sent
+
+    async def send_activity_notification(self, message):
+        """Send immediate notification about important activities"""
+        return await self.send_email(*self.agent.activity_notification(message))
+
+class AsyncInventoryManager:
+    """Stock monitor running as a task on the event loop"""
+    def __init__(self, db, whatsapp_agent, email_agent, interval=60, notifier=None):
+        self.db = db
+        self.whatsapp_agent = whatsapp_agent
+        self.email_agent = email_agent
+        self.notifier = notifier
+        self.name = "Inventory Manager"
+        self.interval = interval
+        self.task = None
+
+    async def check_inventory(self):
+        """Send the current stock alerts over both channels at once"""
+        alerts = await asyncio.to_thread(alert_products, self.db)
+        if self.notifier and self.notifier.subscriptions:
+            await self.notifier.deliver(self.notifier.audiences(alerts), self.whatsapp_agent, self.email_agent)
+        else:
+            for action, products in alerts:
+                message = alert_message(action, products)
+                await asyncio.gather(
+                    self.whatsapp_agent.send_message(message),
+                    self.email_agent.send_activity_notification(message)
+                )
+        for action, products in alerts:
+            await asyncio.to_thread(self.db.log_activity, self.name, action, alert_details(action, products))
+
+    async def monitor_inventory(self):
+        """Background monitoring of inventory"""
+        while True:
+            try:
+                await self.check_inventory()
+            except Exception as e:
+                print(f"Error in inventory monitoring: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start monitoring on the running event loop"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.monitor_inventory())
+        return self.task
+
+    async def stop(self):
+        """Cancel the monitor, including any notifications it is sending"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
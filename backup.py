@@ -0,0 +1,354 @@
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, time
+
+from main import InventoryDB, product_value_error
+from replication import ReplicaDB
+from snapshot import (COMPRESSION_NONE, BinarySnapshot, MappedActivities, MappedProducts,
+                      atomic_write, zstandard)
+
+# ========================
+# Database Export
+# ========================
+#
+# A full or filtered copy of the database as NDJSON, one record per line:
+#   {"type": "header", "format": "inventory-ndjson", "version": 1, ...}
+#   {"type": "product", "id": "P001", "name": ..., "quantity": ..., ...}
+#   {"type": "activity", "timestamp": ..., "agent": ..., ...}
+# optionally gzip (.gz) or zstd (.zst) compressed. Records are written and
+# read one at a time, so neither side ever holds the encoded file. Export
+# copies the database's snapshot files under the lock (or writes fresh ones
+# if the saved files are behind) and streams rows from the copies after
+# releasing it. Import checks the whole file before the database changes:
+# a replace stages the products in a new store that then becomes the
+# database's, a merge reads the file twice, once to check it and once to
+# apply it record by record.
+#
+#   python backup.py export inventory_export.ndjson.gz --category Electronics --since 2024-01-01
+#   python backup.py import inventory_export.ndjson.gz [--merge]
+
+FORMAT = 'inventory-ndjson'
+VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def compression_for(path):
+    """Pick the compression from the file extension"""
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+def time_key(value, end=False):
+    """Timestamps are stored as str(datetime), so range checks are string comparisons"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        # A bare date covers the whole day
+        value = datetime.combine(value, time.max if end else time.min)
+    return str(value)
+
+@contextmanager
+def open_writer(path, compression='none'):
+    """Text stream into path, compressed as asked; the file appears only when complete"""
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+    with atomic_write(path) as f:
+        if compression == 'gzip':
+            body = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6)
+        elif compression == 'zstd':
+            body = zstandard.ZstdCompressor().stream_writer(f, closefd=False)
+        else:
+            body = f
+        out = io.TextIOWrapper(body, encoding='utf-8', newline='\n')
+        yield out
+        out.flush()
+        out.detach()
+        if body is not f:
+            body.close()
+
+@contextmanager
+def open_reader(source):
+    """Text stream over a path or binary file object (read from the start), decompressing by magic number"""
+    f = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        f.seek(0)
+        magic = f.read(4)
+        f.seek(0)
+        if magic.startswith(GZIP_MAGIC):
+            body = gzip.GzipFile(fileobj=f, mode='rb')
+        elif magic == ZSTD_MAGIC:
+            if zstandard is None:
+                raise ValueError("Reading zstd exports requires the zstandard package")
+            body = zstandard.ZstdDecompressor().stream_reader(f, closefd=False)
+        else:
+            body = f
+        yield io.TextIOWrapper(body, encoding='utf-8')
+    finally:
+        if f is not source:
+            f.close()
+
+def write_record(out, record):
+    out.write(json.dumps(record))
+    out.write('\n')
+
+def copy_snapshots(db, directory):
+    """Private uncompressed snapshots of db's products and activities, opened for row access
+
+    Call under db.lock. The saved files are copied when they match memory;
+    otherwise (unsaved changes, other formats, replicas) the state is dumped.
+    Returns the two mappings; close them and remove their files when done.
+    """
+    saved = (
+        isinstance(db.snapshot, BinarySnapshot) and db.snapshot.compression == COMPRESSION_NONE
+        and not db._batch_depth and not db._dirty and not isinstance(db, ReplicaDB)
+    )
+    snapshot = BinarySnapshot()
+    mappings = []
+    try:
+        for source, dump, data, mapping in (
+            (db.filename, snapshot.dump_products, db.inventory, MappedProducts),
+            (db.log_filename, snapshot.dump_activities, db.activity_log, MappedActivities)
+        ):
+            fd, path = tempfile.mkstemp(suffix='.export', dir=directory)
+            os.close(fd)
+            try:
+                if saved and os.path.exists(source):
+                    shutil.copyfile(source, path)
+                    try:
+                        mappings.append(mapping(path))
+                        continue
+                    except ValueError:
+                        # An older snapshot version; write a current one instead
+                        pass
+                dump(data, path)
+                mappings.append(mapping(path))
+            except Exception:
+                os.remove(path)
+                raise
+    except Exception:
+        close_snapshots(mappings)
+        raise
+    return mappings
+
+def close_snapshots(mappings):
+    for mapped in mappings:
+        path = mapped.file.path
+        mapped.close()
+        os.remove(path)
+
+def export_database(db, path, compression=None, categories=None, start=None, end=None):
+    """Stream products, then activities, to an NDJSON file
+
+    categories limits the products; start/end (datetimes, or dates meaning
+    whole days) limit products by last update and activities by timestamp.
+    Returns {'products': n, 'activities': n}, or None on error.
+    """
+    compression = compression or compression_for(path)
+    categories = set(categories) if categories else None
+    start_key, end_key = time_key(start), time_key(end, end=True)
+    counts = {'products': 0, 'activities': 0}
+
+    def in_range(timestamp):
+        return (start_key is None or timestamp >= start_key) and (end_key is None or timestamp <= end_key)
+
+    try:
+        # A copy of the snapshot files is one consistent state that can be
+        # read row by row, encoded and compressed without holding up writers
+        with db.lock:
+            products, activities = copy_snapshots(db, os.path.dirname(os.path.abspath(path)))
+        try:
+            with open_writer(path, compression) as out:
+                write_record(out, {
+                    'type': 'header',
+                    'format': FORMAT,
+                    'version': VERSION,
+                    'exported_at': str(datetime.now()),
+                    'filters': {
+                        'categories': sorted(categories) if categories else None,
+                        'start': start_key,
+                        'end': end_key
+                    }
+                })
+
+                for row in range(products.count):
+                    product = products.product_at(row)
+                    if ((categories is None or product.get('category', '') in categories)
+                            and in_range(product.get('last_updated', ''))):
+                        write_record(out, {'type': 'product', 'id': products.id_at(row), **product})
+                        counts['products'] += 1
+
+                for index in range(activities.count):
+                    activity = activities.activity_at(index)
+                    if in_range(activity['timestamp']):
+                        write_record(out, {'type': 'activity', **activity})
+                        counts['activities'] += 1
+        finally:
+            close_snapshots([products, activities])
+    except Exception as e:
+        print(f"Error exporting database: {str(e)}")
+        return None
+    return counts
+
+# ========================
+# Database Import
+# ========================
+
+def product_record(record):
+    """Check an exported product and fill in optional fields; raises ValueError if unusable"""
+    product_id = record.pop('id', None)
+    if not isinstance(product_id, str) or not product_id:
+        raise ValueError(f"Product record without an id: {record}")
+    if not all(key in record for key in ('name', 'quantity', 'price')):
+        raise ValueError(f"Product {product_id} lacks a name, quantity or price")
+    record.setdefault('category', "")
+    problem = product_value_error(record['name'], record['quantity'], record['price'], record['category'])
+    if problem:
+        raise ValueError(f"Product {product_id}: {problem}")
+    if not isinstance(record.setdefault('version', 0), int):
+        raise ValueError(f"Product {product_id}: version must be an integer")
+    record.setdefault('last_updated', str(datetime.now()))
+    return product_id, record
+
+def read_records(source):
+    """Yield ('product', (product_id, product)) and ('activity', activity) from an export, checking each"""
+    with open_reader(source) as lines:
+        header = json.loads(next(lines, '') or 'null')
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise ValueError("Not an inventory export")
+        if header.get('version', 0) > VERSION:
+            raise ValueError(f"Unsupported export version {header.get('version')}")
+
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop('type', None) if isinstance(record, dict) else None
+            if kind == 'product':
+                yield kind, product_record(record)
+            elif kind == 'activity':
+                yield kind, record
+
+def read_export(db, source):
+    """Read and validate a whole export into (staged products, activities)"""
+    products = db.new_store()
+    activities = []
+    for kind, record in read_records(source):
+        if kind == 'product':
+            product_id, product = record
+            products[product_id] = product
+        else:
+            activities.append(record)
+    return products, activities
+
+def check_export(source):
+    """Read a whole export without keeping it; raises ValueError (or a JSON error) if unusable"""
+    for _ in read_records(source):
+        pass
+
+def replace_database(db, products, activities):
+    """Make a staged store and activity list the database's contents (call in db.batch())"""
+    db._reset()
+    db.inventory = products
+    db.activity_log = activities
+    db.stock_index.rebuild(products)
+    rows = products.scan() if hasattr(products, 'scan') else products.items()
+    for product_id, product in rows:
+        db.history.record(product_id, product['quantity'])
+        db.changes.publish('product', product_id, dict(product))
+    for activity in activities:
+        db.changes.publish('activity', value=activity)
+    return {'products': len(products), 'activities': len(activities)}
+
+def merge_into_database(db, source):
+    """Upsert an export's products and append its activities as they are read (call in db.batch())"""
+    counts = {'products': 0, 'activities': 0}
+    for kind, record in read_records(source):
+        if kind == 'product':
+            product_id, record = record
+            existing = db.inventory.get(product_id)
+            if existing is not None:
+                record['version'] = max(record['version'], existing.get('version', 0))
+            db.inventory[product_id] = record
+            db._product_changed(product_id, bump=existing is not None)
+            counts['products'] += 1
+        else:
+            db.activity_log.append(record)
+            db.changes.publish('activity', value=record)
+            counts['activities'] += 1
+    return counts
+
+def import_database(db, source, mode='replace'):
+    """Load an export into db, replacing everything or merging into it
+
+    source is a path or a seekable binary file object (e.g. a Streamlit
+    upload). 'replace' resets the database first and keeps the exported
+    versions; 'merge' upserts products, bumping the version of existing
+    ones so compare-and-set writes notice, and appends the activities.
+    The file is read and checked in full before the database changes, so
+    a bad file leaves it untouched; the database is then saved once.
+    Replicas refuse: an import has to run on the writer.
+    Returns {'products': n, 'activities': n}, or None.
+    """
+    if mode not in ('replace', 'merge'):
+        print(f"Unknown import mode {mode}")
+        return None
+    if isinstance(db, ReplicaDB):
+        print("Imports must run on the inventory writer, not on a replica")
+        return None
+
+    try:
+        # A replace keeps the staged store, so the file is only held once; a
+        # merge is applied from a second read instead of a staged copy
+        if mode == 'replace':
+            products, activities = read_export(db, source)
+        else:
+            check_export(source)
+    except Exception as e:
+        print(f"Error importing database: {str(e)}")
+        return None
+
+    with db.batch():
+        history_mark = len(db.history.pending)
+        try:
+            if mode == 'replace':
+                counts = replace_database(db, products, activities)
+            else:
+                counts = merge_into_database(db, source)
+        except Exception as e:
+            # Put back the saved state and tell followers, who saw part of the import
+            print(f"Error importing database: {str(e)}")
+            db.history.rollback(history_mark)
+            db.load_data()
+            db.changes.publish('reset')
+            for product_id, product in list(db.inventory.items()):
+                db.changes.publish('product', product_id, dict(product))
+            return None
+        db.save_data()
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import the inventory database as NDJSON")
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('path')
+    parser.add_argument('--category', action='append', help="export only these categories (repeatable)")
+    parser.add_argument('--since', type=date.fromisoformat, help="export changes from this date (YYYY-MM-DD)")
+    parser.add_argument('--until', type=date.fromisoformat, help="export changes up to this date")
+    parser.add_argument('--merge', action='store_true', help="merge into the database instead of replacing it")
+    args = parser.parse_args()
+
+    db = InventoryDB()
+    if args.command == 'export':
+        counts = export_database(db, args.path, categories=args.category, start=args.since, end=args.until)
+    else:
+        counts = import_database(db, args.path, 'merge' if args.merge else 'replace')
+    if counts is None:
+        raise SystemExit(1)
+    print(f"{args.command.capitalize()}ed {counts['products']} products and {counts['activities']} activities")
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from snapshot import BinarySnapshot, JsonSnapshot, zstandard
+
+# ========================
+# Snapshot Benchmark
+# ========================
+#
+# Compares save/load time and file size of the legacy pretty-printed JSON
+# files against the binary snapshot format.
+#
+#   python bench_snapshot.py [products] [activities]
+
+def make_products(count):
+    start = datetime(2024, 1, 1)
+    return {
+        f"P{i:07d}": {
+            'name': f"Product {i}",
+            'quantity': i % 250,
+            'price': round(1 + (i % 1000) * 0.37, 2),
+            'category': f"Category {i % 40}",
+            'last_updated': str(start + timedelta(seconds=i, microseconds=i % 1000000)),
+            'version': i % 5 + 1
+        }
+        for i in range(count)
+    }
+
+def make_activities(count):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            'timestamp': str(start + timedelta(seconds=i, microseconds=i % 1000000)),
+            'agent': 'InventoryManager',
+            'action': 'sell_product',
+            'details': f"Sold {i % 7 + 1} of Product {i} (ID: P{i:07d}). Remaining Qty: {i % 250}"
+        }
+        for i in range(count)
+    ]
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def bench(snapshot, products, activities, directory):
+    products_path = os.path.join(directory, f"products.{snapshot.label}")
+    activities_path = os.path.join(directory, f"activities.{snapshot.label}")
+
+    save_time, _ = timed(lambda: (
+        snapshot.dump_products(products, products_path),
+        snapshot.dump_activities(activities, activities_path)
+    ))
+    load_time, (loaded_products, loaded_activities) = timed(lambda: (
+        dict(snapshot.load_products(products_path)),
+        snapshot.load_activities(activities_path)
+    ))
+    assert loaded_products == products and loaded_activities == activities
+
+    size = os.path.getsize(products_path) + os.path.getsize(activities_path)
+    return save_time, load_time, size
+
+if __name__ == "__main__":
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    activity_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    print(f"Generating {product_count} products and {activity_count} activities...")
+    products = make_products(product_count)
+    activities = make_activities(activity_count)
+
+    formats = [('json', JsonSnapshot()), ('binary', BinarySnapshot()), ('binary+gzip', BinarySnapshot('gzip'))]
+    if zstandard is not None:
+        formats.append(('binary+zstd', BinarySnapshot('zstd')))
+
+    print(f"\n{'format':<14}{'save (s)':>10}{'load (s)':>10}{'size (MB)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, snapshot in formats:
+            snapshot.label = label
+            save_time, load_time, size = bench(snapshot, products, activities, directory)
+            print(f"{label:<14}{save_time:>10.2f}{load_time:>10.2f}{size / 1e6:>12.1f}")
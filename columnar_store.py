@@ -0,0 +1,246 @@
+import numbers
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+
+# Timestamps are stored as naive microseconds since this epoch, so they
+# round-trip exactly to the str(datetime.now()) strings the DB has always used
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+FIELDS = ('name', 'quantity', 'price', 'category', 'last_updated', 'version')
+
+def timestamp_to_micros(value):
+    return (datetime.fromisoformat(value) - EPOCH) // MICROSECOND
+
+def micros_to_timestamp(micros):
+    return str(EPOCH + timedelta(microseconds=micros))
+
+# ========================
+# Product Row View
+# ========================
+
+class ProductRow(MutableMapping):
+    """Dict-like view of one product in a ColumnarInventory"""
+    __slots__ = ('store', 'product_id')
+
+    def __init__(self, store, product_id):
+        self.store = store
+        self.product_id = product_id
+
+    def __getitem__(self, key):
+        return self.store.get_field(self.product_id, key)
+
+    def __setitem__(self, key, value):
+        self.store.set_field(self.product_id, key, value)
+
+    def __delitem__(self, key):
+        self.store.delete_field(self.product_id, key)
+
+    def __iter__(self):
+        yield from FIELDS
+        yield from self.store.extras.get(self.product_id, ())
+
+    def __len__(self):
+        return len(FIELDS) + len(self.store.extras.get(self.product_id, ()))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+# ========================
+# Columnar Inventory
+# ========================
+
+class ColumnarInventory(MutableMapping):
+    """Product store with one typed column per field instead of one dict per product
+
+    Quantities, prices and timestamps live in arrays, categories are interned
+    to small integer codes, and product IDs map to row numbers. Indexing
+    returns a ProductRow view, so code written against the plain inventory
+    dict (product['quantity'] -= n, product.get('category'), dict(product))
+    keeps working. Fields outside FIELDS are kept in a sparse side dict.
+    Product count, units and stock value are kept per category code as the
+    fields change, so totals never need a pass over the rows.
+    """
+    def __init__(self, products=None):
+        """Optionally fill from a mapping or an iterable of (product_id, product)"""
+        self.ids = []
+        self.rows = {}
+        self.names = []
+        self.category_codes = array('I')
+        self.categories = []
+        self.category_lookup = {}
+        self.quantities = array('q')
+        self.prices = array('d')
+        self.updated = array('q')
+        self.versions = array('q')
+        self.extras = {}
+        self.category_counts = array('q')
+        self.category_units = array('q')
+        self.category_values = array('d')
+        if products:
+            items = products.items() if hasattr(products, 'items') else products
+            for product_id, product in items:
+                self[product_id] = product
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Adopt already-decoded columns (see BinarySnapshot.load_columns)"""
+        store = cls()
+        store.ids = columns['ids']
+        store.rows = {product_id: row for row, product_id in enumerate(store.ids)}
+        store.names = columns['names']
+        store.categories = columns['categories']
+        store.category_lookup = {category: code for code, category in enumerate(store.categories)}
+        store.category_codes = columns['category_codes']
+        store.quantities = columns['quantities']
+        store.prices = columns['prices']
+        store.updated = array('q', map(timestamp_to_micros, columns['timestamps']))
+        store.versions = columns['versions']
+        store.extras = columns['extras']
+        store.category_counts = array('q', [0]) * len(store.categories)
+        store.category_units = array('q', [0]) * len(store.categories)
+        store.category_values = array('d', [0.0]) * len(store.categories)
+        for code, quantity, price in zip(store.category_codes, store.quantities, store.prices):
+            store.category_counts[code] += 1
+            store.category_units[code] += quantity
+            store.category_values[code] += quantity * price
+        return store
+
+    def intern_category(self, category):
+        code = self.category_lookup.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self.category_lookup[category] = code
+            self.category_counts.append(0)
+            self.category_units.append(0)
+            self.category_values.append(0.0)
+        return code
+
+    def count_row(self, row, sign):
+        """Add (sign=1) or take back (sign=-1) a row's share of its category totals"""
+        code = self.category_codes[row]
+        self.category_counts[code] += sign
+        self.category_units[code] += sign * self.quantities[row]
+        self.category_values[code] += sign * self.quantities[row] * self.prices[row]
+
+    def get_field(self, product_id, key):
+        row = self.rows[product_id]
+        if key == 'quantity':
+            return self.quantities[row]
+        if key == 'price':
+            return self.prices[row]
+        if key == 'name':
+            return self.names[row]
+        if key == 'category':
+            return self.categories[self.category_codes[row]]
+        if key == 'last_updated':
+            return micros_to_timestamp(self.updated[row])
+        if key == 'version':
+            return self.versions[row]
+        return self.extras[product_id][key]
+
+    def set_field(self, product_id, key, value):
+        row = self.rows[product_id]
+        if key == 'quantity':
+            if not isinstance(value, numbers.Integral):
+                raise TypeError(f"quantity must be a whole number, not {value!r}")
+            self.count_row(row, -1)
+            self.quantities[row] = value
+            self.count_row(row, 1)
+        elif key == 'price':
+            self.count_row(row, -1)
+            self.prices[row] = value
+            self.count_row(row, 1)
+        elif key == 'name':
+            self.names[row] = value
+        elif key == 'category':
+            code = self.intern_category(value)
+            self.count_row(row, -1)
+            self.category_codes[row] = code
+            self.count_row(row, 1)
+        elif key == 'last_updated':
+            self.updated[row] = timestamp_to_micros(value)
+        elif key == 'version':
+            self.versions[row] = value
+        else:
+            self.extras.setdefault(product_id, {})[key] = value
+
+    def delete_field(self, product_id, key):
+        if key in FIELDS:
+            raise KeyError(f"Cannot delete column field {key}")
+        extras = self.extras[product_id]
+        del extras[key]
+        if not extras:
+            del self.extras[product_id]
+
+    def __getitem__(self, product_id):
+        if product_id not in self.rows:
+            raise KeyError(product_id)
+        return ProductRow(self, product_id)
+
+    def __setitem__(self, product_id, product):
+        if product_id not in self.rows:
+            self.rows[product_id] = len(self.ids)
+            self.ids.append(product_id)
+            self.names.append("")
+            self.category_codes.append(self.intern_category(""))
+            self.quantities.append(0)
+            self.prices.append(0.0)
+            self.updated.append(0)
+            self.versions.append(0)
+            self.count_row(len(self.ids) - 1, 1)
+        self.extras.pop(product_id, None)
+        for key, value in product.items():
+            self.set_field(product_id, key, value)
+
+    def __delitem__(self, product_id):
+        """Remove a product by moving the last row into its slot"""
+        row = self.rows.pop(product_id)
+        self.count_row(row, -1)
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.rows[moved] = row
+            self.ids[row] = moved
+            self.names[row] = self.names[last]
+            self.category_codes[row] = self.category_codes[last]
+            self.quantities[row] = self.quantities[last]
+            self.prices[row] = self.prices[last]
+            self.updated[row] = self.updated[last]
+            self.versions[row] = self.versions[last]
+        for column in (self.ids, self.names, self.category_codes, self.quantities, self.prices, self.updated, self.versions):
+            column.pop()
+        self.extras.pop(product_id, None)
+
+    def __contains__(self, product_id):
+        return product_id in self.rows
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"ColumnarInventory({len(self)} products)"
+
+    def clear(self):
+        self.__init__()
+
+    def to_dict(self):
+        """Materialise as the plain {product_id: product_dict} layout (e.g. for JSON)"""
+        return {product_id: dict(ProductRow(self, product_id)) for product_id in self.ids}
+
+    def total_value(self):
+        """Sum of quantity * price over all products"""
+        return sum(self.category_values)
+
+    def category_totals(self):
+        """Get {category: (product_count, total_quantity, total_value)}"""
+        return {
+            category: (self.category_counts[code], self.category_units[code], self.category_values[code])
+            for code, category in enumerate(self.categories)
+            if self.category_counts[code]
+        }
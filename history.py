@@ -0,0 +1,194 @@
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+# ========================
+# Stock History
+# ========================
+#
+# Every quantity change is appended to a binary log file as
+#   time(f64 epoch seconds) quantity(i64) id_length(u16) product_id(utf-8)
+# Absolute quantities are stored so the file never depends on earlier
+# records being intact. In memory each SKU keeps parallel arrays of times
+# and quantity deltas plus an absolute checkpoint every CHECKPOINT_INTERVAL
+# changes, so the quantity at any time is a bisect plus at most
+# CHECKPOINT_INTERVAL additions.
+
+RECORD = struct.Struct('<dqH')
+CHECKPOINT_INTERVAL = 32
+TOTAL_KEY = ''  # pseudo-SKU tracking the total number of units in stock
+
+class StockSeries:
+    """Delta-encoded quantity history of one SKU"""
+    __slots__ = ('times', 'deltas', 'checkpoints', 'quantity')
+
+    def __init__(self):
+        self.times = array('d')
+        self.deltas = array('q')
+        self.checkpoints = array('q')
+        self.quantity = 0
+
+    def append(self, when, quantity):
+        """Record a new quantity; returns the change, or 0 if it did not change"""
+        delta = quantity - self.quantity
+        if self.times and delta == 0:
+            return 0
+        # Keep times sorted even if the clock steps backwards
+        if self.times and when < self.times[-1]:
+            when = self.times[-1]
+        if len(self.times) % CHECKPOINT_INTERVAL == 0:
+            self.checkpoints.append(quantity)
+        self.times.append(when)
+        self.deltas.append(delta)
+        self.quantity = quantity
+        return delta
+
+    def at(self, when):
+        """Quantity at a time (epoch seconds), or None before the first record"""
+        index = bisect_right(self.times, when) - 1
+        if index < 0:
+            return None
+        block = index // CHECKPOINT_INTERVAL
+        start = block * CHECKPOINT_INTERVAL
+        return self.checkpoints[block] + sum(self.deltas[start + 1:index + 1])
+
+    def changes(self, start, end):
+        """Get [(time, quantity)] for every change between two times"""
+        first = bisect_right(self.times, start)
+        last = bisect_right(self.times, end)
+        quantity = self.at(start) or 0
+        points = []
+        for index in range(first, last):
+            quantity += self.deltas[index]
+            points.append((self.times[index], quantity))
+        return points
+
+class StockHistory:
+    """Point-in-time stock levels per SKU, backed by an append-only log
+
+    The log is read the first time history is queried, not at startup, and
+    new records are buffered until flush() (InventoryDB.save_data), so
+    recording a change costs one list append. With filename=None history is
+    kept in memory only.
+    """
+    def __init__(self, filename='stock_history.bin'):
+        self.filename = filename
+        self.series = {}
+        self.pending = []
+        # Nothing to read back without a file
+        self.loaded = not filename
+        self.lock = threading.Lock()
+
+    def is_new(self):
+        """True if there is no history on disk yet"""
+        return not (self.filename and os.path.exists(self.filename))
+
+    def record(self, product_id, quantity, when=None):
+        """Record the quantity of a product (0 once it is deleted)"""
+        when = when if when is not None else datetime.now().timestamp()
+        with self.lock:
+            if self.filename:
+                self.pending.append((when, int(quantity), product_id))
+            if self.loaded:
+                self.apply(when, int(quantity), product_id)
+
+    def apply(self, when, quantity, product_id):
+        series = self.series.get(product_id)
+        if series is None:
+            series = self.series[product_id] = StockSeries()
+        delta = series.append(when, quantity)
+        if delta:
+            total = self.series.get(TOTAL_KEY)
+            if total is None:
+                total = self.series[TOTAL_KEY] = StockSeries()
+            total.append(when, total.quantity + delta)
+
+    def flush(self):
+        """Append buffered records to the log file"""
+        with self.lock:
+            if not self.filename or not self.pending:
+                return
+            try:
+                with open(self.filename, 'ab') as f:
+                    for when, quantity, product_id in self.pending:
+                        encoded = product_id.encode('utf-8')
+                        f.write(RECORD.pack(when, quantity, len(encoded)) + encoded)
+                self.pending = []
+            except Exception as e:
+                print(f"Error saving stock history: {str(e)}")
+
+    def rollback(self, mark):
+        """Forget the records buffered since len(pending) was mark (e.g. a failed import)"""
+        with self.lock:
+            del self.pending[mark:]
+            if self.filename and self.loaded:
+                # The series already include them; rebuild from the log on next use
+                self.series = {}
+                self.loaded = False
+
+    def ensure_loaded(self):
+        """Build the in-memory series from the log plus anything not yet flushed"""
+        with self.lock:
+            if self.loaded:
+                return
+            try:
+                if not self.is_new():
+                    with open(self.filename, 'rb') as f:
+                        data = f.read()
+                    offset = 0
+                    while offset + RECORD.size <= len(data):
+                        when, quantity, length = RECORD.unpack_from(data, offset)
+                        offset += RECORD.size
+                        product_id = data[offset:offset + length].decode('utf-8')
+                        offset += length
+                        self.apply(when, quantity, product_id)
+            except Exception as e:
+                print(f"Error loading stock history: {str(e)}")
+            for when, quantity, product_id in self.pending:
+                self.apply(when, quantity, product_id)
+            self.loaded = True
+
+    def quantity_at(self, product_id, when):
+        """Stock of a product at a datetime, or None if history does not reach back that far"""
+        self.ensure_loaded()
+        with self.lock:
+            series = self.series.get(product_id)
+            return series.at(when.timestamp()) if series else None
+
+    def total_at(self, when):
+        """Total units in stock across all products at a datetime"""
+        return self.quantity_at(TOTAL_KEY, when)
+
+    def sample(self, product_id, start, end, points=50):
+        """Get [(datetime, quantity)] at evenly spaced times, e.g. for a chart"""
+        self.ensure_loaded()
+        step = (end - start) / max(points - 1, 1)
+        with self.lock:
+            series = self.series.get(product_id)
+            if series is None:
+                return []
+            samples = []
+            for i in range(points):
+                moment = start + step * i
+                samples.append((moment, series.at(moment.timestamp())))
+            return samples
+
+    def changes(self, product_id, start, end):
+        """Get [(datetime, quantity)] for every recorded change in a time range"""
+        self.ensure_loaded()
+        with self.lock:
+            series = self.series.get(product_id)
+            if series is None:
+                return []
+            return [
+                (datetime.fromtimestamp(when), quantity)
+                for when, quantity in series.changes(start.timestamp(), end.timestamp())
+            ]
+
+    def product_ids(self):
+        self.ensure_loaded()
+        with self.lock:
+            return [product_id for product_id in self.series if product_id != TOTAL_KEY]
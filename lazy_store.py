@@ -0,0 +1,144 @@
+from collections.abc import MutableMapping, Sequence
+
+# ========================
+# Lazy Inventory
+# ========================
+
+class LazyInventory(MutableMapping):
+    """Product store over a memory-mapped snapshot (see snapshot.MappedProducts)
+
+    Opening costs nothing per product: a product is decoded from the mapping
+    the first time it is looked up and cached as a plain dict, so in-place
+    edits (product['quantity'] -= n) work as with the dict store. Products
+    added after opening live only in the cache; deleted snapshot products
+    are remembered in a tombstone set.
+    """
+    def __init__(self, base=None, products=None):
+        self.base = base
+        self.loaded = {}
+        self.added = set()
+        self.deleted = set()
+        self.size = base.count if base else 0
+        if products:
+            items = products.items() if hasattr(products, 'items') else products
+            for product_id, product in items:
+                self[product_id] = dict(product)
+
+    def base_row(self, product_id):
+        """Row of a product in the snapshot, or None (ignores later deletes)"""
+        if self.base is None:
+            return None
+        return self.base.find(product_id)
+
+    def __getitem__(self, product_id):
+        product = self.loaded.get(product_id)
+        if product is not None:
+            return product
+        if product_id in self.deleted:
+            raise KeyError(product_id)
+        row = self.base_row(product_id)
+        if row is None:
+            raise KeyError(product_id)
+        product = self.loaded[product_id] = self.base.product_at(row)
+        return product
+
+    def __setitem__(self, product_id, product):
+        if product_id not in self:
+            self.size += 1
+            if product_id in self.deleted:
+                self.deleted.discard(product_id)
+            elif self.base_row(product_id) is None:
+                self.added.add(product_id)
+        self.loaded[product_id] = product
+
+    def __delitem__(self, product_id):
+        if product_id not in self:
+            raise KeyError(product_id)
+        self.loaded.pop(product_id, None)
+        if product_id in self.added:
+            self.added.discard(product_id)
+        else:
+            self.deleted.add(product_id)
+        self.size -= 1
+
+    def __contains__(self, product_id):
+        if product_id in self.loaded:
+            return True
+        return product_id not in self.deleted and self.base_row(product_id) is not None
+
+    def __iter__(self):
+        if self.base is not None:
+            for product_id in self.base.iter_ids():
+                if product_id not in self.deleted:
+                    yield product_id
+        yield from list(self.added)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"LazyInventory({len(self)} products, {len(self.loaded)} loaded)"
+
+    def clear(self):
+        self.__init__()
+
+    def scan(self):
+        """Yield (product_id, product) for every product without caching the decoded rows"""
+        if self.base is not None:
+            for row in range(self.base.count):
+                product_id = self.base.id_at(row)
+                if product_id in self.deleted:
+                    continue
+                product = self.loaded.get(product_id)
+                yield product_id, product if product is not None else self.base.product_at(row)
+        for product_id in list(self.added):
+            yield product_id, self.loaded[product_id]
+
+    def to_dict(self):
+        return dict(self.scan())
+
+    def rebase(self, base):
+        """Switch to a snapshot written from the current contents (loaded products stay cached)"""
+        self.base = base
+        self.added = set()
+        self.deleted = set()
+        self.size = base.count
+
+# ========================
+# Lazy Activity Log
+# ========================
+
+class LazyActivityLog(Sequence):
+    """Activity log over a memory-mapped snapshot (see snapshot.MappedActivities)
+
+    Entries are decoded by index, so reading the most recent ones never
+    touches the rest of the file. New entries are kept in a list.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.appended = []
+
+    def __len__(self):
+        return self.base.count + len(self.appended)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index < self.base.count:
+            return self.base.activity_at(index)
+        return self.appended[index - self.base.count]
+
+    def append(self, activity):
+        self.appended.append(activity)
+
+    def rebase(self, base):
+        """Switch to a snapshot written from the whole current log"""
+        self.base = base
+        self.appended = []
+
+    def copy(self):
+        return list(self)
@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import accumulate
+
+from async_agents import AsyncEmailAgent, AsyncWhatsAppAgent
+from main import EmailAgent, InventoryDB, InventoryManager, StockThresholds, WhatsAppAgent
+from notifications import Notifier, Subscription
+
+# ========================
+# Load Test
+# ========================
+#
+# Drives a throwaway InventoryDB (in a temporary directory) with simulated
+# POS traffic and dashboard sessions, then checks nothing was lost:
+#
+#   python loadtest.py --threads 8 --readers 4 --duration 10 --skew 1.1
+#   python loadtest.py --processes 4 --threads 4      # writes via replicas
+#
+# Writers sell (or with --restock probability, restock) SKUs picked with a
+# Zipf distribution (--skew 0 is uniform), readers poll what the dashboard
+# shows, and an alert loop runs the InventoryManager's stock check (routed
+# to --subscribers fake subscribers) and AI suggestions through fake
+# Twilio/SMTP/Gemini backends with realistic latency. With
+# --processes, writer threads run in child processes against ReplicaDBs
+# that forward to a WriterServer in this process.
+
+WRITE_ACTIONS = ('sell_product', 'update_quantity')
+
+# ========================
+# Fake Backends
+# ========================
+
+class FakeMessage:
+    def __init__(self, sid):
+        self.sid = sid
+
+class FakeMessages:
+    """Stands in for twilio Client.messages"""
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        time.sleep(self.latency)
+        with self.lock:
+            self.sent += 1
+            return FakeMessage(f"SM{self.sent:08d}")
+
+    async def create_async(self, body, from_, to):
+        await asyncio.sleep(self.latency)
+        with self.lock:
+            self.sent += 1
+            return FakeMessage(f"SM{self.sent:08d}")
+
+class FakeTwilioClient:
+    def __init__(self, latency):
+        self.messages = FakeMessages(latency)
+
+class FakeEmailAgent(EmailAgent):
+    """EmailAgent whose SMTP session only sleeps"""
+    def __init__(self, db, latency):
+        super().__init__(db)
+        self.sender_email = self.sender_email or 'loadtest@example.com'
+        self.sender_password = self.sender_password or 'loadtest'
+        self.latency = latency
+        self.sent = 0
+
+    def deliver(self, msg, recipients=None):
+        time.sleep(self.latency)
+        self.sent += len(recipients or [msg['To']])
+
+class FakeAsyncWhatsAppAgent(AsyncWhatsAppAgent):
+    """AsyncWhatsAppAgent sending through the wrapped agent's fake Twilio client"""
+    def get_twilio_client(self):
+        return self.agent.twilio_client
+
+class FakeAsyncEmailAgent(AsyncEmailAgent):
+    """AsyncEmailAgent using the wrapped agent's fake SMTP session"""
+    async def deliver(self, msg, recipients=None):
+        await asyncio.to_thread(self.agent.deliver, msg, recipients)
+
+class FakeNotifier(Notifier):
+    whatsapp_class = FakeAsyncWhatsAppAgent
+    email_class = FakeAsyncEmailAgent
+
+def fake_subscriptions(count, categories=20):
+    """Subscribers following two neighbouring categories each"""
+    return [
+        Subscription(
+            f"Store {i}", f"+1555{i:07d}", f"store{i}@example.com",
+            [f"Category {i % categories}", f"Category {(i + 1) % categories}"]
+        )
+        for i in range(count)
+    ]
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Stands in for the Gemini GenerativeModel"""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        return FakeResponse("1. Restock the fastest sellers 📦")
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return FakeResponse("1. Restock the fastest sellers 📦")
+
+def install_fakes(db, latency):
+    """Agents wired to fake backends, Gemini included"""
+    whatsapp = WhatsAppAgent(db)
+    whatsapp.model = FakeModel(latency * 10)
+    whatsapp.twilio_client = FakeTwilioClient(latency)
+    whatsapp.twilio_whatsapp_number = whatsapp.twilio_whatsapp_number or '+15550000000'
+    whatsapp.recipient_number = whatsapp.recipient_number or '+15550000001'
+    return whatsapp, FakeEmailAgent(db, latency)
+
+# ========================
+# Workload
+# ========================
+
+def zipf_weights(count, skew):
+    """Cumulative weights where rank r is picked in proportion to 1 / r**skew"""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+class Recorder:
+    """Latencies and effects of one thread; merged at the end"""
+    def __init__(self):
+        self.latencies = {}
+        self.failed = Counter()
+        self.deltas = Counter()
+        self.ops = Counter()
+
+    def timed(self, action, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.latencies.setdefault(action, []).append(time.perf_counter() - start)
+        return result
+
+    def merge(self, other):
+        for action, latencies in other.latencies.items():
+            self.latencies.setdefault(action, []).extend(latencies)
+        self.failed.update(other.failed)
+        self.deltas.update(other.deltas)
+        self.ops.update(other.ops)
+        return self
+
+def writer_loop(db, ids, cum_weights, deadline, restock, seed, recorder):
+    """Sell or restock Zipf-chosen SKUs until the deadline"""
+    rng = random.Random(seed)
+    while time.time() < deadline:
+        product_id = rng.choices(ids, cum_weights=cum_weights)[0]
+        if rng.random() < restock:
+            change = rng.randint(1, 10)
+            ok = recorder.timed('update_quantity', db.update_quantity, product_id, change)
+        else:
+            change = -rng.randint(1, 3)
+            ok = recorder.timed('sell_product', db.sell_product, product_id, -change)
+        if ok:
+            recorder.deltas[product_id] += change
+            recorder.ops[product_id] += 1
+        else:
+            recorder.failed['sell_product' if change < 0 else 'update_quantity'] += 1
+
+def reader_loop(db, deadline, think, recorder):
+    """Poll what a dashboard session shows, pausing think seconds between refreshes"""
+    while time.time() < deadline:
+        recorder.timed('get_inventory_status', db.get_inventory_status)
+        recorder.timed('get_recent_activities', db.get_recent_activities, 10)
+        if think:
+            time.sleep(think)
+
+def alert_loop(manager, deadline, interval, recorder):
+    """What the InventoryManager and scheduler do, against the fake backends"""
+    while time.time() < deadline:
+        recorder.timed('check_inventory', manager.check_inventory)
+        recorder.timed('ai_suggestions', manager.whatsapp_agent.suggest_actions)
+        time.sleep(interval)
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target, args=args, daemon=True) for target, args in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def worker_process(address, ids, cum_weights, threads, deadline, restock, seed):
+    """Run writer threads in a child process through a replica of the writer"""
+    from replication import ReplicaDB
+    db = ReplicaDB(address=address)
+    recorders = [Recorder() for _ in range(threads)]
+    run_threads([
+        (writer_loop, (db, ids, cum_weights, deadline, restock, seed * 1000 + i, recorder))
+        for i, recorder in enumerate(recorders)
+    ])
+    db.rpc.close()
+    total = Recorder()
+    for recorder in recorders:
+        total.merge(recorder)
+    return total
+
+# ========================
+# Integrity Checks
+# ========================
+
+def check_integrity(db, directory, initial_quantity, recorder):
+    """Get [(check, passed, detail)] comparing the database with what the workers did"""
+    checks = []
+    with db.lock:
+        quantities = {pid: product['quantity'] for pid, product in db.inventory.items()}
+        versions = {pid: product.get('version', 0) for pid, product in db.inventory.items()}
+        logged = sum(1 for activity in db.activity_log if activity['action'] in WRITE_ACTIONS)
+
+    lost = [pid for pid, quantity in quantities.items() if quantity != initial_quantity + recorder.deltas[pid]]
+    checks.append(('no lost updates', not lost, f"{len(lost)} SKU(s) off" if lost else f"{len(quantities)} SKUs match"))
+
+    skipped = [pid for pid, version in versions.items() if version != 1 + recorder.ops[pid]]
+    checks.append(('one version per write', not skipped, f"{len(skipped)} SKU(s) off" if skipped else "versions match"))
+
+    negative = [pid for pid, quantity in quantities.items() if quantity < 0]
+    checks.append(('no oversold SKUs', not negative, f"{len(negative)} negative" if negative else "all >= 0"))
+
+    writes = sum(recorder.ops.values())
+    checks.append(('one activity per write', logged == writes, f"{logged} logged / {writes} writes"))
+
+    # Everything must come back from the files exactly as it is in memory
+    db.save_data()
+    reopened = InventoryDB(thresholds=StockThresholds(filename=None), store=db.store, directory=directory)
+    reloaded = {pid: product['quantity'] for pid, product in reopened.inventory.items()}
+    checks.append(('snapshot reloads', reloaded == quantities, f"{len(reloaded)} products read back"))
+    checks.append((
+        'activity log reloads', len(reopened.activity_log) == len(db.activity_log),
+        f"{len(reopened.activity_log)} / {len(db.activity_log)} entries"
+    ))
+
+    total = reopened.history.total_at(datetime.now())
+    checks.append(('history totals', total == sum(quantities.values()), f"{total} / {sum(quantities.values())} units"))
+    return checks
+
+# ========================
+# Report
+# ========================
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def report(recorder, elapsed, checks, backends):
+    print(f"\n{'operation':<24}{'count':>9}{'ops/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'failed':>8}")
+    for action, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        print(
+            f"{action:<24}{len(latencies):>9}{len(latencies) / elapsed:>10.0f}"
+            f"{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.99) * 1000:>10.2f}"
+            f"{latencies[-1] * 1000:>10.2f}{recorder.failed[action]:>8}"
+        )
+    print(f"\nFake backends: {backends}")
+    print("\nIntegrity:")
+    for name, passed, detail in checks:
+        print(f"  [{'PASS' if passed else 'FAIL'}] {name}: {detail}")
+    return all(passed for _, passed, _ in checks)
+
+# ========================
+# Runner
+# ========================
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        db = InventoryDB(thresholds=StockThresholds(filename=None), store=args.store, directory=directory)
+        ids = [f"SKU{i:06d}" for i in range(args.products)]
+        with db.batch():
+            for i, product_id in enumerate(ids):
+                db.add_product(product_id, f"Product {i}", args.stock, round(1 + i % 100 * 0.5, 2), f"Category {i % 20}")
+        cum_weights = zipf_weights(len(ids), args.skew)
+        whatsapp, email = install_fakes(db, args.latency)
+        notifier = FakeNotifier(db, whatsapp, email, subscriptions=fake_subscriptions(args.subscribers))
+        manager = InventoryManager(db, whatsapp, email, autostart=False, notifier=notifier)
+
+        server = None
+        if args.processes:
+            from replication import WriterServer
+            address = os.path.join(directory, 'writer.sock')
+            server = WriterServer(db, address=address).start()
+
+        print(
+            f"{args.products} SKUs (skew {args.skew}), {args.processes or 1} process(es) x {args.threads} writer(s), "
+            f"{args.readers} reader(s), {args.duration}s"
+        )
+        start = time.time()
+        deadline = start + args.duration
+        recorders = [Recorder() for _ in range(args.readers + 1)]
+        targets = [(reader_loop, (db, deadline, args.think, recorder)) for recorder in recorders[:-1]]
+        targets.append((alert_loop, (manager, deadline, args.alert_interval, recorders[-1])))
+
+        if args.processes:
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(args.processes) as pool:
+                pending = [
+                    pool.apply_async(worker_process, (address, ids, cum_weights, args.threads, deadline, args.restock, n))
+                    for n in range(args.processes)
+                ]
+                run_threads(targets)
+                recorders.extend(result.get() for result in pending)
+            server.stop()
+        else:
+            writers = [Recorder() for _ in range(args.threads)]
+            targets.extend(
+                (writer_loop, (db, ids, cum_weights, deadline, args.restock, n, recorder))
+                for n, recorder in enumerate(writers)
+            )
+            run_threads(targets)
+            recorders.extend(writers)
+        elapsed = time.time() - start
+
+        total = Recorder()
+        for recorder in recorders:
+            total.merge(recorder)
+        checks = check_integrity(db, directory, args.stock, total)
+        backends = f"{whatsapp.twilio_client.messages.sent} WhatsApp, {email.sent} email"
+        return report(total, elapsed, checks, backends)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test InventoryDB with simulated POS and dashboard traffic")
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--stock', type=int, default=500, help="starting quantity of every SKU")
+    parser.add_argument('--threads', type=int, default=8, help="writer threads (per process)")
+    parser.add_argument('--processes', type=int, default=0, help="write through replicas in this many processes")
+    parser.add_argument('--readers', type=int, default=4, help="simulated dashboard sessions")
+    parser.add_argument('--think', type=float, default=0.05, help="seconds between dashboard refreshes")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent; 0 is uniform")
+    parser.add_argument('--restock', type=float, default=0.2, help="fraction of writes that restock")
+    parser.add_argument('--latency', type=float, default=0.05, help="fake backend latency in seconds")
+    parser.add_argument('--alert-interval', type=float, default=1.0)
+    parser.add_argument('--subscribers', type=int, default=20,
+                        help="fake alert subscribers; 0 alerts the single RECIPIENT_* contact")
+    parser.add_argument('--store', default=os.getenv('INVENTORY_STORE', 'dict'))
+    passed = run(parser.parse_args())
+    raise SystemExit(0 if passed else 1)
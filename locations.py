@@ -0,0 +1,190 @@
+import glob
+import itertools
+import json
+import os
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from alerts import STOCK_LOW, STOCK_OUT
+from main import InventoryDB, StockThresholds, is_integer, quantity_error
+from snapshot import atomic_write
+
+def location_names():
+    """Locations from INVENTORY_LOCATIONS ("east,west,..."), 'main' if unset"""
+    names = [name.strip() for name in os.getenv('INVENTORY_LOCATIONS', 'main').split(',')]
+    return [name for name in names if name]
+
+# ========================
+# Location Inventory
+# ========================
+
+class LocationInventory:
+    """Per-location stock with one InventoryDB shard per location
+
+    Each shard keeps its own snapshot files under <directory>/<location>/,
+    its own lock, stock index and change feed, so writes at one site never
+    wait on another. Stock thresholds are shared by all shards.
+
+    Transfers lock both shards (in name order, so two opposite transfers
+    cannot deadlock) and record their outcome in a pending-transfer file
+    before either shard is saved. If the process dies between the two
+    saves, the next start finishes the transfer from that file.
+    """
+    def __init__(self, locations=None, directory=None, thresholds=None, store=None):
+        self.directory = directory or os.getenv('INVENTORY_LOCATIONS_DIR', 'locations')
+        self.thresholds = thresholds if thresholds is not None else StockThresholds()
+        self.store = store
+        self.transfer_ids = itertools.count()
+        self.shards = {}
+        for name in locations or location_names():
+            self.add_location(name)
+        self.recover_transfers()
+
+    def add_location(self, name):
+        """Open (or create) the shard for a location"""
+        if name not in self.shards:
+            directory = os.path.join(self.directory, name)
+            os.makedirs(directory, exist_ok=True)
+            self.shards[name] = InventoryDB(thresholds=self.thresholds, store=self.store, directory=directory)
+        return self.shards[name]
+
+    def shard(self, name):
+        return self.shards[name]
+
+    @property
+    def names(self):
+        return list(self.shards)
+
+    def get_inventory_status(self):
+        """Combine the per-shard summaries; products stocked at two sites count twice"""
+        by_location = {name: shard.get_inventory_status() for name, shard in self.shards.items()}
+        status = {
+            key: sum(location[key] for location in by_location.values())
+            for key in ('total_products', 'out_of_stock', 'low_stock', 'total_value')
+        }
+        status['locations'] = by_location
+        return status
+
+    def get_product_locations(self, product_id):
+        """Get {location: quantity} for every location stocking a product"""
+        quantities = {}
+        for name, shard in self.shards.items():
+            with shard.lock:
+                product = shard.inventory.get(product_id)
+                if product is not None:
+                    quantities[name] = product['quantity']
+        return quantities
+
+    def get_total_quantity(self, product_id):
+        return sum(self.get_product_locations(product_id).values())
+
+    def get_low_stock_locations(self):
+        """Get {location: {'low': [ids], 'out': [ids]}} for locations needing stock"""
+        alerts = {}
+        for name, shard in self.shards.items():
+            low = shard.stock_index.ids(STOCK_LOW)
+            out = shard.stock_index.ids(STOCK_OUT)
+            if low or out:
+                alerts[name] = {'low': low, 'out': out}
+        return alerts
+
+    def set_sku_threshold(self, product_id, threshold):
+        for shard in self.shards.values():
+            shard.set_sku_threshold(product_id, threshold)
+
+    def set_category_threshold(self, category, threshold):
+        for shard in self.shards.values():
+            shard.set_category_threshold(category, threshold)
+
+    def set_default_threshold(self, threshold):
+        for shard in self.shards.values():
+            shard.set_default_threshold(threshold)
+
+    def pending_path(self, source, destination):
+        """A new pending-transfer file; names sort in the order the transfers were made"""
+        name = f"transfer-{time.time_ns():020d}-{next(self.transfer_ids):06d}-{source}-{destination}.pending"
+        return os.path.join(self.directory, name)
+
+    def transfer(self, product_id, source, destination, quantity, agent='InventoryManager'):
+        """Move stock from one location to another; both shards change or neither does"""
+        if source == destination or not is_integer(quantity) or quantity <= 0:
+            print(f"Invalid transfer of {quantity!r} from {source} to {destination}")
+            return False
+        if source not in self.shards or destination not in self.shards:
+            print(f"Unknown location in transfer from {source} to {destination}")
+            return False
+
+        with ExitStack() as stack:
+            for name in sorted((source, destination)):
+                stack.enter_context(self.shards[name].lock)
+
+            product = self.shards[source].inventory.get(product_id)
+            if product is None or product['quantity'] < quantity:
+                return False
+
+            # Record absolute results so replaying the transfer is harmless
+            existing = self.shards[destination].inventory.get(product_id)
+            target = dict(existing if existing is not None else product)
+            target['quantity'] = (existing['quantity'] if existing is not None else 0) + quantity
+            problem = quantity_error(target['quantity'])
+            if problem:
+                print(f"Cannot transfer {product_id} to {destination}: {problem}")
+                return False
+            target['version'] = existing.get('version', 0) if existing is not None else 0
+            pending = {
+                'product_id': product_id,
+                'source': source,
+                'destination': destination,
+                'quantity': quantity,
+                'source_quantity': product['quantity'] - quantity,
+                'destination_product': target,
+                'agent': agent
+            }
+            path = self.pending_path(source, destination)
+            with atomic_write(path) as f:
+                f.write(json.dumps(pending).encode('utf-8'))
+            if self.apply_transfer(pending):
+                os.remove(path)
+            else:
+                print(f"Keeping {path} until both locations are saved")
+            return True
+
+    def apply_transfer(self, pending):
+        """Set both sides of a transfer and save the two shards; False if either save failed"""
+        product_id = pending['product_id']
+        source = self.shards[pending['source']]
+        destination = self.shards[pending['destination']]
+        now = str(datetime.now())
+
+        with source.batch(), destination.batch():
+            source.inventory[product_id]['quantity'] = pending['source_quantity']
+            source.inventory[product_id]['last_updated'] = now
+            source._product_changed(product_id)
+            destination.inventory[product_id] = dict(pending['destination_product'], last_updated=now)
+            destination._product_changed(product_id)
+
+            name = pending['destination_product']['name']
+            source.log_activity(
+                pending['agent'], 'transfer_out',
+                f"Transferred {pending['quantity']} of {name} (ID: {product_id}) to {pending['destination']}. Remaining Qty: {pending['source_quantity']}"
+            )
+            destination.log_activity(
+                pending['agent'], 'transfer_in',
+                f"Received {pending['quantity']} of {name} (ID: {product_id}) from {pending['source']}. New Qty: {pending['destination_product']['quantity']}"
+            )
+        # batch() saved both shards on the way out; a failed save leaves its shard dirty
+        return not source._dirty and not destination._dirty
+
+    def recover_transfers(self):
+        """Finish transfers interrupted between the two shard saves, oldest first"""
+        for path in sorted(glob.glob(os.path.join(self.directory, 'transfer-*.pending'))):
+            try:
+                with open(path, 'r') as f:
+                    pending = json.load(f)
+                if pending['source'] in self.shards and pending['destination'] in self.shards:
+                    pending['agent'] = 'TransferRecovery'
+                    if self.apply_transfer(pending):
+                        os.remove(path)
+            except Exception as e:
+                print(f"Error recovering transfer {path}: {str(e)}")
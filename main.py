@@ -1,7 +1,9 @@
 import json
 import csv
+import math
+import numbers
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -9,8 +11,19 @@ from email.mime.application import MIMEApplication
 import google.generativeai as genai
 import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
 from dotenv import load_dotenv
 from twilio.rest import Client
+from ai_context import PromptCache, PromptContext
+from alerts import STOCK_LOW, STOCK_OK, STOCK_OUT, alert_details, alert_message, alert_products
+from columnar_store import ColumnarInventory
+from history import StockHistory
+from lazy_store import LazyActivityLog, LazyInventory
+from notifications import Notifier
+from scheduler import Scheduler
+from snapshot import JsonSnapshot, MappedActivities, MappedProducts, get_snapshot_format
 
 # Load environment variables
 load_dotenv()
@@ -19,144 +32,828 @@ load_dotenv()
 genai.configure(api_key=os.getenv("YOUR_GEMINI_API_KEY"))  # Updated environment variable name
 model = genai.GenerativeModel('gemini-2.0-flash')
 
+# ========================
+# Stock Thresholds
+# ========================
+
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
+class StockThresholds:
+    """Low-stock thresholds resolved per SKU, then per category, then default"""
+    def __init__(self, filename='stock_thresholds.json', default=DEFAULT_LOW_STOCK_THRESHOLD):
+        self.filename = filename
+        self.default = default
+        self.by_sku = {}
+        self.by_category = {}
+        self.load()
+
+    def load(self):
+        """Load threshold overrides from file"""
+        try:
+            if self.filename and os.path.exists(self.filename):
+                with open(self.filename, 'r') as f:
+                    self.apply(json.load(f))
+        except Exception as e:
+            print(f"Error loading stock thresholds: {str(e)}")
+
+    def save(self):
+        """Save threshold overrides to file"""
+        if not self.filename:
+            return
+        try:
+            with open(self.filename, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except Exception as e:
+            print(f"Error saving stock thresholds: {str(e)}")
+
+    def to_dict(self):
+        return {
+            'default': self.default,
+            'by_sku': dict(self.by_sku),
+            'by_category': dict(self.by_category)
+        }
+
+    def apply(self, data):
+        """Replace the thresholds with the ones in a to_dict() result"""
+        self.default = data.get('default', self.default)
+        self.by_sku = data.get('by_sku', {})
+        self.by_category = data.get('by_category', {})
+
+    def threshold_for(self, product_id, category=""):
+        """Get the low-stock threshold that applies to a product"""
+        if product_id in self.by_sku:
+            return self.by_sku[product_id]
+        if category and category in self.by_category:
+            return self.by_category[category]
+        return self.default
+
+    def classify(self, product_id, product):
+        """Get the stock state (ok/low/out) of a product"""
+        quantity = product['quantity']
+        if quantity <= 0:
+            return STOCK_OUT
+        if quantity < self.threshold_for(product_id, product.get('category', "")):
+            return STOCK_LOW
+        return STOCK_OK
+
+class StockIndex:
+    """Buckets product IDs by stock state so low/out lookups are O(result)
+
+    Also keeps each product's quantity and stock value, so the inventory
+    total and the per-category totals are O(1).
+    """
+    def __init__(self, thresholds):
+        self.thresholds = thresholds
+        self.buckets = {STOCK_OK: set(), STOCK_LOW: set(), STOCK_OUT: set()}
+        self.states = {}
+        self.categories = {}
+        self.product_categories = {}
+        self.values = {}
+        self.totals = {}
+        self.total_value = 0
+
+    def add_to_totals(self, category, quantity, value, sign=1):
+        totals = self.totals.setdefault(category, [0, 0, 0])
+        totals[0] += sign
+        totals[1] += sign * quantity
+        totals[2] += sign * value
+        if not totals[0]:
+            del self.totals[category]
+
+    def update(self, product_id, product):
+        """Re-bucket a product after its quantity, category or threshold changed"""
+        self.remove(product_id)
+        state = self.thresholds.classify(product_id, product)
+        self.buckets[state].add(product_id)
+        self.states[product_id] = state
+        category = product.get('category', "")
+        self.categories.setdefault(category, set()).add(product_id)
+        self.product_categories[product_id] = category
+        value = product['quantity'] * product['price']
+        self.values[product_id] = (product['quantity'], value)
+        self.add_to_totals(category, product['quantity'], value)
+        self.total_value += value
+
+    def remove(self, product_id):
+        """Drop a product from the index"""
+        state = self.states.pop(product_id, None)
+        if state is None:
+            return
+        self.buckets[state].discard(product_id)
+        category = self.product_categories.pop(product_id)
+        self.categories[category].discard(product_id)
+        if not self.categories[category]:
+            del self.categories[category]
+        quantity, value = self.values.pop(product_id)
+        self.add_to_totals(category, quantity, value, -1)
+        self.total_value -= value
+
+    def rebuild(self, inventory):
+        """Rebuild the whole index from an inventory dict (or its (id, product) pairs)"""
+        for bucket in self.buckets.values():
+            bucket.clear()
+        self.states.clear()
+        self.categories.clear()
+        self.product_categories.clear()
+        self.values.clear()
+        self.totals.clear()
+        self.total_value = 0
+        for product_id, product in inventory.items() if hasattr(inventory, 'items') else inventory:
+            self.update(product_id, product)
+
+    def state(self, product_id):
+        return self.states.get(product_id)
+
+    def count(self, state):
+        return len(self.buckets[state])
+
+    def ids(self, state):
+        return sorted(self.buckets[state])
+
+    def category_members(self, category):
+        return list(self.categories.get(category, ()))
+
+    def category_totals(self):
+        """Get {category: (product_count, total_quantity, total_value)}"""
+        return {category: tuple(totals) for category, totals in self.totals.items()}
+
+    def summary(self):
+        """Stock summary saved with snapshots so a lazy open can skip the rebuild"""
+        return {
+            'thresholds': self.thresholds.to_dict(),
+            'total_value': self.total_value,
+            'low': self.ids(STOCK_LOW),
+            'out': self.ids(STOCK_OUT),
+            'categories': {category: list(totals) for category, totals in self.category_totals().items()}
+        }
+
+class LazyStockIndex(StockIndex):
+    """StockIndex for a LazyInventory, seeded from the snapshot summary
+
+    Untouched products are only tracked through the low/out buckets and the
+    saved total and category values; the OK count is whatever is left. The
+    first time a product changes, its snapshot contribution is swapped for a
+    live entry.
+    """
+    def __init__(self, thresholds):
+        super().__init__(thresholds)
+        self.inventory = {}
+        self.touched = set()
+        self.seeded = False
+
+    def seed(self, inventory):
+        """Adopt the snapshot summary if it was saved with the current thresholds, else rescan"""
+        summary = inventory.base.summary if getattr(inventory, 'base', None) else None
+        if (not summary or 'categories' not in summary
+                or summary['thresholds'] != json.loads(json.dumps(self.thresholds.to_dict()))):
+            self.rebuild(inventory)
+            return
+        self.rebuild({})
+        self.inventory = inventory
+        self.buckets[STOCK_LOW].update(summary['low'])
+        self.buckets[STOCK_OUT].update(summary['out'])
+        self.total_value = summary['total_value']
+        self.totals = {category: list(totals) for category, totals in summary['categories'].items()}
+        self.seeded = True
+
+    def release(self, product_id):
+        """Drop a product's snapshot contribution before its first live update"""
+        if not self.seeded or product_id in self.touched:
+            return
+        self.touched.add(product_id)
+        self.buckets[STOCK_LOW].discard(product_id)
+        self.buckets[STOCK_OUT].discard(product_id)
+        row = self.inventory.base_row(product_id)
+        if row is None:
+            return
+        base = self.inventory.base
+        value = base.value_at(row)
+        self.total_value -= value
+        self.add_to_totals(base.categories[base.category_codes[row]], base.quantities[row], value, -1)
+
+    def update(self, product_id, product):
+        self.release(product_id)
+        super().update(product_id, product)
+
+    def remove(self, product_id):
+        self.release(product_id)
+        super().remove(product_id)
+
+    def rebuild(self, inventory):
+        self.inventory = inventory
+        self.touched.clear()
+        self.seeded = False
+        super().rebuild(inventory.scan() if hasattr(inventory, 'scan') else inventory.items())
+
+    def state(self, product_id):
+        if product_id in self.states:
+            return self.states[product_id]
+        for state in (STOCK_LOW, STOCK_OUT):
+            if product_id in self.buckets[state]:
+                return state
+        return STOCK_OK if self.seeded and product_id in self.inventory else None
+
+    def count(self, state):
+        if state == STOCK_OK and self.seeded:
+            return len(self.inventory) - self.count(STOCK_LOW) - self.count(STOCK_OUT)
+        return len(self.buckets[state])
+
+    def ids(self, state):
+        if state == STOCK_OK and self.seeded:
+            return sorted(pid for pid in self.inventory if self.state(pid) == STOCK_OK)
+        return sorted(self.buckets[state])
+
+    def category_members(self, category):
+        if not self.seeded:
+            return super().category_members(category)
+        return [pid for pid, product in self.inventory.scan() if product.get('category', "") == category]
+
+class ColumnarStockIndex(StockIndex):
+    """StockIndex for a ColumnarInventory that keeps nothing per OK product
+
+    Only low and out-of-stock IDs are held; OK products are the rest of the
+    store, and category members and the total value come from its columns.
+    """
+    def __init__(self, thresholds):
+        self.thresholds = thresholds
+        self.buckets = {STOCK_LOW: set(), STOCK_OUT: set()}
+        self.inventory = ColumnarInventory()
+
+    @property
+    def total_value(self):
+        return self.inventory.total_value()
+
+    def category_totals(self):
+        return self.inventory.category_totals()
+
+    def update(self, product_id, product):
+        self.remove(product_id)
+        state = self.thresholds.classify(product_id, product)
+        if state != STOCK_OK:
+            self.buckets[state].add(product_id)
+
+    def remove(self, product_id):
+        self.buckets[STOCK_LOW].discard(product_id)
+        self.buckets[STOCK_OUT].discard(product_id)
+
+    def rebuild(self, inventory):
+        """Re-classify every product of the store the database now uses"""
+        self.inventory = inventory
+        for bucket in self.buckets.values():
+            bucket.clear()
+        for product_id, product in inventory.items():
+            self.update(product_id, product)
+
+    def state(self, product_id):
+        for state in (STOCK_LOW, STOCK_OUT):
+            if product_id in self.buckets[state]:
+                return state
+        return STOCK_OK if product_id in self.inventory else None
+
+    def count(self, state):
+        if state == STOCK_OK:
+            return len(self.inventory) - self.count(STOCK_LOW) - self.count(STOCK_OUT)
+        return len(self.buckets[state])
+
+    def ids(self, state):
+        if state == STOCK_OK:
+            return sorted(pid for pid in self.inventory if self.state(pid) == STOCK_OK)
+        return sorted(self.buckets[state])
+
+    def category_members(self, category):
+        code = self.inventory.category_lookup.get(category)
+        if code is None:
+            return []
+        return [pid for pid, member in zip(self.inventory.ids, self.inventory.category_codes) if member == code]
+
+# ========================
+# Change Feed
+# ========================
+
+class ChangeFeed:
+    """Sequence-numbered log of recent mutations for replicas and live views
+
+    Listeners added with subscribe() are called with every event as it is
+    published, on the writing thread and under the database lock, so they
+    must be quick and must not call back into the database.
+    """
+    def __init__(self, maxlen=10000):
+        self.events = deque(maxlen=maxlen)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def publish(self, kind, key=None, value=None):
+        """Record a mutation and wake up anyone waiting for it"""
+        with self.condition:
+            self.seq += 1
+            event = {'seq': self.seq, 'kind': kind, 'key': key, 'value': value}
+            self.events.append(event)
+            self.condition.notify_all()
+        for listener in self.listeners:
+            listener(event)
+        return event['seq']
+
+    def since(self, seq):
+        """Get events after seq, or None if some of them were already evicted"""
+        with self.condition:
+            if seq >= self.seq:
+                return []
+            if not self.events or self.events[0]['seq'] > seq + 1:
+                return None
+            return list(islice(self.events, seq + 1 - self.events[0]['seq'], None))
+
+    def wait(self, seq, timeout=None):
+        """Block until an event after seq is published; returns the latest seq"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > seq, timeout)
+            return self.seq
+
 # ========================
 # Inventory Database
 # ========================
 
+# Files written before the binary snapshot format; still loaded if no snapshot exists
+LEGACY_INVENTORY_FILE = 'inventory.json'
+LEGACY_ACTIVITY_LOG_FILE = 'activity_log.json'
+
+class VersionConflictError(Exception):
+    """A compare-and-set write found the product at a different version"""
+    def __init__(self, product_id, expected_version, current_version):
+        super().__init__(product_id, expected_version, current_version)
+        self.product_id = product_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+    def __str__(self):
+        return (f"Product {self.product_id} was changed by someone else "
+                f"(version {self.current_version}, expected {self.expected_version})")
+
+# Quantities are stored in signed 64-bit snapshot columns (see snapshot.py)
+QUANTITY_MIN = -2 ** 63
+QUANTITY_MAX = 2 ** 63 - 1
+
+def is_integer(value):
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+def quantity_error(quantity):
+    """Describe why a quantity cannot be stored, or None if it can"""
+    if not is_integer(quantity):
+        return f"quantity must be a whole number, not {quantity!r}"
+    if not QUANTITY_MIN <= quantity <= QUANTITY_MAX:
+        return f"quantity {quantity} does not fit in a 64-bit integer"
+    return None
+
+def product_value_error(name, quantity, price, category=""):
+    """Describe why these fields cannot be stored in a product, or None if they can"""
+    if not isinstance(name, str) or not isinstance(category, str):
+        return "name and category must be strings"
+    if quantity_error(quantity):
+        return quantity_error(quantity)
+    if isinstance(price, bool) or not isinstance(price, numbers.Real) or not math.isfinite(price):
+        return f"price must be a number, not {price!r}"
+    return None
+
 class InventoryDB:
-    def __init__(self, filename='inventory.json'):
-        self.filename = filename
+    def __init__(self, filename=None, thresholds=None, store=None, snapshot_format=None, log_filename=None, directory='',
+                 history=None):
+        # 'binary' (default) or 'json'; see snapshot.py
+        self.snapshot = get_snapshot_format(
+            snapshot_format or os.getenv('INVENTORY_SNAPSHOT_FORMAT', 'binary'),
+            os.getenv('INVENTORY_SNAPSHOT_COMPRESSION', 'none')
+        )
+        self.filename = filename or os.path.join(directory, 'inventory' + self.snapshot.extension)
+        self.log_filename = log_filename or os.path.join(directory, 'activity_log' + self.snapshot.extension)
+        # Shards kept in their own directory (see locations.py) never adopt the legacy files
+        self.directory = directory
+        # 'dict' keeps one dict per product; 'columnar' uses ColumnarInventory;
+        # 'lazy' memory-maps the snapshot and decodes products on first access
+        self.store = store or os.getenv('INVENTORY_STORE', 'dict')
         self.activity_log = []
+        self.thresholds = thresholds if thresholds is not None else StockThresholds()
+        if self.store == 'lazy':
+            self.stock_index = LazyStockIndex(self.thresholds)
+        elif self.store == 'columnar':
+            self.stock_index = ColumnarStockIndex(self.thresholds)
+        else:
+            self.stock_index = StockIndex(self.thresholds)
+        # Quantity changes over time; see history.py
+        self.history = history if history is not None else StockHistory(os.path.join(directory, 'stock_history.bin'))
+        self.changes = ChangeFeed()
+        # Reentrant so batch() can wrap calls to the other mutating methods
+        self.lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
         self.load_data()
     
     def load_data(self):
         """Load inventory and activity log from files"""
-        try:
-            if os.path.exists(self.filename):
-                with open(self.filename, 'r') as f:
-                    self.inventory = json.load(f)
+        with self.lock:
+            try:
+                snapshot, path = self.snapshot_source(self.filename, LEGACY_INVENTORY_FILE)
+                mapped = self.map_snapshot(MappedProducts, snapshot, path)
+                if mapped:
+                    self.inventory = LazyInventory(mapped)
+                elif snapshot and self.store == 'columnar' and hasattr(snapshot, 'load_columns'):
+                    self.inventory = ColumnarInventory.from_columns(snapshot.load_columns(path))
+                elif snapshot:
+                    self.inventory = self.new_store(snapshot.load_products(path))
+                else:
+                    self.inventory = self.new_store()
+                
+                snapshot, path = self.snapshot_source(self.log_filename, LEGACY_ACTIVITY_LOG_FILE)
+                mapped = self.map_snapshot(MappedActivities, snapshot, path)
+                if mapped:
+                    self.activity_log = LazyActivityLog(mapped)
+                elif snapshot:
+                    self.activity_log = snapshot.load_activities(path)
+            except Exception as e:
+                print(f"Error loading data: {str(e)}")
+                self.inventory = self.new_store()
+                self.activity_log = []
+            
+            if self.store == 'lazy':
+                self.stock_index.seed(self.inventory)
             else:
-                self.inventory = {}
+                self.stock_index.rebuild(self.inventory)
             
-            if os.path.exists('activity_log.json'):
-                with open('activity_log.json', 'r') as f:
-                    self.activity_log = json.load(f)
-        except Exception as e:
-            print(f"Error loading data: {str(e)}")
-            self.inventory = {}
-            self.activity_log = []
+            # Start history from the current stock levels the first time
+            if self.history.is_new() and not self.history.pending:
+                self.record_history_baseline(self.inventory)
     
-    def save_data(self):
-        """Save inventory and activity log to files"""
+    def record_history_baseline(self, inventory):
+        """Record the current quantity of every product in the stock history"""
+        pairs = inventory.scan() if hasattr(inventory, 'scan') else inventory.items()
+        for product_id, product in pairs:
+            self.history.record(product_id, product['quantity'])
+    
+    def map_snapshot(self, mapping, snapshot, path):
+        """Open a snapshot for lazy access, or None to load it eagerly instead"""
+        if self.store != 'lazy' or snapshot is not self.snapshot or not hasattr(snapshot, 'load_columns'):
+            return None
         try:
-            with open(self.filename, 'w') as f:
-                json.dump(self.inventory, f, indent=2)
+            return mapping(path)
+        except ValueError as e:
+            print(f"Loading {path} eagerly: {str(e)}")
+            return None
+    
+    def snapshot_source(self, path, legacy_path):
+        """Pick the file to load and its format, falling back to the legacy JSON file"""
+        if os.path.exists(path):
+            return self.snapshot, path
+        if path != legacy_path and not self.directory and os.path.exists(legacy_path):
+            return JsonSnapshot(), legacy_path
+        return None, None
+    
+    def new_store(self, products=None):
+        """Build an empty (or pre-filled) product mapping of the configured kind"""
+        if self.store == 'columnar':
+            return ColumnarInventory(products)
+        if self.store == 'lazy':
+            return LazyInventory(None, products)
+        return dict(products) if products else {}
+    
+    def save_data(self):
+        """Save inventory and activity log to files (deferred while a batch is open)
+
+        Returns False if the files could not be written; the database then
+        stays dirty, so the next batch saves again. Data that no snapshot can
+        hold (a ValueError from the writer) is re-raised instead: retrying
+        would fail the same way, and every later save with it.
+        """
+        with self.lock:
+            if self._batch_depth:
+                self._dirty = True
+                return True
             
-            with open('activity_log.json', 'w') as f:
-                json.dump(self.activity_log, f, indent=2)
-        except Exception as e:
-            print(f"Error saving data: {str(e)}")
+            try:
+                mapped = self.write_snapshot(
+                    self.snapshot.dump_products, self.inventory, self.filename,
+                    self.inventory.base if isinstance(self.inventory, LazyInventory) else None,
+                    summary=self.stock_index.summary()
+                )
+                if mapped:
+                    self.inventory.rebase(mapped)
+                    self.stock_index.seed(self.inventory)
+                mapped = self.write_snapshot(
+                    self.snapshot.dump_activities, self.activity_log, self.log_filename,
+                    self.activity_log.base if isinstance(self.activity_log, LazyActivityLog) else None
+                )
+                if mapped:
+                    self.activity_log.rebase(mapped)
+                self.history.flush()
+                self._dirty = False
+                return True
+            except ValueError as e:
+                print(f"Error saving data, the database holds a value that cannot be written: {str(e)}")
+                self._dirty = True
+                raise
+            except Exception as e:
+                print(f"Error saving data: {str(e)}")
+                self._dirty = True
+                return False
     
-    def add_product(self, product_id, name, quantity, price, category=""):
-        """Add a new product to inventory"""
-        if product_id in self.inventory:
-            return False
-        
-        self.inventory[product_id] = {
-            'name': name,
-            'quantity': quantity,
-            'price': price,
-            'category': category,
-            'last_updated': str(datetime.now())
-        }
-        
+    def write_snapshot(self, dump, data, path, mapped, **kwargs):
+        """Write one snapshot file; returns the new mapping if the old file was mapped
+
+        Windows cannot replace a file that is memory-mapped, so a mapped
+        snapshot is written next to the old one, and the old mapping is only
+        closed (under the lock) to move the new file into place and map it.
+        """
+        if mapped is None:
+            dump(data, path, **kwargs)
+            return None
+        staged = f"{path}.new"
+        dump(data, staged, **kwargs)
+        mapped.close()
+        os.replace(staged, path)
+        return type(mapped)(path)
+    
+    @contextmanager
+    def batch(self):
+        """Hold the lock and write files once for a group of operations"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self.save_data()
+    
+    def log_activity(self, agent, action, details):
+        """Append an entry to the activity log and persist it"""
         activity = {
             'timestamp': str(datetime.now()),
-            'agent': 'InventoryManager',
-            'action': 'add_product',
-            'details': f"Added {name} (ID: {product_id}), Qty: {quantity}, Price: {price}"
+            'agent': agent,
+            'action': action,
+            'details': details
         }
-        self.activity_log.append(activity)
-        self.save_data()
-        return True
+        with self.lock:
+            self.activity_log.append(activity)
+            self.changes.publish('activity', value=activity)
+            self.save_data()
+        return activity
+    
+    def _product_changed(self, product_id, bump=True, sold=0):
+        """Re-index a product after a write and publish it to the change feed
+
+        Every write bumps the product's version (see update_product); replicas
+        pass bump=False since the writer already did. sold is the number of
+        units that left stock, published as a 'sale' event for sales trends.
+        """
+        product = self.inventory.get(product_id)
+        if product is None:
+            self.stock_index.remove(product_id)
+            self.history.record(product_id, 0)
+            self.changes.publish('product', product_id)
+        else:
+            if bump:
+                product['version'] = product.get('version', 0) + 1
+            self.stock_index.update(product_id, product)
+            self.history.record(product_id, product['quantity'])
+            self.changes.publish('product', product_id, dict(product))
+        if sold > 0:
+            self.changes.publish('sale', product_id, sold)
+    
+    def add_product(self, product_id, name, quantity, price, category=""):
+        """Add a new product to inventory"""
+        problem = product_value_error(name, quantity, price, category)
+        if problem:
+            print(f"Cannot add product {product_id}: {problem}")
+            return False
+        quantity, price = int(quantity), float(price)
+        with self.lock:
+            if product_id in self.inventory:
+                return False
+            
+            self.inventory[product_id] = {
+                'name': name,
+                'quantity': quantity,
+                'price': price,
+                'category': category,
+                'last_updated': str(datetime.now())
+            }
+            self._product_changed(product_id)
+            
+            self.log_activity(
+                'InventoryManager', 'add_product',
+                f"Added {name} (ID: {product_id}), Qty: {quantity}, Price: {price}"
+            )
+            return True
     
     def update_quantity(self, product_id, change):
         """Update product quantity"""
-        if product_id not in self.inventory:
+        if not is_integer(change):
+            print(f"Cannot update product {product_id}: change must be a whole number, not {change!r}")
             return False
-        
-        self.inventory[product_id]['quantity'] += change
-        self.inventory[product_id]['last_updated'] = str(datetime.now())
-        
-        activity = {
-            'timestamp': str(datetime.now()),
-            'agent': 'InventoryManager',
-            'action': 'update_quantity',
-            'details': f"Updated {self.inventory[product_id]['name']} (ID: {product_id}) by {change}. New Qty: {self.inventory[product_id]['quantity']}"
-        }
-        self.activity_log.append(activity)
-        self.save_data()
-        return True
+        with self.lock:
+            if product_id not in self.inventory:
+                return False
+            
+            problem = quantity_error(self.inventory[product_id]['quantity'] + change)
+            if problem:
+                print(f"Cannot update product {product_id}: {problem}")
+                return False
+            
+            self.inventory[product_id]['quantity'] += change
+            self.inventory[product_id]['last_updated'] = str(datetime.now())
+            self._product_changed(product_id, sold=-change)
+            
+            self.log_activity(
+                'InventoryManager', 'update_quantity',
+                f"Updated {self.inventory[product_id]['name']} (ID: {product_id}) by {change}. New Qty: {self.inventory[product_id]['quantity']}"
+            )
+            return True
     
     def sell_product(self, product_id, quantity_sold):
         """Sell a product (reduce quantity)"""
-        if product_id not in self.inventory:
-            return False
-        
-        if self.inventory[product_id]['quantity'] < quantity_sold:
+        if not is_integer(quantity_sold):
+            print(f"Cannot sell product {product_id}: quantity must be a whole number, not {quantity_sold!r}")
             return False
-        
-        self.inventory[product_id]['quantity'] -= quantity_sold
-        self.inventory[product_id]['last_updated'] = str(datetime.now())
-        
-        activity = {
-            'timestamp': str(datetime.now()),
-            'agent': 'InventoryManager',
-            'action': 'sell_product',
-            'details': f"Sold {quantity_sold} of {self.inventory[product_id]['name']} (ID: {product_id}). Remaining Qty: {self.inventory[product_id]['quantity']}"
-        }
-        self.activity_log.append(activity)
-        self.save_data()
-        return True
+        with self.lock:
+            if product_id not in self.inventory:
+                return False
+            
+            if self.inventory[product_id]['quantity'] < quantity_sold:
+                return False
+            
+            problem = quantity_error(self.inventory[product_id]['quantity'] - quantity_sold)
+            if problem:
+                print(f"Cannot sell product {product_id}: {problem}")
+                return False
+            
+            self.inventory[product_id]['quantity'] -= quantity_sold
+            self.inventory[product_id]['last_updated'] = str(datetime.now())
+            self._product_changed(product_id, sold=quantity_sold)
+            
+            self.log_activity(
+                'InventoryManager', 'sell_product',
+                f"Sold {quantity_sold} of {self.inventory[product_id]['name']} (ID: {product_id}). Remaining Qty: {self.inventory[product_id]['quantity']}"
+            )
+            return True
     
     def delete_product(self, product_id):
         """Remove a product from inventory"""
-        if product_id not in self.inventory:
+        with self.lock:
+            if product_id not in self.inventory:
+                return False
+            
+            product_name = self.inventory[product_id]['name']
+            del self.inventory[product_id]
+            self._product_changed(product_id)
+            
+            self.log_activity(
+                'InventoryManager', 'delete_product',
+                f"Deleted {product_name} (ID: {product_id})"
+            )
+            return True
+    
+    def get_product(self, product_id):
+        """Get a copy of a product (including its version), or None"""
+        with self.lock:
+            product = self.inventory.get(product_id)
+            return dict(product) if product is not None else None
+    
+    def update_product(self, product_id, name, quantity, price, category="", agent='InventoryManager',
+                       expected_version=None):
+        """Replace the editable fields of an existing product
+
+        With expected_version this is a compare-and-set: if the product was
+        written since that version was read, VersionConflictError is raised
+        and nothing changes.
+        """
+        problem = product_value_error(name, quantity, price, category)
+        if problem:
+            print(f"Cannot update product {product_id}: {problem}")
             return False
-        
-        product_name = self.inventory[product_id]['name']
-        del self.inventory[product_id]
-        
-        activity = {
-            'timestamp': str(datetime.now()),
-            'agent': 'InventoryManager',
-            'action': 'delete_product',
-            'details': f"Deleted {product_name} (ID: {product_id})"
-        }
-        self.activity_log.append(activity)
-        self.save_data()
-        return True
+        quantity, price = int(quantity), float(price)
+        with self.lock:
+            if product_id not in self.inventory:
+                return False
+            
+            current_version = self.inventory[product_id].get('version', 0)
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflictError(product_id, expected_version, current_version)
+            
+            sold = self.inventory[product_id]['quantity'] - quantity
+            self.inventory[product_id].update({
+                'name': name,
+                'quantity': quantity,
+                'price': price,
+                'category': category,
+                'last_updated': str(datetime.now())
+            })
+            self._product_changed(product_id, sold=sold)
+            
+            self.log_activity(agent, 'update_product', f"Updated {name} (ID: {product_id})")
+            return True
+    
+    def clear_activity_log(self):
+        """Drop every entry from the activity log"""
+        with self.lock:
+            self.activity_log = []
+            self.changes.publish('clear_activity_log')
+            self.save_data()
+    
+    def reset_database(self):
+        """Drop every product and the activity log"""
+        with self.lock:
+            self._reset()
+            self.save_data()
+    
+    def _reset(self):
+        """Empty the in-memory state and tell replicas (the caller saves)"""
+        for product_id in list(self.inventory):
+            self.history.record(product_id, 0)
+        self.inventory = self.new_store()
+        self.activity_log = []
+        self.stock_index.rebuild(self.inventory)
+        self.changes.publish('reset')
     
     def get_inventory_status(self):
         """Get summary of inventory status"""
-        status = {
-            'total_products': len(self.inventory),
-            'out_of_stock': sum(1 for p in self.inventory.values() if p['quantity'] <= 0),
-            'low_stock': sum(1 for p in self.inventory.values() if 0 < p['quantity'] < 10),
-            'total_value': sum(p['quantity'] * p['price'] for p in self.inventory.values())
-        }
+        with self.lock:
+            status = {
+                'total_products': len(self.inventory),
+                'out_of_stock': self.stock_index.count(STOCK_OUT),
+                'low_stock': self.stock_index.count(STOCK_LOW),
+                'total_value': self.stock_index.total_value
+            }
         return status
     
+    def get_stock_state(self, product_id):
+        """Get the stock state (ok/low/out) of a product, or None if unknown"""
+        return self.stock_index.state(product_id)
+    
+    def get_low_stock_products(self):
+        """Get low-stock products as {product_id: product}"""
+        with self.lock:
+            return {pid: self.inventory[pid] for pid in self.stock_index.ids(STOCK_LOW)}
+    
+    def get_out_of_stock_products(self):
+        """Get out-of-stock products as {product_id: product}"""
+        with self.lock:
+            return {pid: self.inventory[pid] for pid in self.stock_index.ids(STOCK_OUT)}
+    
+    def refresh_stock_state(self, product_id):
+        """Re-bucket a product after it was edited outside the DB methods"""
+        with self.lock:
+            if product_id in self.inventory:
+                self.stock_index.update(product_id, self.inventory[product_id])
+            else:
+                self.stock_index.remove(product_id)
+    
+    def rebuild_stock_index(self):
+        """Re-bucket every product (e.g. after replacing the inventory dict)"""
+        with self.lock:
+            self.stock_index.rebuild(self.inventory)
+    
+    def set_sku_threshold(self, product_id, threshold):
+        """Set (or clear with None) the low-stock threshold for one SKU"""
+        with self.lock:
+            if threshold is None:
+                self.thresholds.by_sku.pop(product_id, None)
+            else:
+                self.thresholds.by_sku[product_id] = threshold
+            self.thresholds.save()
+            self.changes.publish('thresholds', value=self.thresholds.to_dict())
+            self.refresh_stock_state(product_id)
+    
+    def set_category_threshold(self, category, threshold):
+        """Set (or clear with None) the low-stock threshold for a category"""
+        with self.lock:
+            if threshold is None:
+                self.thresholds.by_category.pop(category, None)
+            else:
+                self.thresholds.by_category[category] = threshold
+            self.thresholds.save()
+            self.changes.publish('thresholds', value=self.thresholds.to_dict())
+            for product_id in self.stock_index.category_members(category):
+                self.refresh_stock_state(product_id)
+    
+    def set_default_threshold(self, threshold):
+        """Set the low-stock threshold used when no override applies"""
+        with self.lock:
+            self.thresholds.default = threshold
+            self.thresholds.save()
+            self.changes.publish('thresholds', value=self.thresholds.to_dict())
+            self.rebuild_stock_index()
+    
     def get_recent_activities(self, limit=10):
         """Get recent activities from log"""
-        return self.activity_log[-limit:][::-1]
+        with self.lock:
+            return self.activity_log[-limit:][::-1]
 
 # ========================
 # WhatsApp Agent
 # ========================
 
 class WhatsAppAgent:
-    def __init__(self, db):
+    def __init__(self, db, context=None):
         self.db = db
         self.name = "WhatsApp Agent"
         
@@ -172,6 +869,13 @@ class WhatsAppAgent:
         else:
             print("Warning: Twilio credentials not found. WhatsApp notifications will not work.")
             self.twilio_client = None
+        
+        # Summaries and cached answers behind suggest_actions (see ai_context.py);
+        # an agent replacing another takes over its context, which stays
+        # subscribed to the change feed for as long as the database lives
+        self.model = model
+        self.context = context or PromptContext(db)
+        self.prompt_cache = PromptCache()
     
     def send_real_whatsapp(self, message):
         """Send actual WhatsApp message using Twilio API"""
@@ -180,9 +884,7 @@ class WhatsAppAgent:
             return False
         
         try:
-            # Ensure numbers are in correct format
-            from_whatsapp = f"whatsapp:{self.twilio_whatsapp_number.strip('whatsapp:')}"
-            to_whatsapp = f"whatsapp:{self.recipient_number.strip('whatsapp:')}"
+            from_whatsapp, to_whatsapp = self.whatsapp_numbers()
             
             print(f"Attempting to send WhatsApp message to {to_whatsapp}")
             
@@ -195,14 +897,7 @@ class WhatsAppAgent:
             print(f"WhatsApp message sent successfully! SID: {message.sid}")
             
             # Log the activity
-            activity = {
-                'timestamp': str(datetime.now()),
-                'agent': self.name,
-                'action': 'whatsapp_notification',
-                'details': f"Sent WhatsApp to {self.recipient_number}: {message}"
-            }
-            self.db.activity_log.append(activity)
-            self.db.save_data()
+            self.db.log_activity(self.name, 'whatsapp_notification', f"Sent WhatsApp to {self.recipient_number}: {message}")
             
             return True
         except Exception as e:
@@ -210,17 +905,16 @@ class WhatsAppAgent:
             print(error_msg)
             
             # Log the error
-            activity = {
-                'timestamp': str(datetime.now()),
-                'agent': self.name,
-                'action': 'whatsapp_error',
-                'details': error_msg
-            }
-            self.db.activity_log.append(activity)
-            self.db.save_data()
+            self.db.log_activity(self.name, 'whatsapp_error', error_msg)
             
             return False
     
+    def whatsapp_numbers(self, recipient=None):
+        """Get (from, to) in Twilio's whatsapp:+number format"""
+        from_whatsapp = f"whatsapp:{self.twilio_whatsapp_number.strip('whatsapp:')}"
+        to_whatsapp = f"whatsapp:{(recipient or self.recipient_number).strip('whatsapp:')}"
+        return from_whatsapp, to_whatsapp
+    
     def send_message(self, message):
         """Send a WhatsApp-style message (console and real)"""
         timestamp = datetime.now().strftime("%H:%M")
@@ -231,50 +925,51 @@ class WhatsAppAgent:
             self.send_real_whatsapp(message)
         
         # Log the activity
-        activity = {
-            'timestamp': str(datetime.now()),
-            'agent': self.name,
-            'action': 'notification',
-            'details': message
-        }
-        self.db.activity_log.append(activity)
-        self.db.save_data()
+        self.db.log_activity(self.name, 'notification', message)
     
-    def get_ai_response(self, prompt):
-        """Get AI-generated response using Gemini"""
+    def get_ai_response(self, prompt, cache_key=None):
+        """Get AI-generated response using Gemini, reusing a cached answer for cache_key"""
+        if cache_key is not None:
+            cached = self.prompt_cache.get(cache_key)
+            if cached is not None:
+                return cached
         try:
-            response = model.generate_content(
-                f"You are an inventory management assistant. Respond conversationally to: {prompt}"
-            )
+            response = self.model.generate_content(self.assistant_prompt(prompt))
+            if cache_key is not None:
+                self.prompt_cache.put(cache_key, response.text)
             return response.text
         except Exception as e:
             return f"Sorry, I encountered an error: {str(e)}"
     
-    def notify_activity(self):
-        """Notify about recent activities"""
-        activities = self.db.get_recent_activities(5)
+    def assistant_prompt(self, prompt):
+        """Wrap a user prompt with the assistant persona"""
+        return f"You are an inventory management assistant. Respond conversationally to: {prompt}"
+    
+    def activity_message(self, activities):
+        """Format recent activities as a WhatsApp message"""
         if not activities:
-            self.send_message("No recent activities to report.")
-            return
+            return "No recent activities to report."
         
         message = "📊 Recent Inventory Activities:\n"
         for idx, activity in enumerate(activities, 1):
             message += f"\n{idx}. ⏰ {activity['timestamp']}\n   👤 {activity['agent']}\n   🛠️ {activity['action']}\n   📝 {activity['details']}\n"
-        
-        self.send_message(message)
+        return message
+    
+    def notify_activity(self):
+        """Notify about recent activities"""
+        self.send_message(self.activity_message(self.db.get_recent_activities(5)))
+    
+    def suggestion_prompt(self):
+        """Build the prompt asking the AI for management actions; returns (prompt, cache key)"""
+        return self.context.build(
+            "Based on this inventory, suggest 3-5 management actions, naming the products and "
+            "categories they concern. Respond in a conversational WhatsApp message format with emojis."
+        )
     
     def suggest_actions(self):
         """Use AI to suggest inventory actions"""
-        status = self.db.get_inventory_status()
-        prompt = f"""Based on this inventory status, suggest 3-5 management actions:
-        - Total products: {status['total_products']}
-        - Out of stock: {status['out_of_stock']}
-        - Low stock: {status['low_stock']}
-        - Total inventory value: ${status['total_value']:.2f}
-        
-        Respond in a conversational WhatsApp message format with emojis."""
-        
-        suggestion = self.get_ai_response(prompt)
+        prompt, cache_key = self.suggestion_prompt()
+        suggestion = self.get_ai_response(prompt, cache_key)
         self.send_message("🤖 AI Suggestions:\n" + suggestion)
 
 # ========================
@@ -298,71 +993,71 @@ class EmailAgent:
         if to_email is None:
             to_email = self.recipient_email
         
-        if not all([self.smtp_server, self.smtp_port, self.sender_email, self.sender_password]):
+        if not self.is_configured():
             print("Email not configured properly - cannot send message")
             return False
         
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.sender_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Add both plain and HTML versions
-            msg.attach(MIMEText(body, 'plain'))
-            html_body = f"<pre>{body}</pre>"  # Simple HTML version
-            msg.attach(MIMEText(html_body, 'html'))
-            
-            if attachments:
-                for attachment in attachments:
-                    with open(attachment['filename'], 'rb') as f:
-                        part = MIMEApplication(
-                            f.read(),
-                            Name=os.path.basename(attachment['filename'])
-                        )
-                    part['Content-Disposition'] = f'attachment; filename="{os.path.basename(attachment["filename"])}"'
-                    msg.attach(part)
+            msg = self.build_message(subject, body, attachments, to_email)
             
             # Debug print before sending
             print(f"Attempting to send email to {to_email} with subject: {subject}")
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
-                print("Email sent successfully!")
+            self.deliver(msg)
+            print("Email sent successfully!")
             
             # Log email activity
-            activity = {
-                'timestamp': str(datetime.now()),
-                'agent': self.name,
-                'action': 'send_email',
-                'details': f"Sent email to {to_email} with subject: {subject}"
-            }
-            self.db.activity_log.append(activity)
-            self.db.save_data()
+            self.db.log_activity(self.name, 'send_email', f"Sent email to {to_email} with subject: {subject}")
             return True
         except Exception as e:
             error_msg = f"Failed to send email to {to_email}: {str(e)}"
             print(error_msg)
-            activity = {
-                'timestamp': str(datetime.now()),
-                'agent': self.name,
-                'action': 'email_error',
-                'details': error_msg
-            }
-            self.db.activity_log.append(activity)
-            self.db.save_data()
+            self.db.log_activity(self.name, 'email_error', error_msg)
             return False
     
+    def deliver(self, msg, recipients=None):
+        """Send a built message over one SMTP session, readdressed to each recipient if given"""
+        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            server.ehlo()
+            server.starttls()
+            server.ehlo()
+            server.login(self.sender_email, self.sender_password)
+            for recipient in recipients or [msg['To']]:
+                msg.replace_header('To', recipient)
+                server.send_message(msg)
+    
+    def is_configured(self):
+        return all([self.smtp_server, self.smtp_port, self.sender_email, self.sender_password])
+    
+    def build_message(self, subject, body, attachments=None, to_email=None):
+        """Build the MIME message: plain and HTML body plus file attachments"""
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = to_email or self.recipient_email
+        msg['Subject'] = subject
+        
+        # Add both plain and HTML versions
+        msg.attach(MIMEText(body, 'plain'))
+        html_body = f"<pre>{body}</pre>"  # Simple HTML version
+        msg.attach(MIMEText(html_body, 'html'))
+        
+        if attachments:
+            for attachment in attachments:
+                with open(attachment['filename'], 'rb') as f:
+                    part = MIMEApplication(
+                        f.read(),
+                        Name=os.path.basename(attachment['filename'])
+                    )
+                part['Content-Disposition'] = f'attachment; filename="{os.path.basename(attachment["filename"])}"'
+                msg.attach(part)
+        return msg
+    
     def generate_inventory_report_csv(self):
         """Generate CSV report of current inventory"""
         filename = f"inventory_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         try:
             with open(filename, 'w', newline='') as csvfile:
-                fieldnames = ['ID', 'Name', 'Category', 'Quantity', 'Price', 'Last Updated']
+                fieldnames = ['ID', 'Name', 'Category', 'Quantity', 'Price', 'Last Updated', 'Stock Status']
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 
                 writer.writeheader()
@@ -373,13 +1068,60 @@ class EmailAgent:
                         'Category': product['category'],
                         'Quantity': product['quantity'],
                         'Price': product['price'],
-                        'Last Updated': product['last_updated']
+                        'Last Updated': product['last_updated'],
+                        'Stock Status': self.db.get_stock_state(product_id)
                     })
             return filename
         except Exception as e:
             print(f"Error generating CSV report: {str(e)}")
             return None
     
+    def generate_history_report_csv(self, days=7, product_ids=None):
+        """Generate CSV of end-of-day stock per product over the last few days"""
+        filename = f"stock_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        end = datetime.now()
+        moments = [end - timedelta(days=offset) for offset in range(days, -1, -1)]
+        try:
+            with open(filename, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['ID', 'Name'] + [moment.strftime('%Y-%m-%d %H:%M') for moment in moments])
+                
+                if product_ids is None:
+                    product_ids = sorted(set(self.db.history.product_ids()) | set(self.db.inventory))
+                for product_id in product_ids:
+                    product = self.db.inventory.get(product_id)
+                    writer.writerow(
+                        [product_id, product['name'] if product else "(deleted)"] +
+                        [self.db.history.quantity_at(product_id, moment) for moment in moments]
+                    )
+            return filename
+        except Exception as e:
+            print(f"Error generating history CSV: {str(e)}")
+            return None
+    
+    def send_history_report(self, days=7):
+        """Email the stock history CSV for the last few days"""
+        csv_file = self.generate_history_report_csv(days)
+        if not csv_file:
+            return False
+        
+        body = f"""📈 Stock history for the last {days} days.
+
+📎 The attached CSV has one row per product and its stock level at this time of day on each day.
+"""
+        success = self.send_email(
+            f"Inventory Stock History - {datetime.now().strftime('%Y-%m-%d')}",
+            body,
+            [{'filename': csv_file, 'description': 'Stock History CSV'}]
+        )
+        
+        try:
+            os.remove(csv_file)
+        except Exception as e:
+            print(f"Error removing CSV file: {str(e)}")
+        
+        return success
+    
     def send_daily_report(self):
         """Send daily inventory report with CSV attachment"""
         status = self.db.get_inventory_status()
@@ -425,8 +1167,8 @@ class EmailAgent:
         
         return success
 
-    def send_activity_notification(self, message):
-        """Send immediate notification about important activities"""
+    def activity_notification(self, message):
+        """Get (subject, body) of an activity notification email"""
         subject = "🚨 Inventory Activity Notification"
         body = f"""📢 New inventory activity:
         
@@ -434,75 +1176,79 @@ class EmailAgent:
 
 ⏰ Timestamp: {datetime.now()}
 """
-        return self.send_email(subject, body)
+        return subject, body
+    
+    def send_activity_notification(self, message):
+        """Send immediate notification about important activities"""
+        return self.send_email(*self.activity_notification(message))
 
 # ========================
 # Inventory Manager Agent
 # ========================
 
 class InventoryManager:
-    def __init__(self, db, whatsapp_agent, email_agent):
+    def __init__(self, db, whatsapp_agent, email_agent, autostart=True, notifier=None):
         self.db = db
         self.whatsapp_agent = whatsapp_agent
         self.email_agent = email_agent
+        self.notifier = notifier
         self.name = "Inventory Manager"
-        self.running = True
+        self.running = autostart
+        self.stopped = threading.Event()
         self.thread = threading.Thread(target=self.monitor_inventory)
         self.thread.daemon = True
-        self.thread.start()
+        if autostart:
+            self.thread.start()
     
     def monitor_inventory(self):
         """Background monitoring of inventory"""
         while self.running:
             try:
-                status = self.db.get_inventory_status()
-                
-                # Check for out of stock items
-                if status['out_of_stock'] > 0:
-                    message = f"🚨 Alert: {status['out_of_stock']} product(s) out of stock!"
-                    self.whatsapp_agent.send_message(message)
-                    self.email_agent.send_activity_notification(message)
-                    
-                    activity = {
-                        'timestamp': str(datetime.now()),
-                        'agent': self.name,
-                        'action': 'out_of_stock_alert',
-                        'details': f"{status['out_of_stock']} product(s) out of stock"
-                    }
-                    self.db.activity_log.append(activity)
-                    self.db.save_data()
+                self.check_inventory()
                 
-                # Check for low stock items
-                if status['low_stock'] > 0:
-                    message = f"⚠️ Alert: {status['low_stock']} product(s) low on stock!"
-                    self.whatsapp_agent.send_message(message)
-                    self.email_agent.send_activity_notification(message)
-                    
-                    activity = {
-                        'timestamp': str(datetime.now()),
-                        'agent': self.name,
-                        'action': 'low_stock_alert',
-                        'details': f"{status['low_stock']} product(s) low on stock"
-                    }
-                    self.db.activity_log.append(activity)
-                    self.db.save_data()
-                
-                # Send daily report at 9 AM
-                now = datetime.now()
-                if now.hour == 9 and now.minute == 0:
-                    self.email_agent.send_daily_report()
-                    self.whatsapp_agent.send_message("📅 Daily inventory report has been sent to your email!")
-                
-                time.sleep(60)  # Check every minute (for demo purposes)
+                # The daily report runs on the scheduler (see InventorySystem)
+                self.stopped.wait(60)  # Check every minute (for demo purposes)
                 
             except Exception as e:
                 print(f"Error in inventory monitoring: {str(e)}")
-                time.sleep(60)  # Wait before retrying
+                self.stopped.wait(60)  # Wait before retrying
+    
+    def check_inventory(self):
+        """Send and log the current out-of-stock and low-stock alerts"""
+        alerts = alert_products(self.db)
+        if self.notifier and self.notifier.subscriptions:
+            # Each subscriber gets the products in their categories
+            self.notifier.notify(alerts)
+        else:
+            for action, products in alerts:
+                message = alert_message(action, products)
+                self.whatsapp_agent.send_message(message)
+                self.email_agent.send_activity_notification(message)
+        
+        for action, products in alerts:
+            self.db.log_activity(self.name, action, alert_details(action, products))
+    
+    def send_daily_report(self):
+        """Email the daily report and announce it on WhatsApp"""
+        if self.email_agent.send_daily_report():
+            self.whatsapp_agent.send_message("📅 Daily inventory report has been sent to your email!")
     
     def stop(self):
         """Stop the monitoring thread"""
         self.running = False
-        self.thread.join()
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+    
+    def restart(self):
+        """Start monitoring again after stop(), keeping the agents and notifier"""
+        if self.thread.is_alive():
+            return
+        self.running = True
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.monitor_inventory)
+        self.thread.daemon = True
+        self.thread.start()
 
 # ========================
 # Main System
@@ -510,18 +1256,59 @@ class InventoryManager:
 
 class InventorySystem:
     def __init__(self):
-        # Initialize database
-        self.db = InventoryDB()
+        # Initialize database; replicas forward writes to the writer process
+        # (see replication.py), which is also the only one running the monitor
+        replica = os.getenv('INVENTORY_ROLE') == 'replica'
+        self.replica = replica
+        self.locations = None
+        if replica:
+            from replication import ReplicaDB
+            self.db = ReplicaDB()
+        elif os.getenv('INVENTORY_LOCATIONS'):
+            # Multi-location: agents and the UI work on this site's shard
+            from locations import LocationInventory
+            self.locations = LocationInventory()
+            self.db = self.locations.shard(os.getenv('INVENTORY_LOCATION') or self.locations.names[0])
+        else:
+            self.db = InventoryDB()
         
         # Initialize agents
         self.whatsapp_agent = WhatsAppAgent(self.db)
         self.email_agent = EmailAgent(self.db)
+        # Alerts go to every subscriber in INVENTORY_SUBSCRIPTIONS if there are any,
+        # otherwise to the single RECIPIENT_* contact
+        self.notifier = Notifier(self.db, self.whatsapp_agent, self.email_agent)
         self.inventory_manager = InventoryManager(
             self.db, 
             self.whatsapp_agent, 
-            self.email_agent
+            self.email_agent,
+            autostart=not replica,
+            notifier=self.notifier
         )
         
+        # Periodic jobs run on the scheduler's worker pool, never on the monitor
+        # thread; like the monitor, only the writer runs them
+        self.scheduler = Scheduler()
+        if not replica:
+            self.scheduler.add_job(
+                'daily_report', self.inventory_manager.send_daily_report,
+                os.getenv('INVENTORY_REPORT_SCHEDULE', '0 9 * * *'),
+                jitter=int(os.getenv('INVENTORY_SCHEDULER_JITTER', 30))
+            )
+            if os.getenv('INVENTORY_SUGGESTIONS_SCHEDULE'):
+                self.scheduler.add_job(
+                    'ai_suggestions', self.whatsapp_agent.suggest_actions,
+                    os.getenv('INVENTORY_SUGGESTIONS_SCHEDULE'),
+                    jitter=int(os.getenv('INVENTORY_SCHEDULER_JITTER', 30))
+                )
+            self.scheduler.start()
+        
+        # Serve the REST API from this process if a port is configured
+        self.api_server = None
+        if os.getenv('INVENTORY_API_PORT'):
+            from api_server import start_api_server
+            self.api_server = start_api_server(self.db)
+        
         # Start with initial notifications
         self.whatsapp_agent.send_message("🔄 Inventory system initialized and ready!")
         self.email_agent.send_email(
@@ -529,9 +1316,23 @@ class InventorySystem:
             'Inventory management system is now running'
         )
     
+    def pause(self):
+        """Stop the stock monitor and skip scheduled jobs (e.g. the daily report)"""
+        self.inventory_manager.stop()
+        self.scheduler.pause()
+    
+    def resume(self):
+        """Undo pause()"""
+        if not self.replica:
+            self.inventory_manager.restart()
+        self.scheduler.resume()
+    
     def shutdown(self):
         """Shut down the system"""
         self.inventory_manager.stop()
+        self.scheduler.stop()
+        if self.api_server:
+            self.api_server.should_exit = True
         self.whatsapp_agent.send_message("🛑 Inventory system shutting down. Goodbye!")
         self.email_agent.send_email(
             "System Shutdown",
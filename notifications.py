@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+from async_agents import AsyncEmailAgent, AsyncWhatsAppAgent
+from alerts import alert_message
+
+# ========================
+# Subscriptions
+# ========================
+#
+# INVENTORY_SUBSCRIPTIONS (default subscriptions.json) lists who gets which
+# stock alerts:
+#   [{"name": "East store", "whatsapp": "+15550100", "email": "east@example.com",
+#     "categories": ["Electronics"], "alerts": ["out_of_stock"]}]
+# Missing or empty "categories" / "alerts" mean all of them. Alert names are
+# the monitor's actions with or without the "_alert" suffix.
+
+class Subscription:
+    """One recipient and the categories and alert types they follow"""
+    def __init__(self, name, whatsapp=None, email=None, categories=None, alerts=None):
+        self.name = name
+        self.whatsapp = whatsapp
+        self.email = email
+        self.categories = frozenset(categories) if categories else None
+        self.alerts = frozenset(alert.removesuffix('_alert') for alert in alerts) if alerts else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get('name') or data.get('email') or data.get('whatsapp'),
+            data.get('whatsapp'),
+            data.get('email'),
+            data.get('categories'),
+            data.get('alerts')
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'whatsapp': self.whatsapp,
+            'email': self.email,
+            'categories': sorted(self.categories) if self.categories else [],
+            'alerts': sorted(self.alerts) if self.alerts else []
+        }
+
+    def wants(self, action):
+        return self.alerts is None or action.removesuffix('_alert') in self.alerts
+
+    def select(self, products):
+        """The products of an alert this subscriber follows"""
+        if self.categories is None:
+            return products
+        return {
+            product_id: product for product_id, product in products.items()
+            if product.get('category') in self.categories
+        }
+
+def load_subscriptions(filename=None):
+    """Read the subscription list; empty if the file does not exist"""
+    filename = filename or os.getenv('INVENTORY_SUBSCRIPTIONS', 'subscriptions.json')
+    try:
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                return [Subscription.from_dict(data) for data in json.load(f)]
+    except Exception as e:
+        print(f"Error loading subscriptions: {str(e)}")
+    return []
+
+# ========================
+# Notifier
+# ========================
+
+class Notifier:
+    """Routes stock alerts to subscribers and delivers them in parallel
+
+    Subscribers who would receive exactly the same products for an alert
+    form one audience; its message is rendered once and sent to all of them
+    together (WhatsApp messages concurrently, email in SMTP batches, see
+    async_agents), and every audience is delivered at the same time.
+    """
+    # Async agents created for each delivery (loadtest.py swaps in fakes)
+    whatsapp_class = AsyncWhatsAppAgent
+    email_class = AsyncEmailAgent
+
+    def __init__(self, db, whatsapp_agent, email_agent, subscriptions=None, max_concurrency=None):
+        self.db = db
+        self.whatsapp_agent = whatsapp_agent
+        self.email_agent = email_agent
+        self.max_concurrency = max_concurrency
+        self.name = "Notifier"
+        self.subscriptions = subscriptions if subscriptions is not None else load_subscriptions()
+
+    def reload(self, filename=None):
+        self.subscriptions = load_subscriptions(filename)
+
+    def audiences(self, alerts):
+        """Group subscribers of [(action, {product_id: product})] by what they would receive
+
+        Returns [{'action', 'products', 'message', 'whatsapp': [...], 'email': [...]}].
+        """
+        audiences = {}
+        for action, products in alerts:
+            # Subscribers following the same categories always see the same products
+            selections = {}
+            for subscription in self.subscriptions:
+                if not subscription.wants(action):
+                    continue
+                if subscription.categories not in selections:
+                    selections[subscription.categories] = subscription.select(products)
+                selected = selections[subscription.categories]
+                if not selected:
+                    continue
+                key = (action, frozenset(selected))
+                audience = audiences.get(key)
+                if audience is None:
+                    audience = audiences[key] = {
+                        'action': action,
+                        'products': selected,
+                        'message': alert_message(action, selected),
+                        'whatsapp': {},
+                        'email': {}
+                    }
+                # Dicts keep recipients unique and in subscription order
+                if subscription.whatsapp:
+                    audience['whatsapp'][subscription.whatsapp] = True
+                if subscription.email:
+                    audience['email'][subscription.email] = True
+        for audience in audiences.values():
+            audience['whatsapp'] = list(audience['whatsapp'])
+            audience['email'] = list(audience['email'])
+        return list(audiences.values())
+
+    async def deliver(self, audiences, whatsapp=None, email=None):
+        """Send every audience its message at once; returns the number of successful deliveries
+
+        Async agents are created for this call (and closed after) unless passed in.
+        """
+        owned = whatsapp is None
+        whatsapp = whatsapp or self.whatsapp_class(self.whatsapp_agent, self.max_concurrency)
+        email = email or self.email_class(self.email_agent, self.max_concurrency)
+        try:
+            sends = []
+            for audience in audiences:
+                timestamp = datetime.now().strftime("%H:%M")
+                recipients = len(audience['whatsapp']) + len(audience['email'])
+                print(f"[{timestamp}] {self.name}: {audience['action']} to {recipients} recipient(s)")
+                subject, body = self.email_agent.activity_notification(audience['message'])
+                sends.append(whatsapp.send_to_many(audience['message'], audience['whatsapp']))
+                sends.append(email.send_to_many(subject, body, audience['email']))
+            results = await asyncio.gather(*sends)
+        finally:
+            if owned:
+                await whatsapp.close()
+        return sum(sum(sent) for sent in results)
+
+    def notify(self, alerts):
+        """Deliver alerts to every subscriber from synchronous code (e.g. the monitor thread)"""
+        audiences = self.audiences(alerts)
+        if not audiences:
+            return 0
+        return asyncio.run(self.deliver(audiences))
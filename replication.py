@@ -0,0 +1,380 @@
+import ipaddress
+import os
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+from main import InventoryDB, InventorySystem, StockThresholds, VersionConflictError
+
+# Methods a replica may forward to the writer; everything else is read locally
+WRITE_METHODS = {
+    'add_product', 'update_quantity', 'sell_product', 'delete_product', 'update_product',
+    'log_activity', 'clear_activity_log', 'reset_database',
+    'set_sku_threshold', 'set_category_threshold', 'set_default_threshold'
+}
+
+# StockHistory queries a replica sends to the writer, which owns the history log
+HISTORY_METHODS = {'quantity_at', 'total_at', 'sample', 'changes', 'product_ids'}
+
+def parse_address(address):
+    """Turn "host:port" into a TCP address; anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+def writer_address():
+    return parse_address(os.getenv('INVENTORY_WRITER_ADDRESS', '127.0.0.1:6000'))
+
+def is_loopback(address):
+    """True for Unix sockets and TCP addresses only reachable from this machine"""
+    if not isinstance(address, tuple):
+        return True
+    host = address[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def writer_authkey(address=None):
+    """Shared secret for the writer socket (INVENTORY_REPLICATION_KEY)
+
+    Connections exchange pickled messages, so a known key would let anyone
+    who can reach the port run code on the writer: the built-in default is
+    only used for loopback and Unix socket addresses.
+    """
+    key = os.getenv('INVENTORY_REPLICATION_KEY')
+    if key:
+        return key.encode()
+    address = address or writer_address()
+    if not is_loopback(address):
+        raise ValueError(f"INVENTORY_REPLICATION_KEY must be set to replicate over {address}")
+    return b'inventory'
+
+def take_snapshot(db):
+    """Copy the writer's state together with the feed position it matches"""
+    with db.lock:
+        return {
+            'seq': db.changes.seq,
+            'inventory': {pid: dict(product) for pid, product in db.inventory.items()},
+            'activity_log': list(db.activity_log),
+            'thresholds': db.thresholds.to_dict()
+        }
+
+# ========================
+# Writer Server
+# ========================
+
+class WriterServer:
+    """Owns the only InventoryDB that writes files and serves replicas over a socket"""
+    def __init__(self, db, address=None, authkey=None):
+        self.db = db
+        self.address = address or writer_address()
+        self.listener = Listener(self.address, authkey=authkey or writer_authkey(self.address))
+        self.running = True
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.accept_loop()
+
+    def stop(self):
+        self.running = False
+        self.listener.close()
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                break
+            except Exception as e:
+                print(f"Rejected replica connection: {str(e)}")
+                continue
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        """First message picks the role: ('rpc',) or ('subscribe', seq or None for a snapshot first)"""
+        try:
+            role = conn.recv()
+            if role[0] == 'rpc':
+                self.serve_rpc(conn)
+            elif role[0] == 'subscribe':
+                self.serve_stream(conn, role[1])
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_rpc(self, conn):
+        while self.running:
+            method, args, kwargs = conn.recv()
+            if method == 'snapshot':
+                conn.send(('ok', take_snapshot(self.db), self.db.changes.seq))
+                continue
+            if method == 'history' and args and args[0] in HISTORY_METHODS:
+                target, (method, *args) = self.db.history, args
+            elif method in WRITE_METHODS:
+                target = self.db
+            else:
+                conn.send(('error', f"Unknown method {method}", self.db.changes.seq))
+                continue
+            try:
+                result = getattr(target, method)(*args, **kwargs)
+                conn.send(('ok', result, self.db.changes.seq))
+            except VersionConflictError as e:
+                conn.send(('error', e, self.db.changes.seq))
+            except Exception as e:
+                conn.send(('error', str(e), self.db.changes.seq))
+
+    def serve_stream(self, conn, seq):
+        """Push change events after seq, or a fresh snapshot if the replica fell behind"""
+        while self.running:
+            events = self.db.changes.since(seq) if seq is not None else None
+            if events is None:
+                snapshot = take_snapshot(self.db)
+                conn.send(('snapshot', snapshot))
+                seq = snapshot['seq']
+            elif events:
+                conn.send(('events', events))
+                seq = events[-1]['seq']
+            self.db.changes.wait(seq, timeout=1)
+
+# ========================
+# Read Replica
+# ========================
+
+class RemoteHistory:
+    """StockHistory stand-in for replicas: queries are answered by the writer
+
+    The writer records every change and owns the history log, so a replica
+    sees the same history however long it has been running. Recording is a
+    no-op here; a writer that cannot be reached reads as no history.
+    """
+    def __init__(self, replica):
+        self.replica = replica
+        self.pending = []
+
+    def is_new(self):
+        return False
+
+    def record(self, product_id, quantity, when=None):
+        pass
+
+    def flush(self):
+        pass
+
+    def rollback(self, mark):
+        pass
+
+    def query(self, method, default, *args):
+        try:
+            status, result, _ = self.replica.request('history', method, *args)
+        except (EOFError, OSError) as e:
+            print(f"Error reading stock history from the writer: {str(e)}")
+            return default
+        if status == 'error':
+            print(f"Error reading stock history from the writer: {result}")
+            return default
+        return result
+
+    def quantity_at(self, product_id, when):
+        return self.query('quantity_at', None, product_id, when)
+
+    def total_at(self, when):
+        return self.query('total_at', None, when)
+
+    def sample(self, product_id, start, end, points=50):
+        return self.query('sample', [], product_id, start, end, points)
+
+    def changes(self, product_id, start, end):
+        return self.query('changes', [], product_id, start, end)
+
+    def product_ids(self):
+        return self.query('product_ids', [])
+
+class ReplicaDB(InventoryDB):
+    """InventoryDB that reads from a local replica and forwards writes to the writer"""
+    def __init__(self, address=None, authkey=None):
+        self.address = address or writer_address()
+        self.authkey = authkey or writer_authkey(self.address)
+        self.rpc = None
+        self.rpc_lock = threading.Lock()
+        self.max_backoff = float(os.getenv('INVENTORY_REPLICA_MAX_BACKOFF', 30))
+        self.applied = threading.Condition()
+        self.writer_seq = 0
+        # The writer owns the threshold and history files; replicas keep thresholds
+        # in memory and ask the writer for history
+        super().__init__(thresholds=StockThresholds(filename=None), history=RemoteHistory(self))
+        self.stream_thread = threading.Thread(target=self.follow, daemon=True)
+        self.stream_thread.start()
+
+    def request(self, method, *args, **kwargs):
+        """Send one RPC, connecting first if needed; a broken connection is dropped and re-raised
+
+        Writes are not retried: the writer may have applied one before the
+        connection broke, so the caller has to decide.
+        """
+        with self.rpc_lock:
+            try:
+                if self.rpc is None:
+                    self.rpc = Client(self.address, authkey=self.authkey)
+                    self.rpc.send(('rpc',))
+                self.rpc.send((method, args, kwargs))
+                return self.rpc.recv()
+            except (EOFError, OSError):
+                if self.rpc is not None:
+                    self.rpc.close()
+                self.rpc = None
+                raise
+
+    def call(self, method, *args, **kwargs):
+        """Run a write on the writer, then wait until the replica has applied it"""
+        status, result, seq = self.request(method, *args, **kwargs)
+        with self.applied:
+            self.applied.wait_for(lambda: self.writer_seq >= seq, timeout=5)
+        if status == 'error':
+            raise result if isinstance(result, Exception) else RuntimeError(result)
+        return result
+
+    def load_data(self):
+        """Replace local state with a snapshot from the writer"""
+        _, snapshot, _ = self.request('snapshot')
+        self.apply_snapshot(snapshot)
+
+    def save_data(self):
+        # The writer owns the files
+        pass
+
+    @contextmanager
+    def batch(self):
+        # Writes are applied by the writer, so there is nothing to hold locally
+        yield self
+
+    def apply_snapshot(self, snapshot, restart=False):
+        """Replace local state with a writer snapshot; restart=True after reconnecting,
+        when the writer's sequence numbers may have started over"""
+        with self.lock:
+            self.inventory = self.new_store(snapshot['inventory'])
+            self.activity_log = snapshot['activity_log']
+            self.thresholds.apply(snapshot['thresholds'])
+            self.stock_index.rebuild(self.inventory)
+            self.changes.publish('reset')
+        self.mark_applied(snapshot['seq'], restart)
+
+    def apply_event(self, event):
+        kind, key, value = event['kind'], event['key'], event['value']
+        with self.lock:
+            if kind == 'product':
+                if value is None:
+                    self.inventory.pop(key, None)
+                else:
+                    self.inventory[key] = value
+                self._product_changed(key, bump=False)
+            elif kind == 'sale':
+                self.changes.publish(kind, key, value)
+            elif kind == 'activity':
+                self.activity_log.append(value)
+                self.changes.publish('activity', value=value)
+            elif kind == 'thresholds':
+                self.thresholds.apply(value)
+                self.stock_index.rebuild(self.inventory)
+                self.changes.publish('thresholds', value=value)
+            elif kind == 'clear_activity_log':
+                self.activity_log = []
+                self.changes.publish(kind)
+            elif kind == 'reset':
+                self.inventory = self.new_store()
+                self.activity_log = []
+                self.stock_index.rebuild(self.inventory)
+                self.changes.publish(kind)
+
+    def mark_applied(self, seq, restart=False):
+        with self.applied:
+            self.writer_seq = seq if restart else max(self.writer_seq, seq)
+            self.applied.notify_all()
+
+    def follow(self):
+        """Apply the writer's change stream, reconnecting with backoff when it drops
+
+        After a reconnect the writer sends a full snapshot first, since it may
+        have restarted with a new change feed.
+        """
+        seq = self.writer_seq
+        backoff = 1
+        while True:
+            try:
+                stream = Client(self.address, authkey=self.authkey)
+                try:
+                    stream.send(('subscribe', seq))
+                    while True:
+                        kind, payload = stream.recv()
+                        backoff = 1
+                        if kind == 'snapshot':
+                            self.apply_snapshot(payload, restart=seq is None)
+                            seq = payload['seq']
+                            continue
+                        for event in payload:
+                            self.apply_event(event)
+                        seq = payload[-1]['seq']
+                        self.mark_applied(seq)
+                finally:
+                    stream.close()
+            except (EOFError, OSError) as e:
+                print(f"Lost connection to inventory writer, retrying in {backoff:g}s: {str(e)}")
+            seq = None
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def add_product(self, product_id, name, quantity, price, category=""):
+        return self.call('add_product', product_id, name, quantity, price, category)
+
+    def update_quantity(self, product_id, change):
+        return self.call('update_quantity', product_id, change)
+
+    def sell_product(self, product_id, quantity_sold):
+        return self.call('sell_product', product_id, quantity_sold)
+
+    def delete_product(self, product_id):
+        return self.call('delete_product', product_id)
+
+    def update_product(self, product_id, name, quantity, price, category="", agent='InventoryManager',
+                       expected_version=None):
+        return self.call(
+            'update_product', product_id, name, quantity, price, category,
+            agent=agent, expected_version=expected_version
+        )
+
+    def log_activity(self, agent, action, details):
+        return self.call('log_activity', agent, action, details)
+
+    def clear_activity_log(self):
+        return self.call('clear_activity_log')
+
+    def reset_database(self):
+        return self.call('reset_database')
+
+    def set_sku_threshold(self, product_id, threshold):
+        return self.call('set_sku_threshold', product_id, threshold)
+
+    def set_category_threshold(self, category, threshold):
+        return self.call('set_category_threshold', category, threshold)
+
+    def set_default_threshold(self, threshold):
+        return self.call('set_default_threshold', threshold)
+
+if __name__ == "__main__":
+    print("=== Inventory Writer ===")
+    system = InventorySystem()
+    server = WriterServer(system.db)
+    print(f"Serving replicas on {server.address}")
+    try:
+        server.serve_forever()
+    finally:
+        system.shutdown()
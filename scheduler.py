@@ -0,0 +1,285 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# ========================
+# Cron Schedules
+# ========================
+
+# (low, high) for minute, hour, day of month, month, day of week (0 and 7 = Sunday)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *'
+}
+
+def parse_cron_field(field, low, high):
+    """Expand one cron field ("*", "*/15", "1-5", "0,30", "8-18/2") into a set"""
+    values = set()
+    for part in field.split(','):
+        spec, _, step = part.partition('/')
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(value) for value in spec.split('-', 1))
+        else:
+            # "5/15" means from 5 to the end of the range in steps of 15
+            start = int(spec)
+            end = high if step else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field {field!r} is out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step or 1)))
+    return values
+
+class CronSchedule:
+    """Standard five-field cron expression in local time
+
+    As in cron, when both day of month and day of week are restricted a
+    day matches if either one does.
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields in {expression!r}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """First matching minute strictly after moment"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+class IntervalSchedule:
+    """Run every fixed number of seconds"""
+    def __init__(self, seconds):
+        self.interval = timedelta(seconds=seconds)
+
+    def __str__(self):
+        return f"every {self.interval.total_seconds():g}s"
+
+    def next_after(self, moment):
+        return moment + self.interval
+
+def make_schedule(schedule):
+    """Accept a cron string, a number of seconds or a ready-made schedule"""
+    if isinstance(schedule, str):
+        return CronSchedule(schedule)
+    if isinstance(schedule, (int, float)):
+        return IntervalSchedule(schedule)
+    return schedule
+
+# ========================
+# Jobs
+# ========================
+
+class Job:
+    """A named periodic task and its run bookkeeping"""
+    def __init__(self, name, func, schedule, jitter=0, max_concurrency=1, catch_up=True):
+        self.name = name
+        self.func = func
+        self.schedule = make_schedule(schedule)
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.catch_up = catch_up
+        self.running = 0
+        self.next_run = None
+        self.last_run = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'schedule': str(self.schedule),
+            'next_run': str(self.next_run) if self.next_run else None,
+            'last_run': str(self.last_run) if self.last_run else None,
+            'running': self.running,
+            'last_error': self.last_error
+        }
+
+# ========================
+# Scheduler
+# ========================
+
+class Scheduler:
+    """Heap-ordered job timer that hands due jobs to a worker pool
+
+    One thread sleeps until the earliest job is due and submits it to the
+    pool, so slow jobs (reports, AI calls) never hold up the timer or each
+    other. A job already running max_concurrency times skips that run.
+
+    The time each job last fired is saved to a state file. On start, a
+    job with catch_up=True whose scheduled time passed while the system was
+    down runs once right away; several missed runs are coalesced into one.
+    Runs that fall due while the scheduler is paused are skipped.
+    """
+    def __init__(self, workers=None, state_file=None):
+        self.workers = workers or int(os.getenv('INVENTORY_SCHEDULER_WORKERS', 4))
+        self.state_file = state_file or os.getenv('INVENTORY_SCHEDULER_STATE', 'scheduler_state.json')
+        self.jobs = {}
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.pool = None
+        self.thread = None
+        self.running = False
+        self.paused = False
+        self.state = self.load_state()
+
+    def load_state(self):
+        """Load the last fire time of every job"""
+        try:
+            if self.state_file and os.path.exists(self.state_file):
+                with open(self.state_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading scheduler state: {str(e)}")
+        return {}
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump(self.state, f, indent=2)
+        except Exception as e:
+            print(f"Error saving scheduler state: {str(e)}")
+
+    def add_job(self, name, func, schedule, jitter=0, max_concurrency=1, catch_up=True):
+        """Register a job; schedule is a cron string or an interval in seconds"""
+        job = Job(name, func, schedule, jitter, max_concurrency, catch_up)
+        now = datetime.now()
+        with self.condition:
+            last = self.state.get(name)
+            job.last_run = datetime.fromisoformat(last) if last else None
+            if catch_up and job.last_run and job.schedule.next_after(job.last_run) <= now:
+                job.next_run = now
+            else:
+                job.next_run = job.schedule.next_after(now)
+            self.jobs[name] = job
+            self.push(job)
+        return job
+
+    def push(self, job):
+        """Queue a job's next run; jitter delays it without moving the schedule"""
+        fire_at = job.next_run + timedelta(seconds=random.uniform(0, job.jitter))
+        heapq.heappush(self.heap, (fire_at, next(self.counter), job.name, job.next_run))
+        self.condition.notify()
+
+    def run_now(self, name):
+        """Run a job on the pool immediately, outside its schedule (even while paused)"""
+        with self.condition:
+            return self.dispatch(self.jobs[name], datetime.now(), record=False)
+
+    def pause(self):
+        """Skip scheduled runs until resume(); jobs already running finish"""
+        with self.condition:
+            self.paused = True
+
+    def resume(self):
+        with self.condition:
+            self.paused = False
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scheduler')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, wait=False):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread and self.thread.is_alive():
+            self.thread.join()
+        if self.pool:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+
+    def run(self):
+        with self.condition:
+            while self.running:
+                now = datetime.now()
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                fire_at, _, name, scheduled = self.heap[0]
+                if fire_at > now:
+                    # Wake up at least once a minute in case the wall clock jumps
+                    self.condition.wait(min((fire_at - now).total_seconds(), 60))
+                    continue
+                heapq.heappop(self.heap)
+                job = self.jobs.get(name)
+                if job is None or job.next_run != scheduled:
+                    continue
+                if not self.paused:
+                    self.dispatch(job, scheduled)
+                # Runs missed while we were behind are coalesced into this one
+                job.next_run = job.schedule.next_after(max(scheduled, now))
+                self.push(job)
+
+    def dispatch(self, job, scheduled, record=True):
+        """Submit a job to the pool unless it is at its concurrency limit"""
+        if job.running >= job.max_concurrency:
+            print(f"Skipping {job.name}: {job.running} run(s) still in progress")
+            return False
+        job.running += 1
+        if record:
+            job.last_run = scheduled
+            self.state[job.name] = scheduled.isoformat()
+            self.save_state()
+        self.pool.submit(self.execute, job)
+        return True
+
+    def execute(self, job):
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.last_error = str(e)
+            print(f"Error in scheduled job {job.name}: {str(e)}")
+        finally:
+            with self.condition:
+                job.running -= 1
+
+    def get_jobs(self):
+        """Get a summary of every job, soonest first"""
+        with self.condition:
+            jobs = [job.to_dict() for job in self.jobs.values()]
+        return sorted(jobs, key=lambda job: job['next_run'] or '')
@@ -0,0 +1,494 @@
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+
+from columnar_store import micros_to_timestamp
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ========================
+# Binary Layout
+# ========================
+#
+# header  : magic(4s) version(u16) compression(u16) count(u64)
+# body    : a fixed sequence of sections, each length(u64) + bytes
+#
+# Products are stored column by column so numbers load with a single
+# array.frombytes() and strings with one decode per column:
+#
+#   ids, names       : utf-8 blob section + offsets section (u64 * count+1)
+#   categories       : JSON list of distinct categories + codes section (u32)
+#   quantity, price  : i64 / f64 arrays
+#   last_updated     : string column like ids; slicing ASCII text back out is
+#                      several times faster than formatting datetimes
+#   extras           : JSON {product_id: {field: value}} for non-standard fields
+#   id order         : row numbers sorted by product ID (u64), for binary search
+#   summary          : JSON stock summary (thresholds, total value, low/out IDs)
+#   version          : per-product record versions (i64), see InventoryDB.update_product
+#
+# Activities use the same building blocks: timestamps, interned agent and
+# action columns, and a details string column.
+#
+# Uncompressed files are read through mmap; compressed ones are inflated first.
+# Version 1 files lack the id order and summary sections and can only be
+# loaded eagerly; version 1 and 2 files have no record versions (read as 0).
+
+PRODUCTS_MAGIC = b'INVP'
+ACTIVITY_MAGIC = b'INVA'
+VERSION = 3
+READABLE_VERSIONS = (1, 2, 3)
+
+COMPRESSION_NONE = 0
+COMPRESSION_GZIP = 1
+COMPRESSION_ZSTD = 2
+COMPRESSIONS = {'none': COMPRESSION_NONE, 'gzip': COMPRESSION_GZIP, 'zstd': COMPRESSION_ZSTD}
+
+HEADER = struct.Struct('<4sHHQ')
+SECTION_LENGTH = struct.Struct('<Q')
+
+PRODUCT_FIELDS = ('name', 'quantity', 'price', 'category', 'last_updated', 'version')
+
+@contextmanager
+def atomic_write(path):
+    """Write to a temporary file and move it into place once complete"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def little_endian(column):
+    """Arrays are stored little-endian regardless of the host"""
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+def read_array(typecode, data):
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+def number_column(section, typecode):
+    """Index a numeric section in place (zero-copy on little-endian hosts)"""
+    if sys.byteorder == 'little':
+        return section.cast(typecode)
+    return read_array(typecode, section)
+
+def copy_column(typecode, column):
+    """Copy a number_column() result into a growable array"""
+    if isinstance(column, memoryview):
+        return read_array(typecode, column.cast('B'))
+    return array(typecode, column)
+
+def string_at(blob, offsets, row):
+    return str(blob[offsets[row]:offsets[row + 1]], 'utf-8')
+
+def pack_strings(values):
+    """Encode strings as one utf-8 blob plus an offsets array"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = array('Q', [0])
+    total = 0
+    for data in encoded:
+        total += len(data)
+        offsets.append(total)
+    return b''.join(encoded), offsets
+
+def unpack_strings(blob, offsets):
+    blob = bytes(blob)
+    text = blob.decode('utf-8')
+    if len(text) == len(blob):
+        # Pure ASCII: byte offsets are character offsets, so slice the decoded text
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    return [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+def extend_strings(blob, offsets, values):
+    """Append strings to an existing blob/offsets column without decoding it"""
+    new_blob, new_offsets = pack_strings(values)
+    combined = copy_column('Q', offsets)
+    total = combined[-1]
+    combined.extend(total + offset for offset in new_offsets[1:])
+    return bytes(blob) + new_blob, combined
+
+def intern_column(values, table=(), codes=None):
+    """Replace repeated strings with codes into a table of distinct values"""
+    lookup = {value: code for code, value in enumerate(table)}
+    codes = copy_column('I', codes) if codes is not None else array('I')
+    for value in values:
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        codes.append(code)
+    return list(lookup), codes
+
+def int64_column(ids, rows, field, default=None):
+    """Pack one integer field of every row, naming the product whose value does not fit"""
+    column = array('q')
+    for product_id, row in zip(ids, rows):
+        value = row.get(field, default)
+        try:
+            column.append(value)
+        except (OverflowError, TypeError):
+            raise ValueError(f"Product {product_id}: {field} {value!r} is not a 64-bit integer") from None
+    return column
+
+# ========================
+# Snapshot Formats
+# ========================
+
+class JsonSnapshot:
+    """The original pretty-printed JSON files; slow and large, kept for export"""
+    name = 'json'
+    extension = '.json'
+
+    def dump_products(self, products, path, summary=None):
+        if not isinstance(products, dict):
+            products = products.to_dict()
+        with atomic_write(path) as f:
+            f.write(json.dumps(products, indent=2).encode('utf-8'))
+
+    def load_products(self, path):
+        with open(path, 'r') as f:
+            return json.load(f).items()
+
+    def dump_activities(self, activities, path):
+        if not isinstance(activities, list):
+            activities = list(activities)
+        with atomic_write(path) as f:
+            f.write(json.dumps(activities, indent=2).encode('utf-8'))
+
+    def load_activities(self, path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+class BinarySnapshot:
+    """Column-oriented binary snapshot, optionally gzip/zstd compressed"""
+    name = 'binary'
+    extension = '.snap'
+
+    def __init__(self, compression='none'):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown snapshot compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.compression = COMPRESSIONS[compression]
+
+    @contextmanager
+    def open_body(self, f):
+        """Wrap a file so everything after the header is compressed as configured"""
+        if self.compression == COMPRESSION_GZIP:
+            with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6) as body:
+                yield body
+        elif self.compression == COMPRESSION_ZSTD:
+            with zstandard.ZstdCompressor().stream_writer(f, closefd=False) as body:
+                yield body
+        else:
+            yield f
+
+    def write(self, path, magic, count, sections):
+        with atomic_write(path) as f:
+            f.write(HEADER.pack(magic, VERSION, self.compression, count))
+            with self.open_body(f) as body:
+                for section in sections:
+                    if isinstance(section, array):
+                        section = little_endian(section).tobytes()
+                    body.write(SECTION_LENGTH.pack(len(section)))
+                    body.write(section)
+
+    @contextmanager
+    def read(self, path, magic):
+        """Open a snapshot as (count, list of section buffers); mmap when uncompressed"""
+        mapped = SnapshotFile(path, magic)
+        try:
+            yield mapped.count, mapped.sections
+        finally:
+            mapped.close()
+
+    def dump_products(self, products, path, summary=None):
+        if hasattr(products, 'categories') and hasattr(products, 'category_codes'):
+            # ColumnarInventory already holds the columns we need
+            ids, names = products.ids, products.names
+            categories, codes = products.categories, products.category_codes
+            quantities, prices = products.quantities, products.prices
+            timestamps = [micros_to_timestamp(micros) for micros in products.updated]
+            versions = products.versions
+            extras = products.extras
+        else:
+            # scan() lets lazily loaded stores hand over rows without caching them
+            pairs = list(products.scan() if hasattr(products, 'scan') else products.items())
+            ids = [product_id for product_id, _ in pairs]
+            rows = [row for _, row in pairs]
+            names = [row['name'] for row in rows]
+            categories, codes = intern_column(row.get('category', "") for row in rows)
+            quantities = int64_column(ids, rows, 'quantity')
+            prices = array('d', (row['price'] for row in rows))
+            timestamps = [str(row['last_updated']) for row in rows]
+            versions = int64_column(ids, rows, 'version', 0)
+            extras = {}
+            for product_id, row in zip(ids, rows):
+                extra = {key: value for key, value in row.items() if key not in PRODUCT_FIELDS}
+                if extra:
+                    extras[product_id] = extra
+
+        id_blob, id_offsets = pack_strings(ids)
+        name_blob, name_offsets = pack_strings(names)
+        timestamp_blob, timestamp_offsets = pack_strings(timestamps)
+        id_order = array('Q', sorted(range(len(ids)), key=ids.__getitem__))
+        self.write(path, PRODUCTS_MAGIC, len(ids), [
+            id_blob, id_offsets, name_blob, name_offsets,
+            json.dumps(categories).encode('utf-8'), codes,
+            quantities, prices, timestamp_blob, timestamp_offsets,
+            json.dumps(extras).encode('utf-8'),
+            id_order, json.dumps(summary).encode('utf-8'), versions
+        ])
+
+    def load_columns(self, path):
+        """Load the product columns as a dict of lists/arrays"""
+        with self.read(path, PRODUCTS_MAGIC) as (count, sections):
+            (id_blob, id_offsets, name_blob, name_offsets, categories, codes,
+             quantities, prices, timestamp_blob, timestamp_offsets, extras) = sections[:11]
+            return {
+                'ids': unpack_strings(id_blob, read_array('Q', id_offsets)),
+                'names': unpack_strings(name_blob, read_array('Q', name_offsets)),
+                'categories': json.loads(bytes(categories)),
+                'category_codes': read_array('I', codes),
+                'quantities': read_array('q', quantities),
+                'prices': read_array('d', prices),
+                'timestamps': unpack_strings(timestamp_blob, read_array('Q', timestamp_offsets)),
+                'versions': read_array('q', sections[13]) if len(sections) > 13 else array('q', bytes(8 * count)),
+                'extras': json.loads(bytes(extras))
+            }
+
+    def load_products(self, path):
+        """Yield (product_id, product) pairs"""
+        columns = self.load_columns(path)
+        extras, categories = columns['extras'], columns['categories']
+        for product_id, name, code, quantity, price, last_updated, version in zip(
+            columns['ids'], columns['names'], columns['category_codes'],
+            columns['quantities'], columns['prices'], columns['timestamps'], columns['versions']
+        ):
+            product = {
+                'name': name,
+                'quantity': quantity,
+                'price': price,
+                'category': categories[code],
+                'last_updated': last_updated,
+                'version': version
+            }
+            if product_id in extras:
+                product.update(extras[product_id])
+            yield product_id, product
+
+    def dump_activities(self, activities, path):
+        base = getattr(activities, 'base', None)
+        if base is not None:
+            # Lazily opened log: copy the mapped columns and encode only new entries
+            new = activities.appended
+            timestamp_blob, timestamp_offsets = extend_strings(
+                base.timestamp_blob, base.timestamp_offsets, [str(a['timestamp']) for a in new]
+            )
+            agents, agent_codes = intern_column((a['agent'] for a in new), base.agents, base.agent_codes)
+            actions, action_codes = intern_column((a['action'] for a in new), base.actions, base.action_codes)
+            detail_blob, detail_offsets = extend_strings(
+                base.detail_blob, base.detail_offsets, [str(a['details']) for a in new]
+            )
+        else:
+            timestamp_blob, timestamp_offsets = pack_strings(str(a['timestamp']) for a in activities)
+            agents, agent_codes = intern_column(a['agent'] for a in activities)
+            actions, action_codes = intern_column(a['action'] for a in activities)
+            detail_blob, detail_offsets = pack_strings(str(a['details']) for a in activities)
+        self.write(path, ACTIVITY_MAGIC, len(activities), [
+            timestamp_blob, timestamp_offsets,
+            json.dumps(agents).encode('utf-8'), agent_codes,
+            json.dumps(actions).encode('utf-8'), action_codes,
+            detail_blob, detail_offsets
+        ])
+
+    def load_activities(self, path):
+        with self.read(path, ACTIVITY_MAGIC) as (count, sections):
+            (timestamp_blob, timestamp_offsets, agents, agent_codes, actions, action_codes,
+             detail_blob, detail_offsets) = sections
+            timestamps = unpack_strings(timestamp_blob, read_array('Q', timestamp_offsets))
+            agents = json.loads(bytes(agents))
+            actions = json.loads(bytes(actions))
+            details = unpack_strings(detail_blob, read_array('Q', detail_offsets))
+            return [
+                {'timestamp': timestamp, 'agent': agents[agent], 'action': actions[action], 'details': detail}
+                for timestamp, agent, action, detail in zip(
+                    timestamps, read_array('I', agent_codes), read_array('I', action_codes), details
+                )
+            ]
+
+# ========================
+# Memory-Mapped Access
+# ========================
+
+class SnapshotFile:
+    """A snapshot split into section buffers; backed by mmap when uncompressed"""
+    def __init__(self, path, magic):
+        self.path = path
+        with open(path, 'rb') as f:
+            file_magic, self.version, self.compression, self.count = HEADER.unpack(f.read(HEADER.size))
+            if file_magic != magic or self.version not in READABLE_VERSIONS:
+                raise ValueError(f"{path} is not a readable {magic.decode()} snapshot")
+
+            if self.compression == COMPRESSION_NONE:
+                self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                offset = HEADER.size
+            elif self.compression == COMPRESSION_GZIP:
+                self.buf = gzip.decompress(f.read())
+                offset = 0
+            elif self.compression == COMPRESSION_ZSTD:
+                if zstandard is None:
+                    raise ValueError("Reading zstd snapshots requires the zstandard package")
+                self.buf = zstandard.ZstdDecompressor().stream_reader(f).read()
+                offset = 0
+            else:
+                raise ValueError(f"Unknown compression {self.compression} in {path}")
+
+        self.view = memoryview(self.buf)
+        self.sections = []
+        while offset < len(self.buf):
+            (length,) = SECTION_LENGTH.unpack_from(self.buf, offset)
+            offset += SECTION_LENGTH.size
+            self.sections.append(self.view[offset:offset + length])
+            offset += length
+
+    @property
+    def mapped(self):
+        return isinstance(self.buf, mmap.mmap)
+
+    def close(self):
+        for section in self.sections:
+            section.release()
+        self.view.release()
+        if self.mapped:
+            self.buf.close()
+
+def close_mapping(mapped):
+    """Release a mapped snapshot's column views, then its file (an mmap cannot close while viewed)"""
+    for value in vars(mapped).values():
+        if isinstance(value, memoryview):
+            value.release()
+    mapped.file.close()
+
+class MappedProducts:
+    """Random access to a version 2, uncompressed products snapshot
+
+    Nothing is decoded up front: product IDs are found by binary search over
+    the id order section and rows are decoded on request.
+    """
+    def __init__(self, path):
+        self.file = SnapshotFile(path, PRODUCTS_MAGIC)
+        if not self.file.mapped or self.file.version < 2:
+            self.file.close()
+            raise ValueError(f"{path} must be an uncompressed version 2+ snapshot to open lazily")
+        (self.id_blob, id_offsets, self.name_blob, name_offsets, categories, codes,
+         quantities, prices, self.timestamp_blob, timestamp_offsets, extras,
+         id_order, summary) = self.file.sections[:13]
+        self.count = self.file.count
+        self.id_offsets = number_column(id_offsets, 'Q')
+        self.name_offsets = number_column(name_offsets, 'Q')
+        self.timestamp_offsets = number_column(timestamp_offsets, 'Q')
+        self.category_codes = number_column(codes, 'I')
+        self.quantities = number_column(quantities, 'q')
+        self.prices = number_column(prices, 'd')
+        self.id_order = number_column(id_order, 'Q')
+        if len(self.file.sections) > 13:
+            self.versions = number_column(self.file.sections[13], 'q')
+        else:
+            self.versions = [0] * self.count
+        self.categories = json.loads(bytes(categories))
+        self.extras = json.loads(bytes(extras))
+        self.summary = json.loads(bytes(summary))
+
+    def id_at(self, row):
+        return string_at(self.id_blob, self.id_offsets, row)
+
+    def find(self, product_id):
+        """Get the row of a product ID, or None"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.id_at(self.id_order[middle]) < product_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            row = self.id_order[low]
+            if self.id_at(row) == product_id:
+                return row
+        return None
+
+    def product_at(self, row):
+        product = {
+            'name': string_at(self.name_blob, self.name_offsets, row),
+            'quantity': self.quantities[row],
+            'price': self.prices[row],
+            'category': self.categories[self.category_codes[row]],
+            'last_updated': string_at(self.timestamp_blob, self.timestamp_offsets, row),
+            'version': self.versions[row]
+        }
+        product_id = self.id_at(row)
+        if product_id in self.extras:
+            product.update(self.extras[product_id])
+        return product
+
+    def value_at(self, row):
+        return self.quantities[row] * self.prices[row]
+
+    def close(self):
+        close_mapping(self)
+
+    def iter_ids(self):
+        for row in range(self.count):
+            yield self.id_at(row)
+
+class MappedActivities:
+    """Random access to an uncompressed activity log snapshot"""
+    def __init__(self, path):
+        self.file = SnapshotFile(path, ACTIVITY_MAGIC)
+        if not self.file.mapped:
+            self.file.close()
+            raise ValueError(f"{path} must be uncompressed to open lazily")
+        (self.timestamp_blob, timestamp_offsets, agents, agent_codes, actions, action_codes,
+         self.detail_blob, detail_offsets) = self.file.sections
+        self.count = self.file.count
+        self.timestamp_offsets = number_column(timestamp_offsets, 'Q')
+        self.detail_offsets = number_column(detail_offsets, 'Q')
+        self.agents = json.loads(bytes(agents))
+        self.actions = json.loads(bytes(actions))
+        self.agent_codes = number_column(agent_codes, 'I')
+        self.action_codes = number_column(action_codes, 'I')
+
+    def activity_at(self, index):
+        return {
+            'timestamp': string_at(self.timestamp_blob, self.timestamp_offsets, index),
+            'agent': self.agents[self.agent_codes[index]],
+            'action': self.actions[self.action_codes[index]],
+            'details': string_at(self.detail_blob, self.detail_offsets, index)
+        }
+
+    def close(self):
+        close_mapping(self)
+
+SNAPSHOT_FORMATS = {'json': JsonSnapshot, 'binary': BinarySnapshot}
+
+def get_snapshot_format(name='binary', compression='none'):
+    """Build a snapshot format by name ('binary' or 'json')"""
+    if name == 'binary':
+        return BinarySnapshot(compression)
+    if name == 'json':
+        return JsonSnapshot()
+    raise ValueError(f"Unknown snapshot format: {name}")
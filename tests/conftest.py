@@ -0,0 +1,55 @@
+import gc
+import os
+import shutil
+
+import pytest
+
+from main import InventoryDB, InventorySystem
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run every test in an empty directory with no INVENTORY_* settings"""
+    for name in list(os.environ):
+        if name.startswith('INVENTORY_'):
+            monkeypatch.delenv(name)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_db(workdir):
+    """Build an InventoryDB; its files (and thresholds, history) land in the test directory"""
+    def make(store='dict', **kwargs):
+        return InventoryDB(store=store, **kwargs)
+    return make
+
+
+def started_systems(before):
+    """The InventorySystems created since ids `before` were taken"""
+    gc.collect()
+    return [obj for obj in gc.get_objects() if isinstance(obj, InventorySystem) and id(obj) not in before]
+
+
+@pytest.fixture
+def app(workdir):
+    """Streamlit test sessions of app4; every session shares one InventorySystem"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    shutil.copy(os.path.join(REPO, 'style.css'), workdir)
+    st.cache_resource.clear()
+    before = {id(obj) for obj in gc.get_objects() if isinstance(obj, InventorySystem)}
+
+    def session():
+        return AppTest.from_file(os.path.join(REPO, 'app4.py'), default_timeout=30).run()
+    session.systems = lambda: started_systems(before)
+    yield session
+
+    st.cache_resource.clear()
+    # The monitor and scheduler threads would otherwise keep writing into the test directory
+    for system in session.systems():
+        if system.scheduler.running:
+            system.shutdown()
@@ -0,0 +1,42 @@
+from ai_context import PromptContext, cover_band
+from main import WhatsAppAgent
+
+
+def stocked_db(make_db):
+    db = make_db()
+    db.add_product("P1", "Mouse", 100, 9.99, "Electronics")
+    db.add_product("P2", "Desk", 49, 120.0, "Furniture")
+    db.set_default_threshold(50)
+    return db
+
+
+def test_cover_bands():
+    assert cover_band(0, 5, 24) == 0
+    assert cover_band(5, 10, 24) == 1     # 12 hours of cover
+    assert cover_band(5, 1, 24) == 3      # 120 hours
+    assert cover_band(5, 0, 24) == 5      # nothing sold
+
+
+def test_cache_key_ignores_sales_within_a_band(make_db):
+    db = stocked_db(make_db)
+    context = PromptContext(db)
+    db.sell_product("P2", 10)
+    _, key = context.build("Suggest actions")
+    # 39 left after 10 sold in 24h is about 94 hours of cover; 38 after 11 is still over 72
+    db.sell_product("P2", 1)
+    assert context.build("Suggest actions")[1] == key
+
+    # Dropping to hours of cover changes the picture, and so do different instructions
+    db.sell_product("P2", 30)
+    _, short_key = context.build("Suggest actions")
+    assert short_key != key
+    assert context.build("Summarise")[1] != short_key
+
+
+def test_replacement_agent_keeps_one_subscription(make_db):
+    db = stocked_db(make_db)
+    agent = WhatsAppAgent(db)
+    listeners = len(db.changes.listeners)
+    replacement = WhatsAppAgent(db, context=agent.context)
+    assert replacement.context is agent.context
+    assert len(db.changes.listeners) == listeners
@@ -0,0 +1,67 @@
+import pytest
+from starlette.testclient import TestClient
+
+from api_server import create_app
+
+
+@pytest.fixture
+def client(make_db):
+    db = make_db()
+    db.add_product("P1", "Mouse", 5, 9.99, "Electronics")
+    with TestClient(create_app(db, api_key="")) as client:
+        yield client
+
+
+@pytest.mark.parametrize('body, message', [
+    ('[]', "Expected a JSON object"),
+    ('{"id": "P2", "name": "Desk"}', "Missing quantity, price"),
+    ('{"id": "", "name": "Desk", "quantity": 1, "price": 1}', "id must be a non-empty string"),
+    ('{"id": "P2", "name": "Desk", "quantity": -1, "price": 1}', "quantity must be a non-negative integer"),
+    ('{"id": "P2", "name": "Desk", "quantity": 1.5, "price": 1}', "quantity must be a non-negative integer"),
+    ('{"id": "P2", "name": "Desk", "quantity": true, "price": 1}', "quantity must be a non-negative integer"),
+    ('{"id": "P2", "name": "Desk", "quantity": 9223372036854775808, "price": 1}',
+     "quantity must be a non-negative integer"),
+    ('{"id": "P2", "name": "Desk", "quantity": 1, "price": Infinity}', "price must be a finite, non-negative number"),
+    ('{"id": "P2", "name": "Desk", "quantity": 1, "price": NaN}', "price must be a finite, non-negative number"),
+    ('{"id": "P2", "name": "Desk", "quantity": 1, "price": 1, "category": 3}', "category must be a string"),
+])
+def test_add_product_validation(client, body, message):
+    response = client.post('/products', content=body, headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+    assert response.json() == {'error': message}
+
+
+def test_add_duplicate_conflicts(client):
+    response = client.post('/products', json={'id': "P1", 'name': "Mouse", 'quantity': 1, 'price': 1.0})
+    assert response.status_code == 409
+
+
+def test_update_with_stale_version_conflicts(client):
+    version = client.get('/products/P1').json()['version']
+    body = {'name': "Mouse", 'quantity': 4, 'price': 9.99, 'version': version}
+    assert client.put('/products/P1', json=body).status_code == 200
+    response = client.put('/products/P1', json=body)
+    assert response.status_code == 409
+    assert response.json()['version'] == version + 1
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/products/P1/sell', {'quantity': 0}),
+    ('/products/P1/sell', {'quantity': "2"}),
+    ('/products/P1/quantity', {'change': 1.0}),
+    ('/bulk/sell', {'id': "P1", 'quantity': 1}),
+    ('/bulk/quantity', [{'id': "P1"}]),
+])
+def test_write_validation(client, path, body):
+    assert client.post(path, json=body).status_code == 400
+
+
+def test_bad_query_parameters(client):
+    assert client.get('/products?limit=-1').status_code == 400
+    assert client.get('/activities?limit=ten').status_code == 400
+
+
+def test_write_failures(client):
+    assert client.post('/products/P9/sell', json={'quantity': 1}).status_code == 404
+    assert client.post('/products/P1/sell', json={'quantity': 6}).status_code == 409
+    assert client.get('/products/P9').status_code == 404
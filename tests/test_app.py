@@ -0,0 +1,123 @@
+from main import InventoryDB, VersionConflictError
+
+
+def save_product(at, **fields):
+    """Fill in the product form of the Inventory page and submit it"""
+    for key, value in fields.items():
+        widgets = at.number_input if key in ('quantity', 'price') else at.text_input
+        widgets(key=f"form_{key}").set_value(value)
+    at.button(key="FormSubmitter:product_form-Save Product").click().run()
+    return at
+
+
+def inventory_page(app):
+    at = app()
+    at.sidebar.radio[0].set_value("Inventory").run()
+    return at
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+    return at
+
+
+def running_systems(app):
+    return [system for system in app.systems() if system.scheduler.running]
+
+
+def test_sessions_share_one_scheduler(app):
+    first, second = app(), app()
+    systems = running_systems(app)
+    assert len(systems) == 1
+    assert [job['name'] for job in systems[0].scheduler.get_jobs()] == ['daily_report']
+
+    # A restart from either session replaces the one system for both
+    click(first, "🔄 Restart System")
+    click(second, "🔄 Restart System")
+    restarted = running_systems(app)
+    assert len(restarted) == 1 and restarted[0] is not systems[0]
+
+
+def test_pause_applies_to_every_session(app):
+    first, second = app(), app()
+    click(first, "⏸️ Pause System")
+    second.run()
+    assert "System Paused" in second.sidebar.warning[0].value
+    # Resuming from the other session restarts the monitor
+    click(second, "▶️ Resume System")
+    system, = running_systems(app)
+    assert not system.scheduler.paused and system.inventory_manager.thread.is_alive()
+
+
+def test_sessions_share_one_database(app):
+    first = inventory_page(app)
+    save_product(first, id="P1", name="Mouse", quantity=5)
+
+    second = inventory_page(app)
+    assert "P1 - Mouse" in second.selectbox(key="edit_selection").options
+
+
+def test_stale_edit_from_another_session_conflicts(app):
+    first = inventory_page(app)
+    save_product(first, id="P1", name="Mouse", quantity=5, price=9.99).run()
+    second = inventory_page(app)
+
+    # Both sessions load P1 at the same version, then the second saves first
+    first.selectbox(key="edit_selection").set_value("P1").run()
+    second.selectbox(key="edit_selection").set_value("P1").run()
+    save_product(second, price=12.5)
+    assert not second.error
+
+    # Any rerun keeps the first session's form as it was loaded
+    first.run()
+    assert first.number_input(key="form_price").value == 9.99
+    save_product(first, price=8.0)
+    assert "was changed by someone else" in first.error[0].value
+    # The form was reloaded with the winning write
+    assert first.number_input(key="form_price").value == 12.5
+    assert InventoryDB().inventory["P1"]['price'] == 12.5
+
+
+def test_stale_update_raises_version_conflict(make_db):
+    db = make_db()
+    db.add_product("P1", "Mouse", 5, 9.99)
+    version = db.inventory["P1"]['version']
+    assert db.update_product("P1", "Wireless Mouse", 5, 9.99, expected_version=version)
+
+    try:
+        db.update_product("P1", "Optical Mouse", 5, 9.99, expected_version=version)
+    except VersionConflictError as e:
+        assert e.current_version == version + 1
+    else:
+        raise AssertionError("stale update was applied")
+    assert db.inventory["P1"]['name'] == "Wireless Mouse"
+
+
+
+def metric(at, label):
+    return next(m for m in at.metric if m.label == label)
+
+
+def test_dashboard_shows_writes_from_other_sessions(app):
+    dashboard = app()
+    assert metric(dashboard, "Total Products").value == "0"
+
+    other = inventory_page(app)
+    save_product(other, id="P1", name="Mouse", quantity=5, price=9.99)
+
+    # What the live fragment does every DASHBOARD_REFRESH_SECONDS: apply the change feed delta
+    dashboard.run()
+    assert metric(dashboard, "Total Products").value == "1"
+    assert metric(dashboard, "Total Products").delta == "1"
+    assert any("add_product" in expander.label for expander in dashboard.expander)
+
+
+def test_stock_trend_looks_up_one_product(app):
+    other = inventory_page(app)
+    save_product(other, id="P1", name="Mouse", quantity=5, price=9.99)
+
+    dashboard = app()
+    dashboard.text_input(key="trend_product").set_value("P1").run()
+    assert not dashboard.info
+    dashboard.text_input(key="trend_product").set_value("P2").run()
+    assert dashboard.info[0].value == "No product with ID P2"
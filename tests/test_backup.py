@@ -0,0 +1,91 @@
+import gzip
+import io
+import os
+
+import pytest
+
+from backup import export_database, import_database
+
+STORES = ['dict', 'columnar', 'lazy']
+
+
+def fill(db):
+    db.add_product("P1", "Mouse", 5, 9.99, "Electronics")
+    db.add_product("P2", "Desk", 0, 120.0, "Furniture")
+    db.add_product("P3", "Cable", 2, 3.5, "Electronics")
+    db.sell_product("P1", 1)
+    db.log_activity("Tester", "note", "filled")
+
+
+def contents(db):
+    return {product_id: dict(product) for product_id, product in db.inventory.items()}
+
+
+@pytest.mark.parametrize('store', STORES)
+@pytest.mark.parametrize('path', ['export.ndjson', 'export.ndjson.gz'])
+def test_export_import_round_trip(make_db, workdir, store, path):
+    source = make_db(store)
+    fill(source)
+    counts = export_database(source, str(workdir / path))
+    assert counts == {'products': 3, 'activities': len(source.activity_log)}
+    # The snapshot copies the export was streamed from are gone
+    assert not [name for name in os.listdir(workdir) if name.endswith('.export')]
+
+    os.mkdir(workdir / 'other')
+    os.chdir(workdir / 'other')
+    target = make_db(store)
+    target.add_product("OLD", "Gone", 1, 1.0)
+    assert import_database(target, str(workdir / path)) == counts
+    assert contents(target) == contents(source)
+    assert list(target.activity_log) == list(source.activity_log)
+    assert target.get_inventory_status() == source.get_inventory_status()
+
+    # The import was saved
+    reopened = make_db(store)
+    assert contents(reopened) == contents(source)
+
+
+def test_export_includes_unsaved_changes(make_db, workdir):
+    db = make_db()
+    fill(db)
+    with db.batch():
+        db.update_quantity("P2", 7)
+        assert export_database(db, str(workdir / 'export.ndjson'))['products'] == 3
+    target = make_db('dict', filename=str(workdir / 'target.snap'), log_filename=str(workdir / 'target-log.snap'))
+    import_database(target, str(workdir / 'export.ndjson'))
+    assert target.inventory["P2"]['quantity'] == 7
+
+
+def test_export_filters(make_db, workdir):
+    db = make_db()
+    fill(db)
+    counts = export_database(db, str(workdir / 'export.ndjson'), categories=['Electronics'])
+    assert counts['products'] == 2
+
+
+def test_merge_bumps_existing_versions(make_db, workdir):
+    db = make_db()
+    fill(db)
+    export_database(db, str(workdir / 'export.ndjson'))
+    version = db.inventory["P1"]['version']
+    db.add_product("P4", "Lamp", 1, 20.0)
+
+    with open(workdir / 'export.ndjson', 'rb') as f:
+        upload = io.BytesIO(gzip.compress(f.read()))
+    assert import_database(db, upload, 'merge')['products'] == 3
+    assert db.inventory["P1"]['version'] == version + 1
+    assert "P4" in db.inventory
+
+
+@pytest.mark.parametrize('mode', ['replace', 'merge'])
+def test_bad_export_leaves_database_untouched(make_db, workdir, mode):
+    db = make_db()
+    fill(db)
+    before = contents(db)
+    path = workdir / 'export.ndjson'
+    export_database(db, str(path))
+    with open(path, 'a') as f:
+        f.write('{"type": "product", "id": "P9", "name": "Bad", "quantity": "lots", "price": 1.0}\n')
+
+    assert import_database(db, str(path), mode) is None
+    assert contents(db) == before
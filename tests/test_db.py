@@ -0,0 +1,65 @@
+import pytest
+
+from main import QUANTITY_MAX, VersionConflictError
+
+STORES = ['dict', 'columnar', 'lazy']
+
+
+def fill(db):
+    db.add_product("P1", "Mouse", 5, 9.99, "Electronics")
+    db.add_product("P2", "Desk", 0, 120.0, "Furniture")
+    db.add_product("P3", "Cable", 2, 3.5)
+    db.update_product("P1", "Wireless Mouse", 5, 12.5, "Electronics")
+    db.sell_product("P3", 1)
+    db.delete_product("P2")
+    db.add_product("P4", "Lamp", 7, 20.0, "Furniture")
+
+
+def contents(db):
+    return {product_id: dict(product) for product_id, product in db.inventory.items()}
+
+
+@pytest.mark.parametrize('saved_with', STORES)
+@pytest.mark.parametrize('opened_with', STORES)
+def test_snapshot_round_trip(make_db, saved_with, opened_with):
+    db = make_db(saved_with)
+    fill(db)
+    reopened = make_db(opened_with)
+    assert contents(reopened) == contents(db)
+    assert list(reopened.activity_log) == list(db.activity_log)
+    assert reopened.get_inventory_status() == db.get_inventory_status()
+    assert reopened.stock_index.category_totals() == db.stock_index.category_totals()
+
+
+@pytest.mark.parametrize('store', STORES)
+def test_lazy_reopen_after_more_writes(make_db, store):
+    db = make_db(store)
+    fill(db)
+    lazy = make_db('lazy')
+    lazy.sell_product("P1", 2)
+    lazy.add_product("P5", "Chair", 3, 45.0, "Furniture")
+    again = make_db(store)
+    assert contents(again) == contents(lazy)
+    assert again.get_inventory_status() == lazy.get_inventory_status()
+
+
+@pytest.mark.parametrize('store', STORES)
+def test_compare_and_set(make_db, store):
+    db = make_db(store)
+    fill(db)
+    version = db.inventory["P1"]['version']
+    db.sell_product("P1", 1)
+    with pytest.raises(VersionConflictError) as conflict:
+        db.update_product("P1", "Mouse", 10, 9.99, expected_version=version)
+    assert conflict.value.current_version == version + 1
+    assert db.inventory["P1"]['quantity'] == 4
+    assert db.update_product("P1", "Mouse", 10, 9.99, expected_version=version + 1)
+
+
+@pytest.mark.parametrize('store', STORES)
+def test_quantities_stay_within_64_bits(make_db, store):
+    db = make_db(store)
+    assert not db.add_product("P1", "Mouse", QUANTITY_MAX + 1, 1.0)
+    assert db.add_product("P1", "Mouse", QUANTITY_MAX, 1.0)
+    assert not db.update_quantity("P1", 1)
+    assert make_db(store).inventory["P1"]['quantity'] == QUANTITY_MAX
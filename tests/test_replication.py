@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from replication import ReplicaDB, WriterServer
+
+
+@pytest.fixture
+def writer(make_db, workdir):
+    db = make_db()
+    server = WriterServer(db, address=str(workdir / 'writer.sock')).start()
+    yield db, server.address
+    server.stop()
+
+
+def test_replica_reads_history_recorded_before_it_started(writer):
+    db, address = writer
+    db.add_product("P1", "Mouse", 5, 9.99)
+    before = datetime.now()
+    db.sell_product("P1", 2)
+
+    replica = ReplicaDB(address=address)
+    assert replica.history.quantity_at("P1", before) == 5
+    assert replica.history.quantity_at("P1", datetime.now()) == 3
+    assert [quantity for _, quantity in replica.history.changes("P1", before - timedelta(days=1), datetime.now())] == [5, 3]
+    assert replica.history.product_ids() == ["P1"]
+
+    # Writes through the replica are recorded once, by the writer
+    replica.update_quantity("P1", 4)
+    assert db.history.quantity_at("P1", datetime.now()) == 7
+    assert replica.history.total_at(datetime.now()) == 7